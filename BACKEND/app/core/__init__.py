@@ -3,5 +3,19 @@ Módulo core de la aplicación
 """
 
 from .dataset import dataset_manager, DatasetManager
+from .cube import AggregateCube
+from .threads import ThreadIndex
+from .posts import PostIndex
+from .weighted import WeightedMetrics
+from .timeindex import TimeIndex
+from .heavy_hitters import HeavyHitterIndex, SpaceSaving
+from .cardinality import CardinalityIndex, HyperLogLog
+from .categories import CategoryIndex
+from .search import SearchIndex
+# Suscriptores del snapshot listo (se registran al importarse)
+from .comment_store import comment_store
+from .similarity import similarity_service
 
-__all__ = ['dataset_manager', 'DatasetManager']
+__all__ = ['dataset_manager', 'DatasetManager', 'AggregateCube', 'ThreadIndex', 'PostIndex', 'WeightedMetrics', 'TimeIndex',
+           'HeavyHitterIndex', 'SpaceSaving', 'CardinalityIndex', 'HyperLogLog',
+           'CategoryIndex', 'SearchIndex', 'comment_store', 'similarity_service']
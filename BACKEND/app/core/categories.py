@@ -0,0 +1,168 @@
+"""
+Categorías del reporte ejecutivo calculadas a partir de los comentarios
+
+Cada comentario se asigna a una categoría con un único regex compilado
+(un grupo con nombre por categoría). Las palabras clave son raíces que
+coinciden como prefijo, salvo las de WHOLE_WORDS, que exigen la palabra
+completa ('app' no debe capturar 'apple' ni 'decana' a 'decanato'). Primero se evalúa sobre las categorías
+de tema_principal / subtema_o_keyword (pocas cadenas distintas) y, si no hay
+coincidencia, sobre el texto del comentario. Los conteos por categoría y
+sentimiento salen de un solo bincount y se guardan con el snapshot.
+"""
+
+import logging
+import re
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes
+
+logger = logging.getLogger(__name__)
+
+# Nombre -> (descripción, raíces de palabras clave)
+REPORT_CATEGORIES = {
+    'Enseñanza': ('Calidad docente y metodologías', [
+        'profesor', 'docente', 'enseñanza', 'clase', 'curso', 'académic', 'carrera',
+        'examen', 'estudiante', 'alumno', 'facultad', 'investigaci', 'tesis'
+    ]),
+    'Infraestructura': ('Instalaciones y espacios', [
+        'infraestructura', 'edificio', 'aula', 'campus', 'ciudad universitaria',
+        'laboratorio', 'estadio', 'local', 'baño', 'puerta', 'obra'
+    ]),
+    'Servicios': ('Biblioteca y servicios estudiantiles', [
+        'servicio', 'biblioteca', 'comedor', 'trámite', 'tramite', 'constancia',
+        'matrícula', 'matricula', 'admisión', 'admision', 'horario', 'producto', 'bienestar'
+    ]),
+    'Tecnología': ('Plataformas digitales', [
+        'tecnolog', 'internet', 'wifi', 'sistema', 'plataforma', 'página', 'pagina',
+        'web', 'virtual', 'correo', 'aplicativo', 'app', 'apps'
+    ]),
+    'Comunicación': ('Canales de información', [
+        'comunicaci', 'información', 'informacion', 'comunicado', 'anuncio', 'video',
+        'publicaci', 'canción', 'cancion', 'música', 'musica', 'audio', 'contenido'
+    ]),
+    'Gestión': ('Procesos administrativos', [
+        'gestión', 'gestion', 'rector', 'autoridad', 'jerí', 'jeri', 'administraci',
+        'organizaci', 'presupuesto', 'decano', 'decanato'
+    ]),
+    'Prestigio': ('Rankings e imagen institucional', [
+        'ranking', 'prestigi', 'decana', 'orgull', 'acreditaci', 'licenciamiento'
+    ]),
+}
+# Palabras clave que solo coinciden como palabra completa
+WHOLE_WORDS = {'app', 'apps', 'decana'}
+CATEGORY_NAMES = list(REPORT_CATEGORIES)
+
+
+def compile_category_matcher() -> re.Pattern:
+    """Regex único con un grupo con nombre por categoría (c0, c1, ...)"""
+    def keyword(word: str) -> str:
+        return re.escape(word) + (r"\b" if word in WHOLE_WORDS else "")
+
+    groups = [
+        f"(?P<c{i}>" + "|".join(keyword(word) for word in words) + ")"
+        for i, (_, words) in enumerate(REPORT_CATEGORIES.values())
+    ]
+    return re.compile(r"\b(?:" + "|".join(groups) + ")", re.IGNORECASE)
+
+
+CATEGORY_MATCHER = compile_category_matcher()
+
+
+def match_categories(texts: pd.Series) -> np.ndarray:
+    """
+    Código de categoría de cada texto (primera coincidencia), -1 si ninguna
+
+    Sobre columnas categóricas el regex se evalúa solo una vez por categoría.
+    """
+    if isinstance(texts.dtype, pd.CategoricalDtype):
+        categories = pd.Series(texts.cat.categories.astype(str))
+        per_category = match_categories(categories)
+        codes = texts.cat.codes.to_numpy()
+        return np.where(codes >= 0, per_category[codes], -1)
+
+    extracted = texts.fillna('').astype(str).str.extract(CATEGORY_MATCHER)
+    matched = extracted.notna().to_numpy()
+    return np.where(matched.any(axis=1), matched.argmax(axis=1), -1)
+
+
+class CategoryIndex:
+    """
+    Categoría y sentimiento por fila + conteos precalculados del snapshot
+    """
+
+    def __init__(self, codes: np.ndarray, sentiment: np.ndarray):
+        self.codes = codes
+        self.sentiment = sentiment
+        self.counts = self._count(np.flatnonzero(codes >= 0))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CategoryIndex":
+        """Asigna categorías usando columnas de tema y, como respaldo, el texto"""
+        codes = np.full(len(df), -1, dtype=np.int64)
+
+        for name in ('tema_principal', 'subtema_o_keyword', 'texto_comentario'):
+            col = resolve_column(df, name)
+            if col is None:
+                continue
+            pending = codes < 0
+            if not pending.any():
+                break
+            column = df[col]
+            if not isinstance(column.dtype, pd.CategoricalDtype) and name != 'texto_comentario':
+                column = column.astype('category')
+            matched = match_categories(column.reset_index(drop=True))
+            codes = np.where(pending, matched, codes)
+
+        index = cls(codes.astype(np.int8), sentiment_codes(df))
+        assigned = int((codes >= 0).sum())
+        logger.info(f"🏷️ Categorías de reporte: {assigned}/{len(df)} comentarios asignados")
+        return index
+
+    def append(self, df: pd.DataFrame) -> "CategoryIndex":
+        """Asigna categorías solo a las filas nuevas y suma sus conteos"""
+        delta = CategoryIndex.from_frame(df)
+        self.codes = np.concatenate([self.codes, delta.codes])
+        self.sentiment = np.concatenate([self.sentiment, delta.sentiment])
+        self.counts = self.counts + delta.counts
+        return self
+
+    def _count(self, positions: np.ndarray) -> np.ndarray:
+        """Matriz categorías × sentimientos con un bincount"""
+        k = len(SENTIMENT_LABELS)
+        cells = self.codes[positions].astype(np.int64) * k + self.sentiment[positions]
+        return np.bincount(cells, minlength=len(CATEGORY_NAMES) * k).reshape(len(CATEGORY_NAMES), k)
+
+    def scores(self, positions: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        Conteos y score 0-100 por categoría
+
+        score = 50 + 50 · (positivos - negativos) / total, es decir 50 es
+        neutral, 100 todo positivo y 0 todo negativo.
+
+        Args:
+            positions: Filas del período (None = snapshot completo, precalculado)
+        """
+        if positions is None:
+            counts = self.counts
+        else:
+            positions = positions[self.codes[positions] >= 0]
+            counts = self._count(positions)
+
+        neg, neu, pos = (SENTIMENT_LABELS.index(label) for label in ('Negativo', 'Neutral', 'Positivo'))
+        result = []
+        for i, name in enumerate(CATEGORY_NAMES):
+            total = int(counts[i].sum())
+            if total == 0:
+                continue
+            result.append({
+                'name': name,
+                'description': REPORT_CATEGORIES[name][0],
+                'score': int(round(50 + 50 * (counts[i][pos] - counts[i][neg]) / total)),
+                'positive_count': int(counts[i][pos]),
+                'neutral_count': int(counts[i][neu]),
+                'negative_count': int(counts[i][neg]),
+                'total_count': total
+            })
+        return result
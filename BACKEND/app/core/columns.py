@@ -0,0 +1,83 @@
+"""
+Resolución de columnas y etiquetas comunes a los loaders y los índices
+"""
+
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+# Orden canónico de las clases (coincide con sentiment_map del analizador)
+SENTIMENT_LABELS = ['Negativo', 'Neutral', 'Positivo']
+
+
+@lru_cache(maxsize=64)
+def _column_lookup(columns: Tuple[Any, ...]) -> Dict[str, Any]:
+    """Nombre en minúsculas -> nombre real (cacheado por tupla de columnas)"""
+    return {str(col).strip().lower(): col for col in columns}
+
+
+def resolve_column(df: pd.DataFrame, *names: str) -> Optional[str]:
+    """
+    Busca una columna por nombre sin distinguir mayúsculas
+
+    Args:
+        df: DataFrame donde buscar
+        names: Nombres candidatos en orden de preferencia
+
+    Returns:
+        Nombre real de la columna o None si no existe
+    """
+    lookup = _column_lookup(tuple(df.columns))
+    for name in names:
+        if name.lower() in lookup:
+            return lookup[name.lower()]
+    return None
+
+
+def cell_text(value: Any) -> Optional[str]:
+    """Valor de celda como texto para JSON; None si falta (no 'nan')"""
+    return None if value is None or pd.isna(value) else str(value)
+
+
+def map_sentiment_label(sent: Any) -> str:
+    """Reduce una etiqueta detallada ('Positivo/Orgullo') a Positivo/Neutral/Negativo"""
+    s = str(sent).lower()
+    
+    # Negativos
+    if any(p in s for p in ['negativ', 'neg/', 'mal', 'trist', 'frustrac',
+                             'enojo', 'molest', 'decepc', 'critic', 'queja']):
+        return 'Negativo'
+    
+    # Positivos
+    elif any(p in s for p in ['positiv', 'posit/', 'buen', 'excel', 'alegr',
+                               'feliz', 'orgullo', 'admirac', 'entusias']):
+        return 'Positivo'
+    
+    # Neutral
+    else:
+        return 'Neutral'
+
+
+def sentiment_codes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Códigos 0/1/2 (índices de SENTIMENT_LABELS) por fila
+
+    La reducción de etiquetas se evalúa solo sobre las categorías; las filas
+    sin sentimiento cuentan como Neutral.
+    """
+    col = resolve_column(df, 'sentimiento')
+    if col is None:
+        return np.ones(len(df), dtype=np.int8)
+    
+    labels = df[col].astype('category').map(map_sentiment_label)
+    codes = pd.Categorical(labels, categories=SENTIMENT_LABELS).codes
+    return np.where(codes < 0, 1, codes).astype(np.int8)
+
+
+def like_counts(df: pd.DataFrame) -> np.ndarray:
+    """Likes por fila como int64 (0 si no hay dato)"""
+    col = resolve_column(df, 'cantidad_likes')
+    if col is None:
+        return np.zeros(len(df), dtype=np.int64)
+    return pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64').to_numpy()
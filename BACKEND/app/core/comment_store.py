@@ -0,0 +1,341 @@
+"""
+Almacén embebido (SQLite) de los comentarios del snapshot
+
+Tabla `comments` con una fila por comentario (pos = posición en el
+snapshot) e índices sobre las columnas de filtro más usadas, cada uno con
+likes como segunda clave para que filtro + orden por likes se resuelvan en
+el índice. Las consultas de /api/comments (filtros, orden y paginación) se
+ejecutan en SQLite sin recorrer el DataFrame.
+
+El archivo corresponde a un par (versión del dataset, versión del modelo
+de las etiquetas) y se actualiza en segundo plano cuando cambia: se escribe
+un temporal en el mismo directorio y se reemplaza con os.replace, así las
+consultas en curso siguen leyendo el archivo anterior. Si la versión nueva
+solo anexa filas a la del archivo (mismo modelo), el temporal es una copia
+del archivo con las filas nuevas insertadas; si no, se reconstruye entero.
+Si al arrancar el archivo ya corresponde a lo cargado, no se toca.
+"""
+
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.categories import CATEGORY_NAMES
+from app.core.columns import SENTIMENT_LABELS, like_counts, resolve_column, sentiment_codes
+from app.core.dataset import dataset_manager
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHUNK_ROWS = 20000
+
+# Columna del almacén -> (tipo SQL, columna lógica del snapshot)
+STORE_COLUMNS: Dict[str, Tuple[str, Optional[str]]] = {
+    'publicacion': ('INTEGER', 'publicacion'),
+    'id_comentario': ('TEXT', 'id_comentario'),
+    'usuario': ('TEXT', 'usuario'),
+    'texto': ('TEXT', 'texto_comentario'),
+    'likes': ('INTEGER NOT NULL DEFAULT 0', None),
+    'tema': ('TEXT', 'tema_principal'),
+    'subtema': ('TEXT', 'subtema_o_keyword'),
+    'categoria': ('TEXT', None),
+    'sentimiento': ('TEXT', None),
+    'sentimiento_modelo': ('TEXT', 'sentimiento_modelo'),
+    'confianza': ('REAL', 'confianza'),
+    'es_respuesta_a': ('TEXT', 'es_respuesta_a'),
+    'fecha': ('TEXT', None),
+}
+
+STORE_INDEXES = {
+    'idx_comments_publicacion': ('publicacion', 'likes'),
+    'idx_comments_tema': ('tema', 'likes'),
+    'idx_comments_categoria': ('categoria', 'likes'),
+    'idx_comments_sentimiento': ('sentimiento', 'likes'),
+    'idx_comments_modelo': ('sentimiento_modelo', 'likes'),
+    'idx_comments_usuario': ('usuario', 'likes'),
+    'idx_comments_likes': ('likes',),
+    'idx_comments_fecha': ('fecha',),
+}
+
+# Filtros de igualdad (admiten varios valores) -> columna
+EQUALITY_FILTERS = ['sentimiento', 'sentimiento_modelo', 'tema', 'subtema', 'categoria', 'usuario', 'publicacion']
+SORT_COLUMNS = ['pos', 'likes', 'fecha', 'confianza', 'publicacion']
+
+
+class StoreNotReady(RuntimeError):
+    """El almacén todavía no se construyó para ningún dataset"""
+
+
+def store_frame(df: pd.DataFrame, category_codes: Optional[np.ndarray] = None,
+                timestamps: Optional[pd.Series] = None) -> pd.DataFrame:
+    """
+    Filas del almacén a partir del snapshot
+
+    Args:
+        df: Snapshot normalizado
+        category_codes: Código de categoría de reporte por fila (CategoryIndex)
+        timestamps: Fecha resuelta por fila (TimeIndex), NaT si no se pudo
+    """
+    out = pd.DataFrame(index=pd.RangeIndex(len(df), name='pos'))
+    for name, (_, logical) in STORE_COLUMNS.items():
+        col = resolve_column(df, logical) if logical else None
+        out[name] = df[col].astype(object).to_numpy() if col is not None else None
+
+    pub_col = resolve_column(df, 'publicacion')
+    if pub_col is not None:
+        out['publicacion'] = pd.to_numeric(df[pub_col], errors='coerce').astype('Int64').to_numpy()
+    out['likes'] = like_counts(df)
+    out['sentimiento'] = np.asarray(SENTIMENT_LABELS, dtype=object)[sentiment_codes(df)]
+
+    if category_codes is not None:
+        names = np.asarray(CATEGORY_NAMES + [None], dtype=object)
+        out['categoria'] = names[np.where(category_codes >= 0, category_codes, len(CATEGORY_NAMES))]
+    if timestamps is not None:
+        out['fecha'] = timestamps.dt.strftime('%Y-%m-%dT%H:%M:%S').to_numpy()
+
+    return out.astype(object).where(out.notna(), None)
+
+
+class CommentStore:
+    """Archivo SQLite con los comentarios del snapshot vigente"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or settings.COMMENT_STORE_PATH)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="comment-store")
+        self._lock = threading.Lock()
+        self._latest_version: Optional[str] = None
+
+    def connect(self) -> sqlite3.Connection:
+        """Conexión de solo lectura (una por consulta)"""
+        if not self.path.exists():
+            raise StoreNotReady("El almacén de comentarios aún no está construido")
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def meta(self) -> Dict[str, str]:
+        """Versiones del dataset y del modelo, filas y fecha de construcción del archivo"""
+        try:
+            with self.connect() as conn:
+                return {row['key']: row['value'] for row in conn.execute("SELECT key, value FROM store_meta")}
+        except (StoreNotReady, sqlite3.Error):
+            return {}
+
+    def build(
+        self,
+        frame: pd.DataFrame,
+        version: str,
+        model_version: Optional[str] = None,
+        append: bool = False
+    ) -> Optional[Path]:
+        """
+        Escribe el almacén a un temporal y lo activa con os.replace
+
+        Args:
+            frame: Filas del almacén (índice = pos en el snapshot)
+            version: Versión del dataset
+            model_version: Modelo de las etiquetas (None si no hay)
+            append: Copiar el archivo vigente e insertar solo `frame` (filas anexadas)
+
+        Returns:
+            Ruta del almacén o None si la versión quedó obsoleta durante la escritura
+        """
+        started = time.perf_counter()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            if append:
+                shutil.copyfile(self.path, tmp)
+            conn = sqlite3.connect(tmp)
+            try:
+                conn.execute("PRAGMA journal_mode=OFF")
+                conn.execute("PRAGMA synchronous=OFF")
+                if not append:
+                    columns = ", ".join(f"{name} {sqltype}" for name, (sqltype, _) in STORE_COLUMNS.items())
+                    conn.execute(f"CREATE TABLE comments (pos INTEGER PRIMARY KEY, {columns})")
+                    conn.execute("CREATE TABLE store_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+                placeholders = ", ".join("?" * (len(STORE_COLUMNS) + 1))
+                names = ", ".join(['pos', *STORE_COLUMNS])
+                for start in range(0, len(frame), INSERT_CHUNK_ROWS):
+                    chunk = frame.iloc[start:start + INSERT_CHUNK_ROWS]
+                    conn.executemany(
+                        f"INSERT INTO comments ({names}) VALUES ({placeholders})",
+                        chunk.itertuples(index=True, name=None)
+                    )
+
+                if not append:
+                    # Índices después de insertar: más rápido que mantenerlos fila a fila
+                    for index, columns in STORE_INDEXES.items():
+                        conn.execute(f"CREATE INDEX {index} ON comments ({', '.join(columns)})")
+                    conn.execute("ANALYZE")
+                rows = conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+                conn.execute("DELETE FROM store_meta WHERE key = 'model_version'")
+                conn.executemany("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", [
+                    ('dataset_version', version),
+                    ('rows', str(rows)),
+                    ('built_at', datetime.now().isoformat()),
+                    *([('model_version', model_version)] if model_version else []),
+                ])
+                conn.commit()
+            finally:
+                conn.close()
+
+            if self._is_stale(version):
+                return None
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        size_mb = self.path.stat().st_size / (1024 * 1024)
+        action = f"{len(frame)} filas anexadas" if append else f"{len(frame)} filas"
+        logger.info(f"🗄️ Almacén de comentarios: {action} en {elapsed:.0f} ms ({size_mb:.1f} MB)")
+        return self.path
+
+    def _is_stale(self, version: str) -> bool:
+        with self._lock:
+            return self._latest_version != version
+
+    def schedule_sync(self, manager) -> Future:
+        """
+        Encola la actualización para la versión vigente del DatasetManager
+
+        No hace nada si el archivo ya corresponde a (versión, modelo); si la
+        versión vigente solo anexó filas a la del archivo, inserta esas filas.
+        """
+        version = manager.version
+        with self._lock:
+            self._latest_version = version
+
+        def job() -> Optional[Path]:
+            if version is None or self._is_stale(version):
+                return None
+            try:
+                # df, índices y modelo de las etiquetas se leen juntos: una carga,
+                # un anexo o un etiquetado los reemplaza bajo el mismo lock
+                with manager.lock:
+                    if manager.version != version:
+                        return None
+                    df = manager.df
+                    categories = manager.categories
+                    timeline = manager.timeline
+                    model_version = manager.model_version
+                    meta = self.meta()
+                    start = 0
+                    if meta.get('model_version') == model_version:
+                        if meta.get('dataset_version') == version:
+                            logger.info(f"⏭️ Almacén de comentarios ya en la versión {version}")
+                            return self.path
+                        start = manager.appended_since(meta.get('dataset_version')) or 0
+                        if start != int(meta.get('rows', -1)):
+                            start = 0
+                codes = categories.codes if categories is not None else None
+                timestamps = timeline.row_timestamps(len(df)) if timeline is not None else None
+                if start:
+                    frame = store_frame(
+                        df.iloc[start:],
+                        codes[start:] if codes is not None else None,
+                        timestamps.iloc[start:] if timestamps is not None else None
+                    ).set_axis(pd.RangeIndex(start, len(df), name='pos'))
+                    return self.build(frame, version, model_version, append=True)
+                return self.build(store_frame(df, codes, timestamps), version, model_version)
+            except Exception as e:
+                logger.error(f"❌ Error construyendo el almacén de comentarios: {e}", exc_info=True)
+                return None
+
+        return self._executor.submit(job)
+
+    def query(
+        self,
+        filters: Dict[str, Any],
+        sort: str = '-likes',
+        page: int = 1,
+        page_size: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Filtra, ordena y pagina en SQLite
+
+        Args:
+            filters: Igualdad (listas) para EQUALITY_FILTERS y rangos
+                min_likes, max_likes, min_confianza, desde, hasta, es_respuesta
+            sort: Columna de SORT_COLUMNS, con '-' para orden descendente
+            page: Página (desde 1)
+            page_size: Filas por página
+
+        Returns:
+            Filas de la página, total de coincidencias y versión del almacén
+        """
+        descending = sort.startswith('-')
+        sort_column = sort.lstrip('-')
+        if sort_column not in SORT_COLUMNS:
+            raise ValueError(f"Orden no soportado: {sort}")
+
+        where: List[str] = []
+        params: List[Any] = []
+        for name in EQUALITY_FILTERS:
+            values = filters.get(name)
+            if values:
+                where.append(f"{name} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+
+        ranges = [
+            ('min_likes', 'likes >= ?'), ('max_likes', 'likes <= ?'),
+            ('min_confianza', 'confianza >= ?'),
+            ('desde', 'fecha >= ?'), ('hasta', 'fecha < ?'),
+        ]
+        for name, clause in ranges:
+            if filters.get(name) is not None:
+                where.append(clause)
+                params.append(filters[name])
+
+        if filters.get('es_respuesta') is not None:
+            reply = "(es_respuesta_a IS NOT NULL AND es_respuesta_a NOT LIKE '-%')"
+            where.append(reply if filters['es_respuesta'] else f"NOT {reply}")
+
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        # Los nulos van al final en ambos sentidos; pos desempata para paginar de forma estable
+        order_sql = (
+            f"ORDER BY {sort_column} IS NULL, {sort_column} {'DESC' if descending else 'ASC'}, pos"
+            if sort_column != 'pos' else f"ORDER BY pos {'DESC' if descending else 'ASC'}"
+        )
+        offset = (page - 1) * page_size
+
+        started = time.perf_counter()
+        with self.connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM comments {where_sql}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM comments {where_sql} {order_sql} LIMIT ? OFFSET ?",
+                [*params, page_size, offset]
+            ).fetchall()
+            version = conn.execute("SELECT value FROM store_meta WHERE key = 'dataset_version'").fetchone()
+
+        return {
+            'items': [dict(row) for row in rows],
+            'total': int(total),
+            'page': page,
+            'page_size': page_size,
+            'pages': (total + page_size - 1) // page_size,
+            'dataset_version': version[0] if version else None,
+            'query_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+
+
+# Instancia global
+comment_store = CommentStore()
+
+# Se reconstruye cada vez que el snapshot queda ingerido y etiquetado
+dataset_manager.subscribe('comment_store', lambda manager, analyzer: comment_store.schedule_sync(manager))
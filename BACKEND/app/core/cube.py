@@ -0,0 +1,191 @@
+"""
+Cubo de agregados precalculado (tema × subtema × sentimiento × publicación)
+
+Se construye con una sola agrupación al ingerir el dataset. Las consultas
+(slice & dice) filtran y re-agregan las celdas del cubo, cuyo tamaño depende
+del número de combinaciones distintas y no del número de comentarios.
+"""
+
+import logging
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+from app.core.columns import resolve_column, map_sentiment_label, like_counts
+
+logger = logging.getLogger(__name__)
+
+# Dimensión expuesta en la API -> columna lógica del dataset
+CUBE_DIMENSIONS: Dict[str, str] = {
+    'tema': 'tema_principal',
+    'subtema': 'subtema_o_keyword',
+    'publicacion': 'publicacion',
+    'sentimiento': 'sentimiento',
+}
+
+MISSING_LABEL = 'Sin dato'
+
+
+def _dimension_values(series: pd.Series, is_sentiment: bool = False) -> pd.Series:
+    """Prepara una columna como dimensión categórica sin nulos"""
+    if is_sentiment:
+        series = series.astype('category').map(map_sentiment_label)
+
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.fillna(0).astype('int64')
+
+    series = series.astype('category')
+    if MISSING_LABEL not in series.cat.categories:
+        series = series.cat.add_categories(MISSING_LABEL)
+    return series.fillna(MISSING_LABEL)
+
+
+class AggregateCube:
+    """
+    Cubo de conteos y suma de likes sobre las dimensiones de CUBE_DIMENSIONS
+    """
+
+    def __init__(self, cells: pd.DataFrame, total_rows: int):
+        self.cells = cells
+        self.total_rows = total_rows
+        self.dimensions = [d for d in CUBE_DIMENSIONS if d in cells.columns]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "AggregateCube":
+        """
+        Construye el cubo a partir del snapshot con una sola agrupación
+
+        Args:
+            df: DataFrame del dataset cargado
+
+        Returns:
+            AggregateCube con una fila por combinación observada
+        """
+        keys = {}
+        for dim, logical in CUBE_DIMENSIONS.items():
+            col = resolve_column(df, logical)
+            if col is not None:
+                keys[dim] = _dimension_values(df[col], is_sentiment=(dim == 'sentimiento'))
+
+        if not keys:
+            raise ValueError("El dataset no tiene columnas para el cubo")
+
+        frame = pd.DataFrame(keys)
+        frame['likes'] = like_counts(df)
+
+        cells = (
+            frame.groupby(list(keys), observed=True, sort=False)
+            .agg(count=('likes', 'size'), likes=('likes', 'sum'))
+            .reset_index()
+        )
+
+        logger.info(f"🧊 Cubo construido: {len(cells)} celdas para {len(df)} comentarios")
+        return cls(cells, len(df))
+
+    def append(self, df: pd.DataFrame) -> "AggregateCube":
+        """Agrega solo las filas nuevas y las suma a las celdas existentes"""
+        delta = AggregateCube.from_frame(df)
+        cells = pd.concat([self.cells, delta.cells], ignore_index=True)
+
+        for dim in self.dimensions:
+            column = cells[dim]
+            if pd.api.types.is_numeric_dtype(column) and not isinstance(column.dtype, pd.CategoricalDtype):
+                cells[dim] = column.fillna(0).astype('int64')
+            else:
+                cells[dim] = column.astype(object).fillna(MISSING_LABEL).astype('category')
+
+        self.cells = (
+            cells.groupby(self.dimensions, observed=True, sort=False)[['count', 'likes']]
+            .sum()
+            .reset_index()
+        )
+        self.total_rows += delta.total_rows
+        return self
+
+    def _mask(self, filters: Dict[str, List[Any]]) -> pd.Series:
+        """Máscara booleana sobre las celdas para los filtros dados"""
+        mask = pd.Series(True, index=self.cells.index)
+
+        for dim, values in filters.items():
+            if not values:
+                continue
+            if dim not in self.dimensions:
+                raise ValueError(f"Dimensión desconocida: {dim}")
+
+            column = self.cells[dim]
+            if pd.api.types.is_numeric_dtype(column) and not isinstance(column.dtype, pd.CategoricalDtype):
+                wanted = [int(v) for v in values]
+                mask &= column.isin(wanted)
+            else:
+                wanted = [str(v) for v in values]
+                mask &= column.astype(str).isin(wanted)
+
+        return mask
+
+    def query(
+        self,
+        filters: Optional[Dict[str, List[Any]]] = None,
+        group_by: Optional[List[str]] = None,
+        sort_by: str = 'count',
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Slice & dice sobre el cubo
+
+        Args:
+            filters: Dimensión -> valores permitidos
+            group_by: Dimensiones a conservar (el resto se agrega)
+            sort_by: 'count' o 'likes'
+            limit: Máximo de filas a devolver
+
+        Returns:
+            Diccionario con filas agregadas y totales del corte
+        """
+        group_by = group_by or []
+        for dim in group_by:
+            if dim not in self.dimensions:
+                raise ValueError(f"Dimensión desconocida: {dim}")
+        if sort_by not in ('count', 'likes'):
+            raise ValueError(f"Orden no soportado: {sort_by}")
+
+        selected = self.cells[self._mask(filters or {})]
+
+        if group_by:
+            result = (
+                selected.groupby(group_by, observed=True, sort=False)[['count', 'likes']]
+                .sum()
+                .reset_index()
+                .sort_values(sort_by, ascending=False)
+            )
+        else:
+            result = pd.DataFrame([{
+                'count': int(selected['count'].sum()),
+                'likes': int(selected['likes'].sum())
+            }])
+
+        total_rows = len(result)
+        if limit:
+            result = result.head(limit)
+
+        rows = []
+        for record in result.to_dict(orient='records'):
+            rows.append({
+                key: (int(value) if key in ('count', 'likes', 'publicacion') else str(value))
+                for key, value in record.items()
+            })
+
+        return {
+            'rows': rows,
+            'total_groups': total_rows,
+            'total_count': int(selected['count'].sum()),
+            'total_likes': int(selected['likes'].sum())
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Dimensiones disponibles y su cardinalidad"""
+        return {
+            'dimensions': {
+                dim: int(self.cells[dim].nunique()) for dim in self.dimensions
+            },
+            'cells': len(self.cells),
+            'total_rows': self.total_rows
+        }
@@ -1,57 +1,427 @@
+import os
+import threading
+import numpy as np
 import pandas as pd
 import logging
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.cube import AggregateCube
+from app.core.threads import ThreadIndex
+from app.core.posts import PostIndex
+from app.core.weighted import WeightedMetrics
+from app.core.timeindex import TimeIndex
+from app.core.heavy_hitters import HeavyHitterIndex
+from app.core.cardinality import CardinalityIndex
+from app.core.categories import CategoryIndex
+from app.core.search import SearchIndex
+from app.core.delta import concat_snapshots, delta_files, row_keys
+from app.core.pipeline import IngestionPipeline, apply_schema, schema_for  # noqa: F401
+from app.core.snapshot_cache import load_cached_frame, save_cached_frame, source_fingerprint
+from app.core.versions import VersionStore, dataset_version, row_hashes
+from app.utils.config import settings
 
 logger = logging.getLogger(__name__)
 
+
+
+def locked(method):
+    """Serializa el método con el lock del DatasetManager (cargas, anexos y etiquetas)"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class DatasetManager:
     """Gestor de dataset simplificado"""
     
+    # Estructuras precalculadas: atributo -> constructor a partir del snapshot
+    INDEX_BUILDERS = {
+        'cube': AggregateCube.from_frame,
+        'threads': ThreadIndex.from_frame,
+        'posts': PostIndex.from_frame,
+        'weighted': WeightedMetrics.from_frame,
+        'timeline': TimeIndex.from_frame,
+        'heavy_hitters': HeavyHitterIndex.from_frame,
+        'cardinality': CardinalityIndex.from_frame,
+        'categories': CategoryIndex.from_frame,
+        'search': SearchIndex.from_frame,
+    }
+    # Índices que se actualizan solo con las filas anexadas; los demás dependen
+    # del orden global del snapshot (hilos, publicaciones, línea de tiempo)
+    INCREMENTAL_INDEXES = ('cube', 'weighted', 'heavy_hitters', 'cardinality', 'categories', 'search')
+    # Índices que leen la confianza del etiquetado masivo del modelo
+    LABEL_INDEXES = ('weighted', 'timeline')
+    
     def __init__(self):
         self.df = None
+        self.memory_report: Dict[str, Dict[str, Any]] = {}
+        self.cube: Optional[AggregateCube] = None
+        self.threads: Optional[ThreadIndex] = None
+        self.posts: Optional[PostIndex] = None
+        self.weighted: Optional[WeightedMetrics] = None
+        self.timeline: Optional[TimeIndex] = None
+        self.heavy_hitters: Optional[HeavyHitterIndex] = None
+        self.cardinality: Optional[CardinalityIndex] = None
+        self.categories: Optional[CategoryIndex] = None
+        self.search: Optional[SearchIndex] = None
+        # Versión direccionada por contenido: parte de la clave de toda caché derivada
+        self.version: Optional[str] = None
+        self.versions = VersionStore()
+        # Hashes de contenido por fila (se calculan al anexar si vienen de caché)
+        self.row_hashes: Optional[np.ndarray] = None
+        # Columnas del etiquetado masivo y modelo que las produjo: no forman
+        # parte de la versión, las cachés derivadas usan (version, model_version)
+        self.label_columns: List[str] = []
+        self.model_version: Optional[str] = None
+        # Duración de cada etapa y esquema detectado en la última ingesta
+        self.ingestion: Optional[Dict[str, Any]] = None
+        # Hashes de (Publicacion, ID_Comentario) para deduplicar anexos
+        self.row_keys: Optional[pd.Index] = None
+        # Las escrituras del snapshot (carga, anexo, etiquetas) llegan desde
+        # rutas y desde hilos de fondo: se serializan. Reentrante porque la
+        # carga reaplica los anexos guardados.
+        self.lock = threading.RLock()
+        # Estructuras derivadas fuera del manager (almacén SQLite, similitud,
+        # reportes): se avisan cuando el snapshot queda ingerido y etiquetado
+        self._subscribers: List[Tuple[str, Callable[..., None]]] = []
     
-    def load_dataset(self, filepath: str) -> pd.DataFrame:
+    def subscribe(self, name: str, callback: Callable[..., None]) -> None:
+        """
+        Registra un suscriptor del snapshot listo
+        
+        Args:
+            name: Identificador (volver a registrarlo reemplaza el anterior)
+            callback: callback(manager, analyzer); debe encolar su trabajo y volver
         """
-        Carga el dataset desde un archivo CSV
+        self._subscribers = [(n, c) for n, c in self._subscribers if n != name]
+        self._subscribers.append((name, callback))
+    
+    def publish(self, analyzer) -> None:
         """
+        Avisa a los suscriptores que el snapshot vigente terminó de ingerirse
+        y etiquetarse (ver app.core.labeling.schedule_refresh)
+        """
+        for name, callback in list(self._subscribers):
+            try:
+                callback(self, analyzer)
+            except Exception as e:
+                logger.error(f"❌ Error en el suscriptor '{name}' del dataset: {e}", exc_info=True)
+    
+    def build_indexes(self, df: pd.DataFrame, version: Optional[str] = None) -> None:
+        """
+        Reconstruye las estructuras precalculadas sobre el snapshot actual
+        
+        Se llama una vez por ingesta (arranque o carga de un CSV nuevo) para
+        que los endpoints respondan sin recorrer las filas.
+        
+        Args:
+            df: Snapshot normalizado
+            version: Versión de contenido ya calculada (si no, se calcula aquí)
+        """
+        self.df = df
+        self.row_keys = None
+        self.row_hashes = None
+        self.label_columns = []
+        self.model_version = None
+        if df is not None and version is None:
+            self.row_hashes = row_hashes(df)
+            version = dataset_version(self.row_hashes, df.columns)
+        self.version = version if df is not None else None
+        
+        for name, builder in self.INDEX_BUILDERS.items():
+            if df is None or df.empty:
+                setattr(self, name, None)
+                continue
+            try:
+                setattr(self, name, builder(df))
+            except Exception as e:
+                logger.error(f"Error construyendo índice '{name}': {e}")
+                setattr(self, name, None)
+    
+    @locked
+    def load_dataset(
+        self,
+        filepath: str,
+        progress: Optional[Callable[..., None]] = None,
+        strict: bool = False,
+        source: Optional[str] = None,
+        replay_deltas: bool = True,
+        reference_date: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Carga el dataset desde un archivo CSV con el pipeline de ingesta
+        
+        Si existe una caché columnar para el mismo contenido del CSV se usa
+        esa y se omiten las etapas read -> types. En ambos casos el snapshot
+        canónico se produce una sola vez y se indexa.
+        
+        Args:
+            filepath: Ruta del CSV
+            progress: Callback (etapa, **info) para informar el avance
+            strict: Rechazar CSV sin columna de texto reconocible
+            source: Ruta definitiva del dataset si filepath es una copia
+                temporal (clave de caché, anexos y manifiesto de versiones)
+            replay_deltas: Volver a aplicar los anexos guardados de `source`
+            reference_date: Fecha de extracción (ISO) del CSV; ver resolve_reference_date
+        """
+        source = source or filepath
         try:
             logger.info(f"Cargando dataset desde: {filepath}")
-            self.df = pd.read_csv(filepath, encoding="utf-8")
-            logger.info(f"Dataset cargado: {len(self.df)} registros")
-            
-            # Normalizar columnas
-            self.df.columns = [col.strip().lower() for col in self.df.columns]
-            
-            # Mapeo automático
-            for col in self.df.columns:
-                col_lower = col.lower()
-                if any(keyword in col_lower for keyword in ['texto', 'comentario', 'comment']):
-                    self.df = self.df.rename(columns={col: 'comentario'})
-                    print(f"📝 Columna renombrada: {col} -> comentario")
-                    break
-            
-            for col in self.df.columns:
-                col_lower = col.lower()
-                if any(keyword in col_lower for keyword in ['sentimiento', 'sentiment', 'rating']):
-                    self.df = self.df.rename(columns={col: 'sentimiento'})
-                    print(f"📝 Columna renombrada: {col} -> sentimiento")
-                    break
-            
-            # Verificar que tenemos las columnas necesarias
-            if 'comentario' not in self.df.columns:
-                print("⚠️  No se encontró columna 'comentario', usando primera columna")
-                self.df = self.df.rename(columns={self.df.columns[0]: 'comentario'})
-            
-            if 'sentimiento' not in self.df.columns:
-                print("⚠️  No se encontró columna 'sentimiento', creando columna neutral")
-                self.df['sentimiento'] = 'Neutral'
-            
-            print(f"✅ Columnas finales: {list(self.df.columns)}")
+            pipeline = IngestionPipeline(strict=strict, progress=progress)
+            pipeline.report('fingerprint')
+            fingerprint = pipeline.timed('fingerprint', source_fingerprint, filepath)
+            
+            cached = pipeline.timed('cache', load_cached_frame, source, fingerprint)
+            hashes = None
+            if cached is not None:
+                df, self.memory_report, version = cached
+            else:
+                df = pipeline.run(filepath)
+                self.memory_report = pipeline.memory_report
+                version = None
+            
+            if version is None:
+                pipeline.report('version', rows=len(df))
+                hashes = pipeline.timed('version', row_hashes, df)
+                version = dataset_version(hashes, df.columns)
+                # También refresca cachés escritas antes de guardar la versión
+                save_cached_frame(source, df, self.memory_report, fingerprint, version)
+            
+            # Las antigüedades relativas ("7 sem") se cuentan desde la extracción
+            reference_date = self.resolve_reference_date(filepath, fingerprint, reference_date)
+            df.attrs['reference_date'] = reference_date
+            df.attrs['load_date'] = datetime.now().isoformat()
+            pipeline.report('indexes', rows=len(df))
+            pipeline.timed('indexes', self.build_indexes, df, version)
+            self.row_hashes = hashes
+            
+            self.ingestion = pipeline.summary(str(source), df, from_cache=cached is not None)
+            self.ingestion['version'] = version
+            self.versions.record(
+                version,
+                source=str(source),
+                source_sha256=fingerprint,
+                rows=int(len(df)),
+                columns=[str(c) for c in df.columns],
+                parent=None,
+                deltas=[],
+                reference_date=reference_date
+            )
+            logger.info(
+                f"✅ Ingesta completada: {len(df)} registros en {self.ingestion['total_ms']:.0f} ms "
+                f"({', '.join(f'{k} {v:.0f}' for k, v in self.ingestion['stages_ms'].items())})"
+            )
+            
+            # Deltas aceptados anteriormente sobre este mismo dataset
+            if replay_deltas:
+                for path in delta_files(source):
+                    self.append_dataset(str(path))
             return self.df
             
         except Exception as e:
             logger.error(f"Error cargando dataset: {e}")
             print(f"❌ Error: {e}")
             raise
+    
+    def resolve_reference_date(
+        self,
+        filepath: str,
+        fingerprint: str,
+        reference_date: Optional[str] = None
+    ) -> str:
+        """
+        Fecha de extracción del CSV para resolver antigüedades relativas
+        
+        Prioridad: la indicada en la carga, settings.DATASET_REFERENCE_DATE,
+        la registrada en el manifiesto para el mismo contenido (sha256) y,
+        la primera vez que se ve ese contenido, la fecha de modificación del
+        archivo. Queda guardada en el manifiesto, así que copiar, restaurar o
+        volver a subir el mismo CSV no desplaza las fechas.
+        """
+        explicit = reference_date or settings.DATASET_REFERENCE_DATE
+        if explicit:
+            return pd.Timestamp(explicit).isoformat()
+        recorded = self.versions.reference_date(fingerprint)
+        if recorded:
+            return recorded
+        return datetime.fromtimestamp(os.path.getmtime(filepath)).isoformat()
+    
+    @locked
+    def append_dataset(
+        self,
+        filepath: str,
+        progress: Optional[Callable[..., None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Anexa al snapshot vigente las filas nuevas de un CSV delta
+        
+        El delta pasa por el pipeline de ingesta (modo estricto), se descartan
+        las filas cuya clave (Publicacion, ID_Comentario) ya existe y solo las
+        nuevas se agregan al snapshot y a los índices incrementales.
+        
+        Args:
+            filepath: Ruta del CSV delta
+            progress: Callback (etapa, **info) para informar el avance
+        
+        Returns:
+            Reporte con filas recibidas, nuevas, duplicadas y tiempos por etapa
+        """
+        if self.df is None:
+            raise ValueError("No hay dataset base cargado")
+        
+        pipeline = IngestionPipeline(strict=True, progress=progress)
+        delta = pipeline.run(filepath)
+        
+        pipeline.report('dedup', rows=len(delta))
+        if self.row_keys is None:
+            self.row_keys = pipeline.timed('dedup', row_keys, self.df)
+        keys = pipeline.timed('dedup', row_keys, delta)
+        fresh = pipeline.timed('dedup', lambda: ~(keys.isin(self.row_keys) | keys.duplicated()))
+        new_rows = delta[fresh].reset_index(drop=True)
+        
+        if len(new_rows):
+            pipeline.report('merge', rows=len(new_rows))
+            merged = pipeline.timed('merge', concat_snapshots, self.df, new_rows)
+            # Filas nuevas tal como quedaron en el snapshot (metadatos completados)
+            new_rows = merged.iloc[len(self.df):].reset_index(drop=True)
+            
+            # La versión se extiende con los hashes de las filas nuevas
+            pipeline.report('version', rows=len(new_rows))
+            if list(merged.columns) == list(self.df.columns):
+                if self.row_hashes is None:
+                    self.row_hashes = pipeline.timed('version', row_hashes, self.content(self.df))
+                tail = pipeline.timed('version', row_hashes, self.content(merged.iloc[len(self.df):]))
+                hashes = np.concatenate([self.row_hashes, tail])
+            else:
+                hashes = pipeline.timed('version', row_hashes, self.content(merged))
+            parent = self.version
+            
+            pipeline.report('indexes', rows=len(merged))
+            pipeline.timed('indexes', self._append_indexes, merged, new_rows)
+            self.df = merged
+            self.row_keys = self.row_keys.append(keys[fresh])
+            self.row_hashes = hashes
+            self.version = dataset_version(hashes, self.content(merged).columns)
+            
+            base = self.versions.get(parent) or {}
+            self.versions.record(
+                self.version,
+                source=base.get('source'),
+                source_sha256=base.get('source_sha256'),
+                rows=int(len(merged)),
+                columns=[str(c) for c in merged.columns],
+                parent=parent,
+                deltas=base.get('deltas', []) + [os.path.basename(filepath)],
+                reference_date=base.get('reference_date')
+            )
+        
+        summary = pipeline.summary(str(filepath), delta, from_cache=False)
+        summary.update({
+            'appended': int(len(new_rows)),
+            'duplicates': int(len(delta) - len(new_rows)),
+            'total_rows': int(len(self.df)),
+            'version': self.version
+        })
+        if self.ingestion is not None:
+            self.ingestion.setdefault('deltas', []).append(summary)
+        
+        logger.info(
+            f"➕ Delta {os.path.basename(filepath)}: {summary['appended']} filas nuevas, "
+            f"{summary['duplicates']} duplicadas ({summary['total_ms']:.0f} ms)"
+        )
+        return summary
+    
+    @locked
+    def attach_labels(
+        self,
+        labels: pd.DataFrame,
+        model_version: str,
+        expected_version: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Agrega (o reemplaza) las columnas del etiquetado masivo del modelo
+        
+        Las filas no cambian de posición, así que solo se reconstruyen los
+        índices que leen la confianza. La versión del dataset no cambia (solo
+        depende del contenido ingerido); el modelo queda en model_version.
+        
+        Args:
+            labels: Columnas alineadas posicionalmente con el snapshot
+            model_version: Versión del modelo que las produjo
+            expected_version: Versión del snapshot sobre la que se calcularon;
+                si ya no es la vigente no se agregan
+        
+        Returns:
+            Versiones del dataset y del modelo, o None si el snapshot cambió
+        """
+        if expected_version is not None and self.version != expected_version:
+            return None
+        if self.df is None or len(labels) != len(self.df):
+            return None
+        df = self.df.copy(deep=False)
+        for col in labels.columns:
+            df[col] = labels[col].array
+        
+        for name in self.LABEL_INDEXES:
+            try:
+                setattr(self, name, self.INDEX_BUILDERS[name](df))
+            except Exception as e:
+                logger.error(f"Error construyendo índice '{name}': {e}")
+        
+        self.df = df
+        self.label_columns = list(labels.columns)
+        self.model_version = model_version
+        self.versions.record(self.version, model_version=model_version)
+        return {'dataset_version': self.version, 'model_version': model_version}
+    
+    def content(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Columnas ingeridas (sin las del etiquetado): base de la versión"""
+        labels = [c for c in self.label_columns if c in df.columns]
+        return df.drop(columns=labels) if labels else df
+    
+    def appended_since(self, version: Optional[str]) -> Optional[int]:
+        """
+        Filas de `version` si la vigente deriva de ella solo por anexos
+        
+        Las cachés derivadas en esa versión pueden completarse con las filas
+        desde esa posición en lugar de reconstruirse.
+        
+        Returns:
+            Filas de `version` o None si no es un antecesor por anexos
+        """
+        if version is None:
+            return None
+        current = self.versions.get(self.version) if self.version else None
+        while current is not None and current.get('parent'):
+            parent = self.versions.get(current['parent'])
+            if parent is None:
+                return None
+            if parent.get('version') == version:
+                return int(parent['rows'])
+            current = parent
+        return None
+    
+    def _append_indexes(self, df: pd.DataFrame, new_rows: pd.DataFrame) -> None:
+        """Actualiza los índices incrementales y reconstruye el resto sobre df"""
+        for name, builder in self.INDEX_BUILDERS.items():
+            index = getattr(self, name)
+            try:
+                if name in self.INCREMENTAL_INDEXES and index is not None:
+                    # append devuelve el índice extendido (el mismo o uno nuevo)
+                    setattr(self, name, index.append(new_rows))
+                else:
+                    setattr(self, name, builder(df))
+            except Exception as e:
+                logger.warning(f"⚠️ Índice '{name}' reconstruido completo tras fallar el anexo: {e}")
+                try:
+                    setattr(self, name, builder(df))
+                except Exception as e:
+                    logger.error(f"Error construyendo índice '{name}': {e}")
+                    setattr(self, name, None)
 
 # Instancia global para importación
 dataset_manager = DatasetManager()
@@ -0,0 +1,131 @@
+"""
+Ingesta incremental (append) de comentarios nuevos
+
+Un CSV delta pasa por el mismo IngestionPipeline que una carga completa;
+luego se descartan las filas cuya clave (Publicacion, ID_Comentario) ya está
+en el snapshot. Las claves se guardan como hashes uint64 en un pd.Index, así
+que la deduplicación es una búsqueda en tabla hash por fila nueva y no
+depende del tamaño del dataset.
+
+Los deltas aceptados se guardan en DATA_DIR/deltas/<dataset>/ y se vuelven a
+aplicar, en orden, al cargar el dataset base (p. ej. en el arranque).
+"""
+
+import logging
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import List, Union
+
+import pandas as pd
+
+from app.core.columns import resolve_column
+from app.core.pipeline import STRING_DTYPE, _to_compact_count
+from app.core.posts import refill_post_metadata
+from app.utils.config import settings
+from app.utils.dataset_config import COLUMN_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+# Identidad de un comentario; si falta el id se usa autor + texto
+KEY_COLUMNS = ('publicacion', 'id_comentario')
+FALLBACK_KEY_COLUMNS = ('publicacion', 'usuario', 'texto_comentario')
+DELTAS_DIRNAME = "deltas"
+
+
+def row_keys(df: pd.DataFrame) -> pd.Index:
+    """
+    Hash uint64 de la clave de cada fila
+
+    Publicacion se normaliza a entero ('12' y 12.0 son la misma publicación)
+    y el resto de columnas a texto sin espacios extremos.
+    """
+    names = KEY_COLUMNS if all(resolve_column(df, n) for n in KEY_COLUMNS) else FALLBACK_KEY_COLUMNS
+    parts = {}
+    for name in names:
+        col = resolve_column(df, name)
+        if col is None:
+            continue
+        values = df[col]
+        if name == 'publicacion':
+            parts[name] = pd.to_numeric(values, errors='coerce').astype('Int64').astype(str)
+        else:
+            parts[name] = values.astype(object).astype(str).str.strip()
+
+    if not parts:
+        raise ValueError("El dataset no tiene columnas para identificar comentarios")
+
+    keys = pd.DataFrame(parts).reset_index(drop=True)
+    return pd.Index(pd.util.hash_pandas_object(keys, index=False).to_numpy())
+
+
+def concat_snapshots(base: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """
+    Snapshot base + filas nuevas conservando los tipos compactos
+
+    Las columnas categóricas se extienden con las categorías nuevas al final
+    (los códigos del base no cambian) y los conteos que ya no caben en su
+    entero se vuelven a compactar. Las filas nuevas de publicaciones que
+    ya estaban en el base toman de él sus metadatos. El DataFrame base no se
+    modifica.
+    """
+    base = base.copy(deep=False)
+    delta = delta.copy(deep=False)
+
+    for col in base.columns:
+        if col not in delta.columns or not isinstance(base[col].dtype, pd.CategoricalDtype):
+            continue
+        categories = base[col].cat.categories
+        incoming = pd.Index(delta[col].dropna().astype(object).unique())
+        new = incoming.difference(categories)
+        if len(new):
+            categories = categories.append(new)
+            base[col] = base[col].cat.set_categories(categories)
+        delta[col] = pd.Categorical(delta[col].astype(object), categories=categories)
+
+    merged = pd.concat([base, delta], ignore_index=True)
+    # concat solo conserva attrs idénticos: la fecha de referencia es la del base
+    merged.attrs = dict(base.attrs)
+
+    for col in base.columns:
+        if merged[col].dtype == base[col].dtype:
+            continue
+        kind = COLUMN_SCHEMA.get(col)
+        if kind == 'count':
+            merged[col] = _to_compact_count(merged[col])
+        elif kind == 'string':
+            merged[col] = merged[col].astype(STRING_DTYPE)
+        elif kind == 'category':
+            merged[col] = merged[col].astype('category')
+
+    merged = refill_post_metadata(merged, len(base))
+    merged.attrs = dict(base.attrs)
+    return merged
+
+
+def delta_dir(filepath: Union[str, Path]) -> Path:
+    """Directorio de deltas de un dataset base"""
+    return Path(settings.DATA_DIR) / DELTAS_DIRNAME / Path(filepath).stem
+
+
+def delta_files(filepath: Union[str, Path]) -> List[Path]:
+    """Deltas aceptados de un dataset, en el orden en que se aplicaron"""
+    directory = delta_dir(filepath)
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("*.csv"))
+
+
+def delta_path(filepath: Union[str, Path], filename: str) -> Path:
+    """Ruta para guardar un delta nuevo (prefijo de fecha para ordenarlos)"""
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    return delta_dir(filepath) / f"{stamp}_{Path(filename).name}"
+
+
+def clear_deltas(filepath: Union[str, Path]) -> int:
+    """Elimina los deltas de un dataset (al reemplazarlo con una carga completa)"""
+    files = delta_files(filepath)
+    if files:
+        shutil.rmtree(delta_dir(filepath), ignore_errors=True)
+        logger.info(f"🧹 {len(files)} deltas descartados de {Path(filepath).name}")
+    return len(files)
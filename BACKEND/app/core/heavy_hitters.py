@@ -0,0 +1,309 @@
+"""
+Palabras más frecuentes con memoria acotada (Space-Saving)
+
+Cada sketch guarda como máximo `capacity` contadores. Una palabra no
+monitoreada reemplaza a la de menor cuenta y hereda esa cuenta como error,
+así que para cualquier palabra reportada:
+
+    cuenta_real ∈ [count - error, count]   y   error ≤ N / capacity
+
+donde N es el total de tokens procesados por ese sketch. Hay un sketch
+global y uno por sentimiento (3 grupos). Los temas son cientos o miles, así
+que comparten un único sketch con claves (tema, palabra) y capacidad total
+HEAVY_HITTERS_TOPIC_CAPACITY: la memoria no crece con el número de temas.
+Todos se actualizan por bloques de filas (pre-agregados con groupby) a
+medida que llegan comentarios.
+"""
+
+import heapq
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes
+from app.core.text import tokenize_series
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 5000
+
+
+class SpaceSaving:
+    """
+    Sketch Space-Saving con actualizaciones ponderadas
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity debe ser positiva")
+        self.capacity = capacity
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+        self.total = 0
+        # Vistas de un sketch compartido: cota y piso son los del sketch completo
+        self._bound: Optional[float] = None
+        self._floor: Optional[int] = None
+        # Montículo perezoso de (cuenta, item); las entradas obsoletas se descartan al sacar
+        self._heap: List[Tuple[int, Hashable]] = []
+
+    def _pop_min(self) -> Tuple[Hashable, int]:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item, count
+
+    def update(self, item: Hashable, weight: int = 1) -> None:
+        """Suma `weight` ocurrencias de `item`"""
+        self.total += weight
+
+        if item in self.counts:
+            self.counts[item] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+        else:
+            evicted, floor = self._pop_min()
+            del self.counts[evicted]
+            del self.errors[evicted]
+            self.counts[item] = floor + weight
+            self.errors[item] = floor
+
+        heapq.heappush(self._heap, (self.counts[item], item))
+
+        # Compactar el montículo cuando acumula demasiadas entradas obsoletas
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(c, i) for i, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def update_counts(self, counts: pd.Series) -> None:
+        """Aplica un bloque pre-agregado (item -> ocurrencias)"""
+        # Primero las más frecuentes: reduce desalojos de palabras que sí quedarán
+        counts = counts.sort_values(ascending=False)
+        self.update_many(counts.index.tolist(), counts.to_numpy().tolist())
+
+    def update_many(self, items: List[Hashable], weights: List[int]) -> None:
+        """Aplica pares (item, ocurrencias) ya ordenados de mayor a menor"""
+        counts = self.counts
+        for item, weight in zip(items, weights):
+            # Camino rápido: item ya monitoreado (no toca el montículo hasta compactar)
+            if item in counts:
+                self.total += weight
+                counts[item] += weight
+                heapq.heappush(self._heap, (counts[item], item))
+                if len(self._heap) > 4 * self.capacity:
+                    self._heap = [(c, i) for i, c in counts.items()]
+                    heapq.heapify(self._heap)
+            else:
+                self.update(item, weight)
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """
+        Combina dos sketches (p. ej. calculados sobre particiones distintas)
+
+        Suma cuentas y errores; las palabras ausentes en un lado suman su
+        cuenta mínima como cota. Se conservan las `capacity` mayores.
+        """
+        floor_self = self.min_count if len(self.counts) >= self.capacity else 0
+        floor_other = other.min_count if len(other.counts) >= other.capacity else 0
+
+        counts, errors = {}, {}
+        for item in set(self.counts) | set(other.counts):
+            counts[item] = self.counts.get(item, floor_self) + other.counts.get(item, floor_other)
+            errors[item] = self.errors.get(item, floor_self) + other.errors.get(item, floor_other)
+
+        keep = heapq.nlargest(self.capacity, counts, key=counts.get)
+        self.counts = {item: counts[item] for item in keep}
+        self.errors = {item: errors[item] for item in keep}
+        self.total += other.total
+        self._heap = [(c, i) for i, c in self.counts.items()]
+        heapq.heapify(self._heap)
+        return self
+
+    def restrict(self, key: Hashable, total: int) -> "SpaceSaving":
+        """
+        Vista de solo lectura de las entradas (key, item) de un sketch con
+        claves compuestas, con `item` como clave
+
+        Args:
+            key: Primer componente de la clave (p. ej. el tema)
+            total: Tokens procesados de ese grupo
+        """
+        view = SpaceSaving(self.capacity)
+        for (group, item), count in self.counts.items():
+            if group == key:
+                view.counts[item] = count
+                view.errors[item] = self.errors[(group, item)]
+        view.total = total
+        view._bound = self.error_bound
+        view._floor = self.floor
+        return view
+
+    @property
+    def min_count(self) -> int:
+        return min(self.counts.values()) if self.counts else 0
+
+    @property
+    def floor(self) -> int:
+        """Cuenta máxima posible de un item no monitoreado"""
+        if self._floor is not None:
+            return self._floor
+        return self.min_count if len(self.counts) >= self.capacity else 0
+
+    @property
+    def shared(self) -> bool:
+        """Es una vista de un sketch compartido (ver restrict)"""
+        return self._bound is not None
+
+    @property
+    def error_bound(self) -> float:
+        """Cota superior del sobreconteo de cualquier palabra (N / capacity)"""
+        if self._bound is not None:
+            return self._bound
+        return self.total / self.capacity
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Palabras más frecuentes con su error
+
+        `guaranteed` indica que la palabra pertenece con certeza al top-k:
+        su cuenta mínima (count - error) supera la cuenta del (k+1)-ésimo y
+        la de cualquier palabra no monitoreada.
+        """
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        threshold = max(ranked[limit][1] if len(ranked) > limit else 0, self.floor)
+
+        return [
+            {
+                'word': str(item),
+                'count': int(count),
+                'error': int(self.errors[item]),
+                'min_count': int(count - self.errors[item]),
+                'guaranteed': count - self.errors[item] >= threshold
+            }
+            for item, count in ranked[:limit]
+        ]
+
+
+class HeavyHitterIndex:
+    """
+    Sketches Space-Saving global y por sentimiento, y uno compartido por los
+    temas con claves (tema, palabra)
+    """
+
+    def __init__(self, capacity: Optional[int] = None, topic_capacity: Optional[int] = None):
+        self.capacity = capacity or settings.HEAVY_HITTERS_CAPACITY
+        self.overall = SpaceSaving(self.capacity)
+        self.by_sentiment: Dict[str, SpaceSaving] = {}
+        self.by_topic = SpaceSaving(topic_capacity or settings.HEAVY_HITTERS_TOPIC_CAPACITY)
+        # Tokens por tema (el total de cada vista)
+        self.topic_totals: Dict[str, int] = {}
+        self.rows = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, capacity: Optional[int] = None) -> "HeavyHitterIndex":
+        """Construye los sketches recorriendo el snapshot por bloques"""
+        index = cls(capacity)
+        index.append(df)
+        logger.info(
+            f"📈 Sketches de palabras: {index.overall.total} tokens, "
+            f"{len(index.by_sentiment)} sentimientos, {len(index.topic_totals)} temas "
+            f"(capacidad {index.capacity}, {index.by_topic.capacity} compartida por temas)"
+        )
+        return index
+
+    def _sketch(self, group: Dict[str, SpaceSaving], key: str) -> SpaceSaving:
+        if key not in group:
+            group[key] = SpaceSaving(self.capacity)
+        return group[key]
+
+    @staticmethod
+    def _pair_counts(tokens: pd.Series, labels: np.ndarray) -> pd.Series:
+        """Ocurrencias de cada (grupo, palabra) de un bloque"""
+        return pd.DataFrame({'label': labels, 'word': tokens.to_numpy()}).value_counts(sort=False)
+
+    def _update_groups(self, group: Dict[str, SpaceSaving], tokens: pd.Series, labels: np.ndarray) -> None:
+        """
+        Cuenta (grupo, palabra) de un bloque y actualiza el sketch de cada grupo
+
+        Los pares se ordenan una vez con lexsort y se reparten por grupo con
+        listas planas en lugar de iterar un groupby de pandas por grupo.
+        """
+        if tokens.empty:
+            return
+        pairs = self._pair_counts(tokens, labels)
+        label_values = pairs.index.get_level_values(0).astype(str).to_numpy()
+        words = pairs.index.get_level_values(1).to_numpy()
+        weights = pairs.to_numpy()
+
+        order = np.lexsort((-weights, label_values))
+        label_values, words, weights = label_values[order], words[order], weights[order]
+        bounds = np.flatnonzero(label_values[1:] != label_values[:-1]) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(label_values)]))
+
+        words, weights = words.tolist(), weights.tolist()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self._sketch(group, label_values[start]).update_many(words[start:end], weights[start:end])
+
+    def _update_topics(self, tokens: pd.Series, topics: np.ndarray) -> None:
+        """Actualiza el sketch compartido con los pares (tema, palabra) de un bloque"""
+        if tokens.empty:
+            return
+        pairs = self._pair_counts(tokens, topics.astype(str))
+        for topic, total in pairs.groupby(level=0, sort=False).sum().items():
+            self.topic_totals[topic] = self.topic_totals.get(topic, 0) + int(total)
+        self.by_topic.update_counts(pairs)
+
+    def append(self, df: pd.DataFrame) -> "HeavyHitterIndex":
+        """Actualiza los sketches con filas nuevas (sin materializar todos los tokens)"""
+        text_col = resolve_column(df, 'texto_comentario')
+        if text_col is None:
+            return self
+        topic_col = resolve_column(df, 'tema_principal')
+
+        for start in range(0, len(df), CHUNK_ROWS):
+            chunk = df.iloc[start:start + CHUNK_ROWS]
+            tokens = tokenize_series(chunk[text_col])
+            if tokens.empty:
+                continue
+            rows = tokens.index.to_numpy()
+
+            self.overall.update_counts(tokens.value_counts())
+
+            sentiment = np.asarray(SENTIMENT_LABELS, dtype=object)[sentiment_codes(chunk)][rows]
+            self._update_groups(self.by_sentiment, tokens, sentiment)
+
+            if topic_col is not None:
+                topic = chunk[topic_col].astype(object).to_numpy()[rows]
+                valid = pd.notna(topic)
+                self._update_topics(tokens[valid], topic[valid])
+
+        self.rows += len(df)
+        return self
+
+    def sketch_for(self, sentimiento: Optional[str] = None, tema: Optional[str] = None) -> Optional[SpaceSaving]:
+        """Sketch de un sentimiento o tema (global si no se indica ninguno)"""
+        if sentimiento is not None:
+            return self.by_sentiment.get(sentimiento)
+        if tema is not None:
+            if tema not in self.topic_totals:
+                return None
+            return self.by_topic.restrict(tema, self.topic_totals[tema])
+        return self.overall
+
+    @property
+    def topics(self) -> List[str]:
+        return sorted(self.topic_totals)
+
+    def describe(self, sketch: SpaceSaving) -> Dict[str, Any]:
+        """Cotas de error de un sketch"""
+        return {
+            'method': 'space_saving',
+            'capacity': sketch.capacity,
+            'shared': sketch.shared,
+            'total_tokens': int(sketch.total),
+            'monitored_words': len(sketch.counts),
+            'max_error': round(sketch.error_bound, 2)
+        }
@@ -0,0 +1,221 @@
+"""
+Frases clave discriminativas por sentimiento y por tema
+
+En lugar de las palabras más frecuentes (dominadas por "universidad" o
+"marcos", que aparecen en todos los grupos), se buscan los n-gramas del
+vocabulario del TfidfVectorizer ya entrenado que caracterizan a cada grupo
+frente al resto:
+
+- log_odds: log-odds con prior de Dirichlet informativo (z-score), robusto
+  para n-gramas poco frecuentes.
+- chi2: contribución chi² del grupo, solo para términos sobrerrepresentados.
+
+Antes de puntuar se descartan los n-gramas que empiezan o terminan en una
+stopword ("los", "de la"), los términos de la institución
+(CORPUS_TERMS_SPANISH) y los que aparecen en más de KEYPHRASE_MAX_DOC_RATIO
+de los comentarios.
+
+Las cuentas por grupo se obtienen como un producto disperso
+(indicadora de grupo × matriz documento-término), es decir, sumas de columnas.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from typing import Any, Callable, Dict, List, Optional
+
+from sklearn.feature_extraction.text import CountVectorizer
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes
+from app.core.text import spanish_stopwords
+from app.utils.cache import get_model_cache
+from app.utils.config import CORPUS_TERMS_SPANISH, settings
+
+logger = logging.getLogger(__name__)
+
+KEYPHRASE_GROUPS = {
+    'sentimiento': 'sentimiento',
+    'tema': 'tema_principal',
+}
+KEYPHRASE_METHODS = ('log_odds', 'chi2')
+
+# Peso total del prior de Dirichlet (proporcional a la frecuencia global)
+PRIOR_STRENGTH = 500.0
+MIN_GROUP_SIZE = 5
+# Cambia cuando cambia el cálculo (invalida resultados cacheados con el anterior)
+KEYPHRASE_CACHE_VERSION = 2
+
+
+def term_counts(texts: pd.Series, vectorizer, clean: Callable[[str], str]) -> sparse.csr_matrix:
+    """
+    Matriz documento-término de cuentas sobre el vocabulario ya ajustado
+
+    Reutiliza el analizador del vectorizador (tokenización, stopwords,
+    n-gramas) para que las frases coincidan con las del modelo.
+    """
+    counter = CountVectorizer(
+        analyzer=vectorizer.build_analyzer(),
+        vocabulary=vectorizer.vocabulary_
+    )
+    return counter.transform(texts.fillna('').astype(str).map(clean)).tocsr()
+
+
+def _group_matrix(codes: np.ndarray, n_groups: int) -> sparse.csr_matrix:
+    """Indicadora grupos × documentos (filas con código < 0 se ignoran)"""
+    valid = np.flatnonzero(codes >= 0)
+    return sparse.csr_matrix(
+        (np.ones(len(valid)), (codes[valid], valid)),
+        shape=(n_groups, len(codes))
+    )
+
+
+def excluded_terms(vocab: np.ndarray, doc_ratio: np.ndarray) -> np.ndarray:
+    """
+    Máscara de términos que no pueden ser frases clave
+
+    Args:
+        vocab: N-gramas del vocabulario
+        doc_ratio: Fracción de comentarios que contiene cada término
+    """
+    stop = spanish_stopwords() | frozenset(CORPUS_TERMS_SPANISH)
+    edges = [str(phrase).split() for phrase in vocab]
+    uninformative = np.array([not words or words[0] in stop or words[-1] in stop for words in edges], dtype=bool)
+    return uninformative | (doc_ratio > settings.KEYPHRASE_MAX_DOC_RATIO)
+
+
+def _log_odds(group_counts: np.ndarray) -> np.ndarray:
+    """z-scores de log-odds de cada grupo contra el resto (Monroe et al.)"""
+    totals = group_counts.sum(axis=0)
+    prior = PRIOR_STRENGTH * (totals + 1) / (totals + 1).sum()
+    prior_total = prior.sum()
+
+    scores = np.zeros_like(group_counts, dtype=float)
+    for g in range(group_counts.shape[0]):
+        y_i = group_counts[g]
+        y_j = totals - y_i
+        n_i, n_j = y_i.sum(), y_j.sum()
+        delta = (
+            np.log((y_i + prior) / (n_i + prior_total - y_i - prior))
+            - np.log((y_j + prior) / (n_j + prior_total - y_j - prior))
+        )
+        variance = 1.0 / (y_i + prior) + 1.0 / (y_j + prior)
+        scores[g] = delta / np.sqrt(variance)
+    return scores
+
+
+def _chi2(doc_freq: np.ndarray, group_sizes: np.ndarray) -> np.ndarray:
+    """Contribución chi² por grupo sobre frecuencias de documento (solo O > E)"""
+    n_docs = group_sizes.sum()
+    expected = np.outer(group_sizes, doc_freq.sum(axis=0)) / max(n_docs, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(expected > 0, (doc_freq - expected) ** 2 / expected, 0.0)
+    return np.where(doc_freq > expected, scores, 0.0)
+
+
+def discriminative_keyphrases(
+    df: pd.DataFrame,
+    vectorizer,
+    clean: Callable[[str], str],
+    group_by: str = 'sentimiento',
+    method: str = 'log_odds',
+    top_n: int = 10
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    N-gramas más característicos de cada grupo
+
+    Args:
+        df: Snapshot del dataset
+        vectorizer: TfidfVectorizer ya entrenado
+        clean: Limpieza de texto usada en el entrenamiento
+        group_by: 'sentimiento' o 'tema'
+        method: 'log_odds' o 'chi2'
+        top_n: Frases por grupo
+
+    Returns:
+        Diccionario grupo -> lista de {phrase, score, count, documents}
+    """
+    if group_by not in KEYPHRASE_GROUPS:
+        raise ValueError(f"Agrupación no soportada: {group_by}")
+    if method not in KEYPHRASE_METHODS:
+        raise ValueError(f"Método no soportado: {method}")
+
+    text_col = resolve_column(df, 'texto_comentario')
+    if text_col is None:
+        raise ValueError("El dataset no tiene columna de texto")
+
+    if group_by == 'sentimiento':
+        codes = sentiment_codes(df).astype(np.int64)
+        labels = list(SENTIMENT_LABELS)
+    else:
+        col = resolve_column(df, KEYPHRASE_GROUPS[group_by])
+        if col is None:
+            raise ValueError(f"El dataset no tiene columna '{KEYPHRASE_GROUPS[group_by]}'")
+        codes, uniques = pd.factorize(df[col].astype(object))
+        labels = [str(u) for u in uniques]
+
+    vocab = np.empty(len(vectorizer.vocabulary_), dtype=object)
+    for term, idx in vectorizer.vocabulary_.items():
+        vocab[idx] = term
+
+    counts = term_counts(df[text_col], vectorizer, clean)
+    doc_ratio = np.asarray((counts > 0).sum(axis=0)).ravel() / max(counts.shape[0], 1)
+    keep = np.flatnonzero(~excluded_terms(vocab, doc_ratio))
+    counts, vocab = counts[:, keep], vocab[keep]
+    groups = _group_matrix(codes, len(labels))
+
+    # Sumas de columnas por grupo: (grupos × docs) @ (docs × vocab)
+    group_counts = np.asarray((groups @ counts).todense())
+    doc_freq = np.asarray((groups @ (counts > 0).astype(np.float64)).todense())
+    group_sizes = np.asarray(groups.sum(axis=1)).ravel()
+
+    scores = _log_odds(group_counts) if method == 'log_odds' else _chi2(doc_freq, group_sizes)
+
+    result = {}
+    for g, label in enumerate(labels):
+        if group_sizes[g] < MIN_GROUP_SIZE:
+            continue
+        candidates = np.flatnonzero((group_counts[g] > 0) & (scores[g] > 0))
+        top = candidates[np.argsort(-scores[g][candidates], kind='stable')][:top_n]
+        result[label] = [
+            {
+                'phrase': str(vocab[t]),
+                'score': round(float(scores[g][t]), 3),
+                'count': int(group_counts[g][t]),
+                'documents': int(doc_freq[g][t])
+            }
+            for t in top
+        ]
+    return result
+
+
+def cached_keyphrases(
+    df: pd.DataFrame,
+    analyzer,
+    dataset_version: Optional[str],
+    group_by: str = 'sentimiento',
+    method: str = 'log_odds',
+    top_n: int = 10
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    discriminative_keyphrases cacheado por versión de dataset y de modelo
+
+    La clave cambia al recargar el dataset o reentrenar el vectorizador, así
+    que no hace falta invalidar explícitamente.
+    """
+    if analyzer.vectorizer is None:
+        raise ValueError("El vectorizador no está entrenado")
+
+    cache = get_model_cache()
+    key = f"keyphrases:v{KEYPHRASE_CACHE_VERSION}:{dataset_version}:{analyzer.model_version}:{group_by}:{method}:{top_n}"
+    if cache is not None and dataset_version is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    result = discriminative_keyphrases(
+        df, analyzer.vectorizer, analyzer.clean_text, group_by=group_by, method=method, top_n=top_n
+    )
+    if cache is not None and dataset_version is not None:
+        cache.set(key, result, ttl=settings.CACHE_TTL)
+    return result
@@ -0,0 +1,347 @@
+"""
+Etiquetado masivo del snapshot con el modelo activo
+
+Cada comentario se puntúa una vez por versión de modelo y se agregan al
+snapshot las columnas sentimiento_modelo, prob_negativo/neutral/positivo y
+confianza (probabilidad de la clase predicha). Así los dashboards muestran
+la confianza real del modelo sin inferir por petición; WeightedMetrics y
+TimeIndex ya leen 'confianza'.
+
+Las predicciones se guardan en un LabelStore indexado por el hash del texto
+y ligado a la versión del modelo: en cada corrida solo se infieren los
+textos que no están en el store (comentarios nuevos o editados) y, si cambia
+el modelo, el store se vacía y se puntúa todo. Los textos repetidos se
+puntúan una sola vez.
+
+Los bloques de LABELING_CHUNK_ROWS textos se reparten en un pool de
+procesos (el modelo viaja una vez por worker); por debajo de
+LABELING_PARALLEL_MIN_ROWS se puntúa en el mismo proceso.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes
+from app.core.dataset import dataset_manager
+from app.core.text import clean_text
+from app.utils.config import settings
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+MODEL_LABEL_COLUMN = 'sentimiento_modelo'
+CONFIDENCE_COLUMN = 'confianza'
+# En el orden de SENTIMENT_LABELS (coincide con sentiment_map del analizador)
+PROBABILITY_COLUMNS = ['prob_negativo', 'prob_neutral', 'prob_positivo']
+LABEL_COLUMNS = [MODEL_LABEL_COLUMN, *PROBABILITY_COLUMNS, CONFIDENCE_COLUMN]
+LABEL_STORE_PREFIX = "labels."
+LABEL_STORE_EXTENSION = ".arrow"
+
+
+def text_hashes(texts: pd.Series) -> np.ndarray:
+    """Hash uint64 de cada texto (mismo valor para el mismo texto en cualquier tipo)"""
+    return pd.util.hash_pandas_object(texts.reset_index(drop=True), index=False).to_numpy()
+
+
+def score_texts(model, vectorizer, texts: List[Any]) -> np.ndarray:
+    """
+    Probabilidades (n × 3, orden de SENTIMENT_LABELS) para un bloque de textos
+
+    Usa las mismas características que SentimentAnalyzer.predict: TF-IDF del
+    texto limpio más longitud y número de palabras.
+    """
+    cleaned = [clean_text(text) for text in texts]
+    tfidf = vectorizer.transform(cleaned).toarray()
+    extra = np.array([[len(text), len(text.split())] for text in cleaned], dtype=float).reshape(-1, 2)
+    proba = model.predict_proba(np.hstack([tfidf, extra]))
+
+    probabilities = np.zeros((len(texts), len(SENTIMENT_LABELS)), dtype=np.float32)
+    for j, cls in enumerate(model.classes_):
+        probabilities[:, int(cls)] = proba[:, j]
+    return probabilities
+
+
+# Modelo cargado en cada proceso del pool (initializer)
+_worker_model = None
+
+
+def _init_worker(model, vectorizer) -> None:
+    global _worker_model
+    _worker_model = (model, vectorizer)
+
+
+def _score_chunk(texts: List[Any]) -> np.ndarray:
+    model, vectorizer = _worker_model
+    return score_texts(model, vectorizer, texts)
+
+
+class LabelStore:
+    """
+    Probabilidades por hash de texto para una versión de modelo
+
+    Se persiste en DATASET_CACHE_DIR como Arrow IPC (si pyarrow está
+    disponible); al cambiar de modelo se descartan las predicciones previas.
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory or settings.DATASET_CACHE_DIR)
+        self.model_version: Optional[str] = None
+        self.hashes = pd.Index(np.array([], dtype=np.uint64))
+        self.probabilities = np.empty((0, len(SENTIMENT_LABELS)), dtype=np.float32)
+
+    def path(self, model_version: str) -> Path:
+        key = hashlib.sha256(str(model_version).encode("utf-8")).hexdigest()[:16]
+        return self.directory / f"{LABEL_STORE_PREFIX}{key}{LABEL_STORE_EXTENSION}"
+
+    def load(self, model_version: str) -> None:
+        """Activa el store de una versión de modelo (desde disco si existe)"""
+        if self.model_version == model_version:
+            return
+        self.model_version = model_version
+        self.hashes = pd.Index(np.array([], dtype=np.uint64))
+        self.probabilities = np.empty((0, len(SENTIMENT_LABELS)), dtype=np.float32)
+
+        path = self.path(model_version)
+        if not (HAS_PYARROW and path.exists()):
+            return
+        try:
+            with pa.memory_map(str(path), "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+            self.hashes = pd.Index(table.column('hash').to_numpy())
+            self.probabilities = np.column_stack([
+                table.column(col).to_numpy() for col in PROBABILITY_COLUMNS
+            ]).astype(np.float32)
+            logger.info(f"🏷️ Etiquetas del modelo desde caché: {len(self.hashes)} textos")
+        except Exception as e:
+            logger.warning(f"⚠️ Caché de etiquetas ilegible ({path.name}), se vuelve a puntuar: {e}")
+
+    def lookup(self, hashes: np.ndarray) -> np.ndarray:
+        """Posición de cada hash en el store (-1 si falta)"""
+        return self.hashes.get_indexer(hashes)
+
+    def add(self, hashes: np.ndarray, probabilities: np.ndarray) -> None:
+        self.hashes = self.hashes.append(pd.Index(hashes))
+        self.probabilities = np.vstack([self.probabilities, probabilities])
+
+    def save(self) -> None:
+        """Escritura atómica; elimina los stores de otros modelos"""
+        if not HAS_PYARROW or self.model_version is None:
+            return
+        path = self.path(self.model_version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.table({
+            'hash': pa.array(self.hashes.to_numpy(), type=pa.uint64()),
+            **{col: self.probabilities[:, i] for i, col in enumerate(PROBABILITY_COLUMNS)}
+        })
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+        except Exception as e:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            logger.warning(f"⚠️ No se pudo guardar la caché de etiquetas: {e}")
+            return
+
+        for old in path.parent.glob(f"{LABEL_STORE_PREFIX}*{LABEL_STORE_EXTENSION}"):
+            if old != path:
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+
+
+class BulkLabeler:
+    """
+    Etapa de fondo que puntúa el snapshot vigente (un trabajo a la vez)
+    """
+
+    def __init__(
+        self,
+        chunk_rows: Optional[int] = None,
+        workers: Optional[int] = None,
+        parallel_min_rows: Optional[int] = None
+    ):
+        self.chunk_rows = chunk_rows or settings.LABELING_CHUNK_ROWS
+        self.workers = workers or (os.cpu_count() if settings.N_JOBS < 1 else settings.N_JOBS) or 1
+        self.parallel_min_rows = parallel_min_rows or settings.LABELING_PARALLEL_MIN_ROWS
+        self.store = LabelStore()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-labeling")
+        self._lock = threading.Lock()
+        self._status: Dict[str, Any] = {'status': 'idle'}
+
+    @property
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._status)
+
+    def _update(self, **info: Any) -> None:
+        with self._lock:
+            self._status.update(info)
+
+    def schedule(self, analyzer, on_done: Optional[Callable[[], None]] = None) -> Future:
+        """
+        Encola el etiquetado del snapshot vigente
+
+        Args:
+            analyzer: SentimentAnalyzer con el modelo activo
+            on_done: Se llama al terminar (también si no había nada que hacer)
+        """
+        def job() -> Optional[Dict[str, Any]]:
+            try:
+                return self.run(analyzer)
+            except Exception as e:
+                logger.error(f"❌ Error en el etiquetado masivo: {e}", exc_info=True)
+                self._update(status='failed', error=str(e), finished_at=datetime.now().isoformat())
+                return None
+            finally:
+                if on_done is not None:
+                    on_done()
+        return self._executor.submit(job)
+
+    def score(self, model, vectorizer, texts: List[Any]) -> np.ndarray:
+        """Puntúa por bloques, en paralelo si hay suficientes textos"""
+        if not texts:
+            return np.empty((0, len(SENTIMENT_LABELS)), dtype=np.float32)
+        chunks = [texts[i:i + self.chunk_rows] for i in range(0, len(texts), self.chunk_rows)]
+        results: List[np.ndarray] = []
+
+        if len(texts) >= self.parallel_min_rows and self.workers > 1 and len(chunks) > 1:
+            try:
+                # spawn: no se hereda el estado de hilos del servidor
+                with ProcessPoolExecutor(
+                    max_workers=min(self.workers, len(chunks)),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(model, vectorizer)
+                ) as pool:
+                    for result in pool.map(_score_chunk, chunks):
+                        results.append(result)
+                        self._update(scored=sum(len(r) for r in results))
+                return np.vstack(results)
+            except Exception as e:
+                logger.warning(f"⚠️ Pool de procesos no disponible, se puntúa en serie: {e}")
+                results = []
+
+        for chunk in chunks:
+            results.append(score_texts(model, vectorizer, chunk))
+            self._update(scored=sum(len(r) for r in results))
+        return np.vstack(results)
+
+    def run(self, analyzer) -> Optional[Dict[str, Any]]:
+        """Puntúa los textos que faltan y agrega las columnas al snapshot"""
+        df = dataset_manager.df
+        version = dataset_manager.version
+        if df is None or df.empty or not analyzer.is_trained or analyzer.model is None:
+            return None
+        text_col = resolve_column(df, 'texto_comentario')
+        if text_col is None:
+            return None
+
+        started = time.perf_counter()
+        model_version = str(analyzer.model_version)
+        self._update(status='running', dataset_version=version, model_version=model_version,
+                     rows=len(df), scored=0, started_at=datetime.now().isoformat(), error=None)
+
+        hashes = text_hashes(df[text_col])
+        self.store.load(model_version)
+        unique, first = np.unique(hashes, return_index=True)
+        missing = self.store.lookup(unique) < 0
+        pending = first[missing]
+        self._update(pending=int(len(pending)))
+
+        texts = df[text_col].iloc[pending].astype(object).tolist()
+        probabilities = self.score(analyzer.model, analyzer.vectorizer, texts)
+        if len(pending):
+            self.store.add(unique[missing], probabilities)
+            self.store.save()
+
+        labels = label_columns(self.store.probabilities[self.store.lookup(hashes)])
+        with dataset_manager.lock:
+            # Verificar la versión y agregar bajo el mismo lock: una carga o un
+            # anexo no puede colarse entre ambos pasos
+            summary = dataset_manager.attach_labels(labels, model_version, expected_version=version)
+            if summary is None:
+                # El snapshot cambió durante la corrida: la carga nueva encola su propio etiquetado
+                logger.info("⏭️ Etiquetado abandonado: el dataset cambió durante la corrida")
+                self._update(status='stale', finished_at=datetime.now().isoformat())
+                return None
+            labeled = dataset_manager.df
+            analyzer.df = labeled
+            analyzer.dataset = labeled
+        summary.update(label_summary(labeled))
+        summary.update({
+            'status': 'completed',
+            'rows': int(len(df)),
+            'unique_texts': int(len(unique)),
+            'scored': int(len(pending)),
+            'reused': int(len(unique) - len(pending)),
+            'workers': self.workers if len(pending) >= self.parallel_min_rows else 1,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            'finished_at': datetime.now().isoformat()
+        })
+        self._update(**summary)
+        logger.info(
+            f"🏷️ Etiquetado masivo: {summary['scored']} textos puntuados, {summary['reused']} reutilizados "
+            f"({summary['elapsed_ms']:.0f} ms)"
+        )
+        return summary
+
+
+def label_columns(probabilities: np.ndarray) -> pd.DataFrame:
+    """Columnas de etiquetas a partir de la matriz de probabilidades"""
+    predicted = probabilities.argmax(axis=1)
+    frame = pd.DataFrame(
+        {col: probabilities[:, i] for i, col in enumerate(PROBABILITY_COLUMNS)}
+    )
+    frame.insert(0, MODEL_LABEL_COLUMN, pd.Categorical.from_codes(predicted, categories=SENTIMENT_LABELS))
+    frame[CONFIDENCE_COLUMN] = probabilities.max(axis=1)
+    return frame[LABEL_COLUMNS]
+
+
+def label_summary(df: pd.DataFrame) -> Dict[str, Any]:
+    """Distribución de etiquetas del modelo, confianza media y acuerdo con la etiqueta humana"""
+    if MODEL_LABEL_COLUMN not in df.columns:
+        return {}
+    predicted = df[MODEL_LABEL_COLUMN].cat.codes.to_numpy()
+    agreement = float((predicted == sentiment_codes(df)).mean()) if len(df) else 0.0
+    return {
+        'distribution': df[MODEL_LABEL_COLUMN].value_counts().reindex(SENTIMENT_LABELS, fill_value=0)
+        .astype(int).to_dict(),
+        'mean_confidence': round(float(df[CONFIDENCE_COLUMN].mean()), 4),
+        'agreement': round(agreement, 4)
+    }
+
+
+# Instancia global
+bulk_labeler = BulkLabeler()
+
+
+def schedule_refresh(analyzer) -> Future:
+    """
+    Etiqueta el snapshot vigente y después avisa a los suscriptores del
+    DatasetManager (almacén de comentarios, similitud, reportes)
+
+    Se llama tras cada ingesta, anexo o cambio de modelo; así todo lo
+    derivado se genera con la confianza real y la versión resultante.
+    """
+    return bulk_labeler.schedule(analyzer, on_done=lambda: dataset_manager.publish(analyzer))
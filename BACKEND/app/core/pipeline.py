@@ -0,0 +1,481 @@
+"""
+Pipeline único de ingesta del dataset de comentarios
+
+Todas las cargas (arranque, subida de CSV, scripts) pasan por las mismas
+etapas y producen el snapshot canónico una sola vez:
+
+    read -> schema -> normalize -> concat -> labels -> derived -> types
+
+- schema: detecta qué columna cumple cada rol (texto, sentimiento, tema...).
+  El resultado se cachea por la tupla de nombres de columna, así que los
+  endpoints consultan schema_for(df) sin volver a recorrer los nombres.
+- normalize: nombres en minúsculas y renombrado a los nombres canónicos.
+- labels: sentimiento queda reducido a Positivo/Neutral/Negativo (categórico)
+  y la etiqueta detallada se conserva en sentimiento_original.
+- derived: metadatos de publicación propagados a todos sus comentarios y
+  antigüedades relativas separadas de la columna de usuario.
+- types: tipos compactos según COLUMN_SCHEMA.
+
+Cada etapa se cronometra; DatasetManager agrega la carga desde caché y la
+construcción de índices al mismo reporte.
+"""
+
+import csv
+import io
+import logging
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.columns import SENTIMENT_LABELS, map_sentiment_label
+from app.core.posts import fill_post_metadata
+from app.core.timeindex import split_misplaced_ages
+from app.utils.dataset_config import COLUMN_SCHEMA
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+# Cadenas respaldadas por Arrow cuando pyarrow está disponible
+STRING_DTYPE = "string[pyarrow]" if HAS_PYARROW else "string"
+
+
+def _to_compact_count(series: pd.Series) -> pd.Series:
+    """
+    Convierte una columna de conteos al entero sin signo más pequeño
+
+    Los valores no numéricos ('(no visible)') quedan como nulos y los
+    separadores de miles ('8.107') se eliminan antes de convertir.
+    """
+    raw = series.astype(str).str.replace(r'[.,](?=\d{3}(?:\.0)?$)', '', regex=True)
+    values = pd.to_numeric(raw, errors='coerce')
+    valid = values.dropna()
+
+    if valid.empty:
+        return values.astype('UInt8')
+
+    kind = 'unsigned' if valid.min() >= 0 else 'integer'
+    compact = pd.to_numeric(valid.astype('int64'), downcast=kind)
+
+    if len(valid) == len(values):
+        return compact
+
+    # Con nulos se usa el entero nullable equivalente (UInt16, Int32, ...)
+    nullable = str(compact.dtype).replace('uint', 'UInt').replace('int', 'Int')
+    return values.astype(nullable)
+
+
+def apply_schema(
+    df: pd.DataFrame,
+    schema: Optional[Dict[str, str]] = None,
+    raw_memory: Optional[pd.Series] = None
+) -> Tuple[pd.DataFrame, Dict[str, Dict[str, Any]]]:
+    """
+    Asigna tipos compactos según el esquema de columnas
+
+    Args:
+        df: DataFrame cargado desde CSV
+        schema: Mapa columna (minúsculas) -> tipo lógico. Por defecto COLUMN_SCHEMA
+        raw_memory: Bytes de las columnas de texto libre medidos en los
+            bloques crudos (la lectura por bloques ya las pasa a cadenas
+            Arrow). El resto se mide aquí, sobre las mismas filas ya con los
+            metadatos de publicación propagados.
+
+    Returns:
+        Tupla (DataFrame convertido, reporte de memoria por columna en bytes)
+    """
+    schema = schema or COLUMN_SCHEMA
+    before = df.memory_usage(deep=True, index=False)
+    if raw_memory is not None:
+        before.update(raw_memory.reindex(before.index).dropna())
+
+    for col in df.columns:
+        kind = schema.get(str(col).strip().lower())
+        if kind is None:
+            continue
+
+        try:
+            if kind == 'category':
+                df[col] = df[col].astype('category')
+            elif kind == 'count':
+                df[col] = _to_compact_count(df[col])
+            elif kind == 'string':
+                df[col] = df[col].astype(STRING_DTYPE)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo convertir '{col}' a {kind}: {e}")
+
+    after = df.memory_usage(deep=True, index=False)
+
+    report = {
+        str(col): {
+            'dtype': str(df[col].dtype),
+            'bytes_before': int(before.get(col, 0)),
+            'bytes_after': int(after.get(col, 0))
+        }
+        for col in df.columns
+    }
+
+    total_before = int(before.sum())
+    total_after = int(after.sum())
+    logger.info(
+        f"🗜️ Memoria del dataset: {total_before / 1024:.1f} KB -> "
+        f"{total_after / 1024:.1f} KB"
+    )
+    for col, info in report.items():
+        logger.debug(
+            f"   {col}: {info['bytes_before']} -> {info['bytes_after']} bytes ({info['dtype']})"
+        )
+
+    return df, report
+
+
+# Rol -> palabras clave para detectarlo cuando no existe el nombre canónico
+SCHEMA_ROLES: Dict[str, List[str]] = {
+    'texto_comentario': ['texto', 'comentario', 'comment'],
+    'sentimiento': ['sentimiento', 'sentiment', 'rating'],
+    'tema_principal': ['tema', 'topic', 'category', 'principal'],
+    'subtema_o_keyword': [],
+    'usuario': [],
+    'publicacion': [],
+    'id_comentario': [],
+    'cantidad_likes': [],
+    'es_respuesta_a': [],
+    'fecha': [],
+}
+DEFAULT_SENTIMENT = 'Neutral'
+PIPELINE_STAGES = ['read', 'schema', 'normalize', 'concat', 'labels', 'derived', 'types']
+# Filas por bloque en la lectura incremental del CSV
+INGEST_CHUNK_ROWS = 50000
+
+
+class DatasetSchema:
+    """
+    Columna (ya normalizada) que cumple cada rol
+
+    Las instancias se comparten entre llamadas a detect_schema; no mutarlas.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, Optional[str]],
+        renames: Dict[str, str],
+        text_fallback: bool = False
+    ):
+        self.columns = columns
+        self.renames = renames
+        # True si el texto se tomó de la primera columna libre (sin coincidencia)
+        self.text_fallback = text_fallback
+
+    def column(self, role: str) -> Optional[str]:
+        """Nombre de la columna del rol o None si el dataset no la tiene"""
+        return self.columns.get(role)
+
+    @property
+    def text(self) -> Optional[str]:
+        return self.columns.get('texto_comentario')
+
+    @property
+    def sentiment(self) -> Optional[str]:
+        return self.columns.get('sentimiento')
+
+    @property
+    def topic(self) -> Optional[str]:
+        return self.columns.get('tema_principal')
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'columns': dict(self.columns),
+            'renames': dict(self.renames),
+            'text_fallback': self.text_fallback
+        }
+
+
+@lru_cache(maxsize=64)
+def detect_schema(columns: Tuple[str, ...]) -> DatasetSchema:
+    """
+    Asigna roles a columnas: primero por nombre exacto y luego por palabras
+    clave entre las columnas aún libres
+
+    Args:
+        columns: Nombres de columna tal como vienen del CSV
+
+    Returns:
+        DatasetSchema con los nombres normalizados de cada rol y los renombres
+    """
+    normalized = [str(col).strip().lower() for col in columns]
+    assigned: Dict[str, Optional[str]] = {}
+    taken = set()
+
+    for role in SCHEMA_ROLES:
+        if role in normalized:
+            assigned[role] = role
+            taken.add(role)
+
+    for role, keywords in SCHEMA_ROLES.items():
+        if role in assigned or not keywords:
+            continue
+        for col in normalized:
+            if col in taken:
+                continue
+            # id_comentario es el identificador, no el texto
+            if role == 'texto_comentario' and col.startswith('id'):
+                continue
+            if any(keyword in col for keyword in keywords):
+                assigned[role] = col
+                taken.add(col)
+                break
+
+    # Sin columna de texto reconocible se usa la primera libre
+    text_fallback = False
+    if 'texto_comentario' not in assigned:
+        free = [col for col in normalized if col not in taken]
+        if free:
+            assigned['texto_comentario'] = free[0]
+            taken.add(free[0])
+            text_fallback = True
+
+    renames = {col: role for role, col in assigned.items() if col is not None and col != role}
+    return DatasetSchema(
+        {role: (role if role in assigned else None) for role in SCHEMA_ROLES},
+        renames,
+        text_fallback
+    )
+
+
+def schema_for(df: pd.DataFrame) -> DatasetSchema:
+    """Esquema del snapshot (cacheado por nombres de columna)"""
+    return detect_schema(tuple(str(col) for col in df.columns))
+
+
+def simplify_sentiment(values: pd.Series) -> pd.Categorical:
+    """
+    Reduce etiquetas detalladas a Positivo/Neutral/Negativo
+
+    map_sentiment_label se evalúa una vez por etiqueta distinta; los nulos
+    quedan como Neutral.
+    """
+    raw = values.astype('category')
+    default = SENTIMENT_LABELS.index(DEFAULT_SENTIMENT)
+    per_category = pd.Categorical(
+        [map_sentiment_label(str(category).strip()) for category in raw.cat.categories],
+        categories=SENTIMENT_LABELS
+    ).codes
+    codes = raw.cat.codes.to_numpy()
+    if len(per_category):
+        codes = np.where(codes >= 0, per_category[np.maximum(codes, 0)], default)
+    else:
+        codes = np.full(len(codes), default)
+    return pd.Categorical.from_codes(codes, categories=SENTIMENT_LABELS)
+
+
+class SchemaValidationError(ValueError):
+    """El CSV no tiene las columnas mínimas para construir el snapshot"""
+
+
+def validate_header(first_block: bytes, strict: bool = True) -> DatasetSchema:
+    """
+    Detecta y valida el esquema con el primer bloque recibido de un CSV
+
+    Permite rechazar una carga antes de recibir el resto del archivo.
+
+    Args:
+        first_block: Primeros bytes del archivo (deben incluir el encabezado)
+        strict: Exigir una columna de texto reconocible
+    """
+    line = first_block.split(b'\n', 1)[0].decode('utf-8-sig', errors='replace')
+    header = [col for col in next(csv.reader(io.StringIO(line)), []) if col.strip()]
+    if not header:
+        raise SchemaValidationError("El archivo CSV no tiene encabezado")
+    schema = detect_schema(tuple(header))
+    IngestionPipeline(strict=strict).validate(schema)
+    return schema
+
+
+class IngestionPipeline:
+    """
+    Etapas cronometradas de la ingesta de un CSV
+
+    La lectura es incremental (read_csv por bloques de filas): el esquema se
+    detecta y valida con el primer bloque, cada bloque se normaliza y sus
+    columnas de texto pasan a cadenas Arrow antes de leer el siguiente, y el
+    callback de progreso recibe filas y bytes leídos.
+    """
+
+    def __init__(
+        self,
+        chunk_rows: int = INGEST_CHUNK_ROWS,
+        strict: bool = False,
+        progress: Optional[Callable[..., None]] = None
+    ):
+        self.chunk_rows = chunk_rows
+        self.strict = strict
+        self.progress = progress
+        self.timings: Dict[str, float] = {}
+        self.schema: Optional[DatasetSchema] = None
+        self.memory_report: Dict[str, Dict[str, Any]] = {}
+        # Memoria por columna de los bloques tal como salen de read_csv
+        self.raw_memory: Optional[pd.Series] = None
+        self.validation: Dict[str, int] = {}
+
+    def timed(self, stage: str, func: Callable, *args, **kwargs):
+        """Ejecuta una etapa y acumula su duración en milisegundos"""
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[stage] = round(self.timings.get(stage, 0.0) + elapsed, 2)
+
+    def report(self, stage: str, **info: Any) -> None:
+        """Notifica el avance (si hay callback); los errores del callback no cortan la ingesta"""
+        if self.progress is None:
+            return
+        try:
+            self.progress(stage, **info)
+        except Exception as e:
+            logger.debug(f"Callback de progreso falló: {e}")
+
+    def run(self, filepath: str) -> pd.DataFrame:
+        """Ejecuta read -> types y devuelve el snapshot canónico"""
+        df = self.read(filepath)
+        logger.info(f"Dataset leído: {len(df)} registros")
+
+        self.report('labels', rows=len(df))
+        df = self.timed('labels', self.map_labels, df)
+        self.report('derived', rows=len(df))
+        df = self.timed('derived', self.derive, df)
+        self.report('types', rows=len(df))
+        df, self.memory_report = self.timed('types', apply_schema, df, raw_memory=self.raw_memory)
+        return df
+
+    def validate(self, schema: DatasetSchema) -> None:
+        """En modo estricto exige una columna de texto reconocible"""
+        if self.strict and (schema.text is None or schema.text_fallback):
+            raise SchemaValidationError(
+                "No se encontró columna de texto (se esperaba p. ej. 'Texto_Comentario')"
+            )
+
+    def read(self, filepath: str) -> pd.DataFrame:
+        """
+        Lectura incremental: detecta y valida el esquema con el primer bloque
+        y normaliza cada bloque a medida que se lee
+        """
+        total_bytes = os.path.getsize(filepath)
+        frames: List[pd.DataFrame] = []
+        rows = 0
+        empty_text = 0
+        missing_sentiment = 0
+
+        with open(filepath, 'rb') as handle:
+            try:
+                reader = pd.read_csv(handle, encoding="utf-8", chunksize=self.chunk_rows)
+            except pd.errors.EmptyDataError:
+                raise SchemaValidationError("El archivo CSV está vacío")
+            with reader:
+                while True:
+                    start = time.perf_counter()
+                    chunk = next(reader, None)
+                    self.timings['read'] = round(
+                        self.timings.get('read', 0.0) + (time.perf_counter() - start) * 1000, 2
+                    )
+                    if chunk is None:
+                        break
+
+                    if self.schema is None:
+                        self.schema = self.timed('schema', detect_schema, tuple(str(c) for c in chunk.columns))
+                        self.validate(self.schema)
+                    chunk = self.timed('normalize', self.normalize_chunk, chunk, self.schema, not frames)
+
+                    text = chunk['texto_comentario'] if 'texto_comentario' in chunk.columns else None
+                    if text is not None:
+                        empty_text += int(text.isna().sum() + text.astype(str).str.strip().eq('').sum())
+                    if 'sentimiento' in chunk.columns:
+                        missing_sentiment += int(chunk['sentimiento'].isna().sum())
+
+                    frames.append(chunk)
+                    rows += len(chunk)
+                    self.report('parse', rows=rows, bytes_read=min(handle.tell(), total_bytes),
+                                total_bytes=total_bytes)
+
+        if self.schema is None:
+            raise SchemaValidationError("El archivo CSV no tiene encabezado ni filas")
+
+        self.validation = {
+            'rows': rows,
+            'chunks': len(frames),
+            'empty_text': empty_text,
+            'missing_sentiment': missing_sentiment
+        }
+        df = self.timed('concat', lambda: pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+        if len(df.columns) == 0 or rows == 0:
+            raise SchemaValidationError("El archivo CSV no tiene filas")
+        return df
+
+    def normalize_chunk(self, chunk: pd.DataFrame, schema: DatasetSchema, first: bool) -> pd.DataFrame:
+        """Normaliza un bloque y pasa sus columnas de texto libre a cadenas Arrow"""
+        chunk = self.normalize(chunk, schema, verbose=first)
+        text_cols = [col for col in chunk.columns if COLUMN_SCHEMA.get(col) == 'string']
+        # El "antes" del reporte de memoria de estas columnas se mide antes de
+        # convertirlas; derive no las modifica, así que son las mismas filas
+        raw = chunk[text_cols].memory_usage(deep=True, index=False)
+        self.raw_memory = raw if self.raw_memory is None else self.raw_memory.add(raw, fill_value=0)
+        for col in text_cols:
+            chunk[col] = chunk[col].astype(STRING_DTYPE)
+        return chunk
+
+    @staticmethod
+    def normalize(df: pd.DataFrame, schema: DatasetSchema, verbose: bool = True) -> pd.DataFrame:
+        """Nombres canónicos en minúsculas"""
+        df.columns = [str(col).strip().lower() for col in df.columns]
+        if schema.renames:
+            df = df.rename(columns=schema.renames)
+            if verbose:
+                for source, target in schema.renames.items():
+                    logger.info(f"📝 Columna renombrada: {source} -> {target}")
+        if verbose and schema.sentiment is None:
+            logger.warning("⚠️ No se encontró columna de sentimiento, se usa Neutral")
+        return df
+
+    @staticmethod
+    def map_labels(df: pd.DataFrame) -> pd.DataFrame:
+        """sentimiento (3 clases) + sentimiento_original (etiqueta detallada)"""
+        if 'sentimiento' not in df.columns:
+            df['sentimiento'] = pd.Categorical(
+                [DEFAULT_SENTIMENT] * len(df), categories=SENTIMENT_LABELS
+            )
+            return df
+
+        if 'sentimiento_original' not in df.columns:
+            df['sentimiento_original'] = df['sentimiento']
+        df['sentimiento'] = simplify_sentiment(df['sentimiento'])
+        distribution = df['sentimiento'].value_counts().to_dict()
+        logger.info(f"🔄 Sentimientos simplificados: {distribution}")
+        return df
+
+    @staticmethod
+    def derive(df: pd.DataFrame) -> pd.DataFrame:
+        """Columnas derivadas: metadatos de publicación y antigüedad"""
+        return split_misplaced_ages(fill_post_metadata(df))
+
+    def summary(self, source: str, df: Optional[pd.DataFrame], from_cache: bool) -> Dict[str, Any]:
+        """Reporte de la ingesta para /api/dataset/ingestion"""
+        schema = self.schema or (schema_for(df) if df is not None else None)
+        return {
+            'source': source,
+            'rows': int(len(df)) if df is not None else 0,
+            'from_cache': from_cache,
+            'stages_ms': dict(self.timings),
+            'total_ms': round(sum(self.timings.values()), 2),
+            'schema': schema.to_dict() if schema is not None else None,
+            'validation': dict(self.validation),
+            'loaded_at': datetime.now().isoformat()
+        }
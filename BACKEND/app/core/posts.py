@@ -0,0 +1,221 @@
+"""
+Índice por publicación (Publicacion)
+
+Las filas se ordenan una vez por publicación (y por likes dentro de cada
+una) y se guardan los desplazamientos de inicio de cada grupo. Los conteos
+por sentimiento, el sentimiento ponderado por likes y los comentarios
+destacados de cualquier publicación se obtienen desde esos rangos.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+from app.core.columns import SENTIMENT_LABELS, cell_text, resolve_column, sentiment_codes, like_counts
+
+logger = logging.getLogger(__name__)
+
+# Atributos de la publicación que solo trae la primera fila de cada post
+POST_METADATA_COLUMNS = ['enlace', 'me_gusta', 'descripcion']
+
+
+def fill_post_metadata(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Propaga enlace / me_gusta / descripcion a todos los comentarios del post
+
+    Relleno hacia adelante vectorizado dentro de cada grupo de Publicacion.
+    """
+    pub_col = resolve_column(df, 'publicacion')
+    cols = [c for c in (resolve_column(df, name) for name in POST_METADATA_COLUMNS) if c is not None]
+
+    if pub_col is None or not cols:
+        return df
+
+    before = int(df[cols].isna().sum().sum())
+    df[cols] = df.groupby(pub_col, sort=False)[cols].ffill()
+    after = int(df[cols].isna().sum().sum())
+
+    logger.info(f"📌 Metadatos de publicación propagados: {before - after} celdas rellenadas")
+    return df
+
+
+def refill_post_metadata(df: pd.DataFrame, start: int) -> pd.DataFrame:
+    """
+    Completa los metadatos de las filas anexadas desde start con los del snapshot
+
+    Un delta que agrega comentarios a una publicación existente no trae su
+    primera fila, así que fill_post_metadata no tiene de dónde copiar. Solo
+    se miran las publicaciones tocadas por el delta; las celdas que el delta
+    sí trae no se modifican.
+    """
+    pub_col = resolve_column(df, 'publicacion')
+    cols = [c for c in (resolve_column(df, name) for name in POST_METADATA_COLUMNS) if c is not None]
+
+    if pub_col is None or not cols or start >= len(df):
+        return df
+
+    tail = df.iloc[start:]
+    missing = tail[cols].isna()
+    if not missing.to_numpy().any():
+        return df
+
+    touched = df[pub_col].isin(tail.loc[missing.any(axis=1), pub_col].dropna().unique())
+    # Primer valor no nulo de cada publicación tocada (base + delta)
+    known = df.loc[touched, cols].groupby(df.loc[touched, pub_col], sort=False).first()
+
+    filled = 0
+    for col in cols:
+        rows = missing[col].to_numpy()
+        if not rows.any():
+            continue
+        values = tail[pub_col].map(known[col])
+        filled += int((rows & values.notna().to_numpy()).sum())
+        df.iloc[start:, df.columns.get_loc(col)] = tail[col].fillna(values).to_numpy()
+
+    logger.info(f"📌 Metadatos de publicación completados en el delta: {filled} celdas")
+    return df
+
+
+class PostIndex:
+    """
+    Rollups por publicación a partir de desplazamientos de grupo
+    """
+
+    def __init__(
+        self,
+        post_ids: np.ndarray,
+        offsets: np.ndarray,
+        order: np.ndarray,
+        counts: np.ndarray,
+        weighted: np.ndarray,
+        likes: np.ndarray,
+        metadata: pd.DataFrame
+    ):
+        self.post_ids = post_ids
+        self.offsets = offsets
+        self.order = order
+        self.counts = counts
+        self.weighted = weighted
+        self.likes = likes
+        self.metadata = metadata
+        self._position = {int(p): i for i, p in enumerate(post_ids)}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "PostIndex":
+        """
+        Construye el índice con un ordenamiento y reducciones bincount
+
+        Args:
+            df: DataFrame con columna publicacion
+
+        Returns:
+            PostIndex alineado posicionalmente con df
+        """
+        pub_col = resolve_column(df, 'publicacion')
+        if pub_col is None:
+            raise ValueError("El dataset no tiene columna publicacion")
+
+        posts = pd.to_numeric(df[pub_col], errors='coerce').fillna(-1).astype('int64').to_numpy()
+        post_ids, post_code = np.unique(posts, return_inverse=True)
+        n_posts = len(post_ids)
+
+        sentiment = sentiment_codes(df)
+        likes = like_counts(df)
+        k = len(SENTIMENT_LABELS)
+
+        # Orden: publicación ascendente, likes descendente (top comentarios primero)
+        order = np.lexsort((-likes, post_code))
+        offsets = np.zeros(n_posts + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(post_code, minlength=n_posts))
+
+        cell = post_code * k + sentiment
+        counts = np.bincount(cell, minlength=n_posts * k).reshape(n_posts, k)
+        # Cada comentario pesa 1 + sus likes (los comentarios sin likes siguen contando)
+        weighted = np.bincount(cell, weights=likes + 1, minlength=n_posts * k).reshape(n_posts, k)
+        like_totals = np.bincount(post_code, weights=likes, minlength=n_posts).astype(np.int64)
+
+        # Metadatos tomados de la primera fila de cada publicación
+        first_rows = order[offsets[:-1]]
+        meta_cols = [c for c in (resolve_column(df, name) for name in POST_METADATA_COLUMNS) if c is not None]
+        metadata = df.iloc[first_rows][meta_cols].reset_index(drop=True)
+        metadata.columns = [str(c).lower() for c in meta_cols]
+
+        logger.info(f"📰 Índice de publicaciones: {n_posts} publicaciones")
+        return cls(post_ids, offsets, order, counts, weighted, like_totals, metadata)
+
+    def locate(self, publicacion: int) -> Optional[int]:
+        """Posición del grupo de una publicación o None"""
+        return self._position.get(int(publicacion))
+
+    def rows(self, group: int) -> np.ndarray:
+        """Posiciones de los comentarios de un grupo (ordenados por likes)"""
+        return self.order[self.offsets[group]:self.offsets[group + 1]]
+
+    def summary(self, group: int) -> Dict[str, Any]:
+        """Rollup de una publicación"""
+        counts = self.counts[group]
+        weighted = self.weighted[group]
+        total = int(counts.sum())
+        weight_total = float(weighted.sum())
+
+        meta = self.metadata.iloc[group]
+        me_gusta = meta.get('me_gusta')
+        description = meta.get('descripcion')
+
+        pos, neg = SENTIMENT_LABELS.index('Positivo'), SENTIMENT_LABELS.index('Negativo')
+
+        return {
+            'publicacion': int(self.post_ids[group]),
+            'enlace': None if pd.isna(meta.get('enlace')) else str(meta.get('enlace')),
+            'me_gusta': None if me_gusta is None or pd.isna(me_gusta) else int(me_gusta),
+            'descripcion': None if description is None or pd.isna(description) else str(description)[:200],
+            'total_comments': total,
+            'comment_likes': int(self.likes[group]),
+            'distribution': {label: int(c) for label, c in zip(SENTIMENT_LABELS, counts)},
+            'percentages': {
+                label: round(c / total * 100, 2) if total else 0.0
+                for label, c in zip(SENTIMENT_LABELS, counts)
+            },
+            'weighted_percentages': {
+                label: round(w / weight_total * 100, 2) if weight_total else 0.0
+                for label, w in zip(SENTIMENT_LABELS, weighted)
+            },
+            # Balance ponderado en [-1, 1]: (positivo - negativo) / peso total
+            'weighted_score': round((weighted[pos] - weighted[neg]) / weight_total, 4) if weight_total else 0.0
+        }
+
+    def top_comments(self, df: pd.DataFrame, group: int, limit: int = 3) -> List[Dict[str, Any]]:
+        """Comentarios con más likes de la publicación (primeras filas del grupo)"""
+        positions = self.rows(group)[:limit]
+        if len(positions) == 0:
+            return []
+
+        text_col = resolve_column(df, 'texto_comentario')
+        user_col = resolve_column(df, 'usuario')
+        likes = like_counts(df.iloc[positions])
+        sentiment = sentiment_codes(df.iloc[positions])
+
+        return [
+            {
+                'comment': (cell_text(df.iloc[p][text_col]) or '')[:200] if text_col else '',
+                'user': cell_text(df.iloc[p][user_col]) if user_col else None,
+                'likes': int(likes[i]),
+                'sentiment': SENTIMENT_LABELS[sentiment[i]]
+            }
+            for i, p in enumerate(positions)
+        ]
+
+    def ranking(self, sort_by: str = 'comments') -> np.ndarray:
+        """Grupos ordenados por el criterio pedido (descendente)"""
+        if sort_by == 'comments':
+            key = self.counts.sum(axis=1)
+        elif sort_by == 'likes':
+            key = self.likes
+        elif sort_by == 'negative':
+            key = self.counts[:, SENTIMENT_LABELS.index('Negativo')]
+        elif sort_by == 'publicacion':
+            return np.arange(len(self.post_ids))
+        else:
+            raise ValueError(f"Orden no soportado: {sort_by}")
+        return np.argsort(-key, kind='stable')
@@ -0,0 +1,356 @@
+"""
+Búsqueda de texto completo sobre los comentarios (índice invertido + BM25)
+
+El índice se construye una vez por ingesta con los mismos tokens que el
+resto de índices de texto (tokenize_series, sin tildes y desde 3 letras
+para no perder "wifi" o "app") y se extiende con las filas anexadas. El
+anexo arma un índice nuevo (las listas tocadas se copian, el resto se
+comparte) y DatasetManager lo reemplaza bajo su lock: una búsqueda en curso
+sigue leyendo un índice completo y coherente.
+
+Cada término guarda su lista de apariciones comprimida:
+
+    docs: huecos entre posiciones consecutivas (delta encoding) en el
+          entero sin signo más pequeño que los contiene (uint8/16/32)
+    tfs:  frecuencia del término en el comentario (uint8, saturada en 255)
+
+Las consultas decodifican solo las listas de sus términos (np.cumsum),
+puntúan con BM25 y aplican los filtros de sentimiento y tema como bitmaps
+(np.packbits) evaluados únicamente sobre los comentarios candidatos.
+"""
+
+import logging
+import time
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes
+from app.core.text import fold_accents, tokenize, tokenize_series
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MIN_TOKEN_LENGTH = 3
+CHUNK_ROWS = 50000
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TF = 255
+MAX_CACHED_BITMAPS = 64
+
+# Filtros disponibles -> columna lógica del snapshot (None = calculada)
+SEARCH_FILTERS: Dict[str, Optional[str]] = {
+    'sentimiento': None,
+    'tema': 'tema_principal',
+}
+
+
+def _pack_gaps(gaps: np.ndarray) -> np.ndarray:
+    """Huecos en el tipo sin signo más pequeño que los contiene"""
+    top = int(gaps.max()) if len(gaps) else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if top <= np.iinfo(dtype).max:
+            return gaps.astype(dtype)
+    return gaps.astype(np.uint64)
+
+
+class PostingList:
+    """Apariciones de un término: posiciones delta-codificadas + frecuencias"""
+
+    __slots__ = ('gaps', 'tfs', 'last')
+
+    def __init__(self, docs: np.ndarray, tfs: np.ndarray):
+        self.gaps = _pack_gaps(np.diff(docs, prepend=0))
+        self.tfs = np.minimum(tfs, MAX_TF).astype(np.uint8)
+        self.last = int(docs[-1])
+
+    def __len__(self) -> int:
+        return len(self.tfs)
+
+    def docs(self) -> np.ndarray:
+        return np.cumsum(self.gaps, dtype=np.int64)
+
+    def extend(self, docs: np.ndarray, tfs: np.ndarray) -> "PostingList":
+        """Copia con posiciones mayores que la última registrada agregadas"""
+        extended = PostingList.__new__(PostingList)
+        gaps = np.diff(docs, prepend=self.last)
+        extended.gaps = _pack_gaps(np.concatenate([self.gaps.astype(np.int64), gaps]))
+        extended.tfs = np.concatenate([self.tfs, np.minimum(tfs, MAX_TF).astype(np.uint8)])
+        extended.last = int(docs[-1])
+        return extended
+
+    @property
+    def nbytes(self) -> int:
+        return self.gaps.nbytes + self.tfs.nbytes
+
+
+class FilterColumn:
+    """Códigos por fila de una dimensión de filtro con vocabulario estable"""
+
+    def __init__(self, values: pd.Index, codes: np.ndarray):
+        self.values = values
+        self.codes = codes
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "FilterColumn":
+        codes, values = pd.factorize(series.astype(object).to_numpy(), use_na_sentinel=True)
+        return cls(pd.Index(values, dtype=object), codes.astype(np.int32))
+
+    def extend(self, series: pd.Series) -> "FilterColumn":
+        """Copia con las filas agregadas; los valores nuevos reciben códigos al final"""
+        raw = series.astype(object).to_numpy()
+        missing = pd.Index(pd.unique(raw[pd.notna(raw)]), dtype=object).difference(self.values, sort=False)
+        values = self.values.append(missing) if len(missing) else self.values
+        codes = values.get_indexer(raw).astype(np.int32)
+        return FilterColumn(values, np.concatenate([self.codes, codes]))
+
+    def bitmap(self, wanted: List[str]) -> np.ndarray:
+        """Bitmap empaquetado de las filas cuyo valor está en `wanted`"""
+        wanted_codes = self.values.get_indexer(pd.Index(wanted, dtype=object))
+        return np.packbits(np.isin(self.codes, wanted_codes[wanted_codes >= 0]))
+
+
+def _sentiment_column(df: pd.DataFrame) -> pd.Series:
+    return pd.Series(np.asarray(SENTIMENT_LABELS, dtype=object)[sentiment_codes(df)])
+
+
+def _filter_series(df: pd.DataFrame, name: str) -> pd.Series:
+    logical = SEARCH_FILTERS[name]
+    if logical is None:
+        return _sentiment_column(df)
+    col = resolve_column(df, logical)
+    if col is None:
+        return pd.Series([None] * len(df), dtype=object)
+    return df[col].reset_index(drop=True)
+
+
+def _term_postings(texts: pd.Series, offset: int) -> Tuple[Dict[str, Tuple[np.ndarray, np.ndarray]], np.ndarray]:
+    """
+    Apariciones (posiciones, frecuencias) por término y longitud de cada texto
+
+    Args:
+        texts: Textos de las filas a indexar
+        offset: Posición en el snapshot de la primera fila
+    """
+    n = len(texts)
+    lengths = np.zeros(n, dtype=np.int64)
+    doc_parts: List[np.ndarray] = []
+    term_parts: List[np.ndarray] = []
+
+    for start in range(0, n, CHUNK_ROWS):
+        tokens = tokenize_series(texts.iloc[start:start + CHUNK_ROWS], min_length=SEARCH_MIN_TOKEN_LENGTH)
+        if tokens.empty:
+            continue
+        docs = tokens.index.to_numpy(dtype=np.int64) + start
+        lengths += np.bincount(docs, minlength=n)
+        doc_parts.append(docs)
+        term_parts.append(tokens.to_numpy())
+
+    if not doc_parts:
+        return {}, lengths
+
+    # El vocabulario crudo es pequeño: las tildes se quitan por término distinto
+    raw_codes, raw_terms = pd.factorize(np.concatenate(term_parts))
+    folded_codes, folded = pd.factorize(pd.Index(raw_terms).map(fold_accents))
+    terms = folded.tolist()
+    term_ids = folded_codes[raw_codes].astype(np.int64)
+    docs = np.concatenate(doc_parts)
+
+    # Un solo ordenamiento por (término, fila) da frecuencias y listas ordenadas
+    keys, tfs = np.unique(term_ids * n + docs, return_counts=True)
+    term_of = keys // n
+    doc_of = keys % n + offset
+    bounds = np.flatnonzero(np.diff(term_of)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(keys)]])
+
+    postings = {
+        terms[term_of[s]]: (doc_of[s:e], tfs[s:e])
+        for s, e in zip(starts, ends)
+    }
+    return postings, lengths
+
+
+class SearchIndex:
+    """
+    Índice invertido con ranking BM25 sobre texto_comentario
+    """
+
+    def __init__(self, postings: Dict[str, PostingList], lengths: np.ndarray,
+                 filters: Dict[str, FilterColumn]):
+        self.postings = postings
+        self.lengths = lengths
+        self.filters = filters
+        self._bitmaps: Dict[Tuple[str, Tuple[str, ...]], np.ndarray] = {}
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.lengths)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SearchIndex":
+        """
+        Construye el índice invertido del snapshot
+
+        Args:
+            df: Snapshot normalizado
+
+        Returns:
+            SearchIndex con una lista de apariciones por término
+        """
+        started = time.perf_counter()
+        text_col = resolve_column(df, 'texto_comentario')
+        if text_col is None:
+            raise ValueError("El dataset no tiene columna de texto")
+
+        raw, lengths = _term_postings(df[text_col], offset=0)
+        postings = {term: PostingList(docs, tfs) for term, (docs, tfs) in raw.items()}
+        filters = {name: FilterColumn.from_series(_filter_series(df, name)) for name in SEARCH_FILTERS}
+        index = cls(postings, lengths.astype(np.uint16 if lengths.max(initial=0) < 65536 else np.uint32), filters)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"🔎 Índice de búsqueda: {len(postings)} términos, {index.postings_bytes / 1024:.0f} KB "
+            f"de apariciones para {len(df)} comentarios ({elapsed:.0f} ms)"
+        )
+        return index
+
+    def append(self, df: pd.DataFrame) -> "SearchIndex":
+        """
+        Índice nuevo con las filas anexadas (posiciones a continuación del snapshot)
+
+        Solo se indexan las filas nuevas; este índice no se modifica.
+        """
+        text_col = resolve_column(df, 'texto_comentario')
+        if text_col is None:
+            raise ValueError("El dataset no tiene columna de texto")
+
+        raw, lengths = _term_postings(df[text_col], offset=self.n_docs)
+        postings = dict(self.postings)
+        for term, (docs, tfs) in raw.items():
+            posting = postings.get(term)
+            postings[term] = posting.extend(docs, tfs) if posting is not None else PostingList(docs, tfs)
+
+        merged = np.concatenate([self.lengths.astype(np.int64), lengths])
+        filters = {name: column.extend(_filter_series(df, name)) for name, column in self.filters.items()}
+        return SearchIndex(
+            postings, merged.astype(np.uint16 if merged.max(initial=0) < 65536 else np.uint32), filters
+        )
+
+    @property
+    def postings_bytes(self) -> int:
+        return sum(p.nbytes for p in self.postings.values())
+
+    @staticmethod
+    def analyze(query: str) -> List[str]:
+        """Términos de la consulta con el mismo tratamiento que el índice"""
+        terms = [fold_accents(t) for t in tokenize(query, min_length=SEARCH_MIN_TOKEN_LENGTH)]
+        return list(dict.fromkeys(terms))
+
+    def _filter_bitmap(self, filters: Dict[str, List[str]]) -> Optional[np.ndarray]:
+        """AND de los bitmaps de cada filtro (cada uno es el OR de sus valores)"""
+        combined = None
+        for name, values in filters.items():
+            if not values:
+                continue
+            if name not in self.filters:
+                raise ValueError(f"Filtro no soportado: {name}")
+            key = (name, tuple(sorted(set(values))))
+            bitmap = self._bitmaps.get(key)
+            if bitmap is None:
+                bitmap = self.filters[name].bitmap(list(key[1]))
+                if len(self._bitmaps) >= MAX_CACHED_BITMAPS:
+                    self._bitmaps.pop(next(iter(self._bitmaps)))
+                self._bitmaps[key] = bitmap
+            combined = bitmap if combined is None else combined & bitmap
+        return combined
+
+    def search(
+        self,
+        query: str,
+        filters: Optional[Dict[str, List[str]]] = None,
+        offset: int = 0,
+        limit: int = 20,
+        match_all: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Comentarios que contienen los términos de la consulta, ordenados por BM25
+
+        Args:
+            query: Texto libre
+            filters: Filtro -> valores permitidos (ver SEARCH_FILTERS)
+            offset: Resultados a saltar
+            limit: Máximo de resultados
+            match_all: Exigir todos los términos (por defecto basta uno)
+
+        Returns:
+            Posiciones y puntajes de la página, total de coincidencias y términos usados
+        """
+        terms = self.analyze(query)
+        if not terms:
+            raise ValueError("La consulta no contiene términos buscables")
+
+        known = [t for t in terms if t in self.postings]
+        empty = {
+            'positions': np.array([], dtype=np.int64), 'scores': np.array([], dtype=np.float32),
+            'total': 0, 'terms': terms, 'unknown_terms': [t for t in terms if t not in self.postings]
+        }
+        if not known or (match_all and len(known) < len(terms)):
+            return empty
+
+        n = self.n_docs
+        avgdl = max(float(self.lengths.mean()), 1.0)
+        doc_parts, score_parts = [], []
+        for term in known:
+            posting = self.postings[term]
+            docs = posting.docs()
+            tf = posting.tfs.astype(np.float32)
+            df_t = len(posting)
+            idf = np.log1p((n - df_t + 0.5) / (df_t + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[docs].astype(np.float32) / avgdl)
+            doc_parts.append(docs)
+            score_parts.append((idf * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32))
+
+        docs = np.concatenate(doc_parts)
+        scores = np.concatenate(score_parts)
+        if len(known) > 1:
+            order = np.argsort(docs, kind='stable')
+            docs, scores = docs[order], scores[order]
+            docs, starts, hits = np.unique(docs, return_index=True, return_counts=True)
+            scores = np.add.reduceat(scores, starts)
+            if match_all:
+                keep = hits == len(known)
+                docs, scores = docs[keep], scores[keep]
+
+        bitmap = self._filter_bitmap(filters or {})
+        if bitmap is not None:
+            keep = ((bitmap[docs >> 3] >> (7 - (docs & 7))) & 1).astype(bool)
+            docs, scores = docs[keep], scores[keep]
+
+        total = len(docs)
+        k = min(total, offset + limit)
+        if k > 0 and k < total:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        # Puntaje descendente y, a igual puntaje, el comentario más antiguo primero
+        order = np.lexsort((docs, -scores))[offset:offset + limit]
+
+        return {
+            'positions': docs[order],
+            'scores': scores[order],
+            'total': int(total),
+            'terms': terms,
+            'unknown_terms': empty['unknown_terms']
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Tamaño del índice y compresión de las listas de apariciones"""
+        entries = sum(len(p) for p in self.postings.values())
+        return {
+            'documents': self.n_docs,
+            'terms': len(self.postings),
+            'postings': entries,
+            'postings_bytes': self.postings_bytes,
+            # Referencia sin comprimir: posición int64 + frecuencia int32
+            'uncompressed_bytes': entries * 12,
+            'avg_doc_length': round(float(self.lengths.mean()), 2) if self.n_docs else 0.0
+        }
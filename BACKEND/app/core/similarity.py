@@ -0,0 +1,404 @@
+"""
+Comentarios similares por vecinos más cercanos sobre TF-IDF disperso
+
+El snapshot se embebe una sola vez con un TfidfVectorizer propio, ajustado
+sobre los textos limpios del snapshot (sin tildes ni stopwords, tf
+sublineal). El del clasificador no sirve: sus ~500 términos más
+discriminantes dejan muchas consultas libres sin ningún término y los
+vecinos salen al azar. La matriz CSR tiene filas de norma 1, así la
+similitud coseno es un producto punto. Dos modos:
+
+- exact: producto disperso contra la matriz traspuesta (término × fila):
+  solo se tocan las filas que comparten algún término con la consulta.
+- lsh: proyecciones aleatorias con signo (SimHash). Cada una de las
+  LSH_TABLES tablas guarda firmas ordenadas (bits según el tamaño del
+  snapshot, hasta LSH_BITS); la consulta toma su cubeta y, con radio 1, las
+  cubetas a un bit de distancia (búsqueda binaria), y re-puntúa solo esos
+  candidatos de forma exacta.
+
+Las filas sin ningún término del vocabulario no tienen vecinos y no entran
+en las tablas; una consulta de texto sin términos conocidos se rechaza
+(EmptyQueryError) en lugar de devolver vecinos sin sentido. El índice
+guarda la referencia al snapshot y al vectorizador con que se construyó,
+así los resultados siempre son coherentes aunque se cargue otro dataset
+mientras tanto. Solo depende de la versión del dataset, no del modelo.
+
+Si la versión nueva solo anexa filas a la del índice, las filas nuevas se
+embeben con el vocabulario vigente y se insertan en las tablas LSH; el
+vocabulario se vuelve a ajustar cuando el snapshot supera REFIT_GROWTH veces
+las filas con que se ajustó.
+"""
+
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer, strip_accents_unicode
+from sklearn.preprocessing import normalize
+
+from app.core.columns import resolve_column
+from app.core.dataset import dataset_manager
+from app.core.text import clean_text, spanish_stopwords
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBED_CHUNK_ROWS = 50000
+LSH_TABLES = 8
+LSH_BITS = 16
+# Filas esperadas por cubeta: fija los bits de firma según el tamaño del snapshot
+LSH_BUCKET_ROWS = 16
+LSH_SEED = 42
+# Crecimiento del snapshot (por anexos) a partir del cual se reajusta el vocabulario
+REFIT_GROWTH = 2.0
+SIMILARITY_METHODS = ('exact', 'lsh')
+
+
+class SimilarityNotReady(RuntimeError):
+    """El índice de similitud todavía no se construyó"""
+
+
+class EmptyQueryError(ValueError):
+    """La consulta no comparte ningún término con el vocabulario del snapshot"""
+
+
+def similarity_vectorizer(rows: int) -> TfidfVectorizer:
+    """
+    TfidfVectorizer para vecinos: vocabulario amplio del propio snapshot
+
+    Args:
+        rows: Comentarios con los que se ajustará (max_df solo tiene sentido con varios)
+    """
+    return TfidfVectorizer(
+        lowercase=False,
+        strip_accents='unicode',
+        token_pattern=r'(?u)\b\w\w+\b',
+        stop_words=sorted({strip_accents_unicode(w) for w in spanish_stopwords()}),
+        max_df=settings.SIMILARITY_MAX_DF if rows >= 10 else 1.0,
+        max_features=settings.SIMILARITY_MAX_FEATURES,
+        sublinear_tf=True,
+        dtype=np.float32
+    )
+
+
+def embed_texts(vectorizer, texts: pd.Series) -> sparse.csr_matrix:
+    """TF-IDF (float32, filas de norma 1) de los textos limpios"""
+    parts = [
+        vectorizer.transform(texts.iloc[start:start + EMBED_CHUNK_ROWS].astype(object).map(clean_text))
+        for start in range(0, len(texts), EMBED_CHUNK_ROWS)
+    ]
+    matrix = sparse.vstack(parts, format='csr') if parts else sparse.csr_matrix((0, len(vectorizer.vocabulary_)))
+    return normalize(matrix.astype(np.float32), norm='l2', copy=False)
+
+
+def lsh_bits(rows: int) -> int:
+    """Bits de firma para ~LSH_BUCKET_ROWS filas por cubeta (entre 8 y LSH_BITS)"""
+    return int(np.clip(np.ceil(np.log2(max(rows, 1) / LSH_BUCKET_ROWS)), 8, LSH_BITS))
+
+
+class RandomProjectionLSH:
+    """
+    Tablas de firmas SimHash (signo de proyecciones gaussianas)
+
+    Las tablas se guardan juntas: una clave uint64 (tabla << 32 | firma)
+    ordenada y la fila de cada clave, así todas las cubetas de una consulta
+    se ubican con un par de searchsorted.
+    """
+
+    def __init__(self, dimensions: int, tables: int = LSH_TABLES, bits: int = LSH_BITS, seed: int = LSH_SEED):
+        if not 1 <= bits <= 32:
+            raise ValueError("bits debe estar entre 1 y 32")
+        self.tables = tables
+        self.bits = bits
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((dimensions, tables * bits)).astype(np.float32)
+        self._weights = (np.uint64(1) << np.arange(bits, dtype=np.uint64)).astype(np.uint32)
+        self._table_offsets = np.arange(tables, dtype=np.uint64) << np.uint64(32)
+        self.keys = np.array([], dtype=np.uint64)
+        self.rows = np.array([], dtype=np.int64)
+
+    def signatures(self, matrix: sparse.csr_matrix) -> np.ndarray:
+        """Firma uint32 por fila y tabla (n × tables), por bloques"""
+        out = np.empty((matrix.shape[0], self.tables), dtype=np.uint32)
+        for start in range(0, matrix.shape[0], EMBED_CHUNK_ROWS):
+            projected = np.asarray(matrix[start:start + EMBED_CHUNK_ROWS] @ self.planes)
+            bits = (projected > 0).reshape(-1, self.tables, self.bits)
+            out[start:start + len(bits)] = (bits * self._weights).sum(axis=2, dtype=np.uint32)
+        return out
+
+    def fit(self, matrix: sparse.csr_matrix, rows: np.ndarray) -> "RandomProjectionLSH":
+        """Indexa las filas `rows` de la matriz"""
+        keys = (self.signatures(matrix[rows]).astype(np.uint64) | self._table_offsets).T.ravel()
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.rows = np.tile(rows, self.tables)[order].astype(np.int32 if matrix.shape[0] < 2**31 else np.int64)
+        return self
+
+    def extend(self, matrix: sparse.csr_matrix, rows: np.ndarray) -> "RandomProjectionLSH":
+        """Copia con las filas `rows` agregadas (la original sigue atendiendo consultas)"""
+        extended = copy.copy(self)
+        keys = (self.signatures(matrix[rows]).astype(np.uint64) | self._table_offsets).T.ravel()
+        all_keys = np.concatenate([self.keys, keys])
+        all_rows = np.concatenate([self.rows.astype(np.int64), np.tile(rows, self.tables)])
+        order = np.argsort(all_keys, kind='stable')
+        extended.keys = all_keys[order]
+        extended.rows = all_rows[order].astype(np.int32 if matrix.shape[0] < 2**31 else np.int64)
+        return extended
+
+    def candidates(self, query: sparse.csr_matrix, radius: int = 1) -> np.ndarray:
+        """Filas en la cubeta de la consulta (y a `radius` bits, 0 o 1) en cualquier tabla"""
+        signature = self.signatures(query)[0]
+        flips = np.concatenate([[0], self._weights]).astype(np.uint32) if radius else np.zeros(1, dtype=np.uint32)
+        probes = ((signature[:, None] ^ flips[None, :]).astype(np.uint64) | self._table_offsets[:, None]).ravel()
+        lo = np.searchsorted(self.keys, probes, 'left')
+        hi = np.searchsorted(self.keys, probes, 'right')
+        sizes = hi - lo
+        total = int(sizes.sum())
+        if total == 0:
+            return np.array([], dtype=np.int64)
+        # Concatenación de los rangos [lo, hi) sin bucle
+        starts = np.repeat(lo - np.cumsum(sizes) + sizes, sizes)
+        found = np.sort(self.rows[starts + np.arange(total)])
+        # Una fila aparece en varias tablas (sort + diff es más rápido que np.unique aquí)
+        return found[np.concatenate([[True], found[1:] != found[:-1]])].astype(np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return self.planes.nbytes + self.keys.nbytes + self.rows.nbytes
+
+
+class SimilarityIndex:
+    """
+    Matriz TF-IDF del snapshot + tablas LSH
+    """
+
+    def __init__(self, df: pd.DataFrame, vectorizer, matrix: sparse.csr_matrix,
+                 dataset_version: Optional[str], lsh: Optional[RandomProjectionLSH] = None,
+                 fitted_rows: Optional[int] = None):
+        self.df = df
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        # Término × fila: el producto exacto recorre solo las filas de los términos de la consulta
+        self.by_term = matrix.T.tocsr()
+        self.dataset_version = dataset_version
+        self.indexed = np.flatnonzero(np.diff(matrix.indptr) > 0)
+        # Filas sobre las que se ajustó el vocabulario
+        self.fitted_rows = fitted_rows if fitted_rows is not None else matrix.shape[0]
+        self.lsh = lsh or RandomProjectionLSH(matrix.shape[1], bits=lsh_bits(len(self.indexed))).fit(matrix, self.indexed)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dataset_version: Optional[str] = None) -> "SimilarityIndex":
+        """
+        Ajusta el vocabulario sobre el snapshot, lo embebe y construye las tablas LSH
+
+        Args:
+            df: Snapshot normalizado
+            dataset_version: Versión del snapshot
+        """
+        started = time.perf_counter()
+        text_col = resolve_column(df, 'texto_comentario')
+        if text_col is None:
+            raise ValueError("El dataset no tiene columna de texto")
+
+        texts = df[text_col].astype(object).map(clean_text)
+        vectorizer = similarity_vectorizer(len(texts))
+        matrix = normalize(vectorizer.fit_transform(texts).astype(np.float32), norm='l2', copy=False)
+        index = cls(df, vectorizer, matrix.tocsr(), dataset_version)
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"🧭 Índice de similitud: {len(index.indexed)}/{len(df)} comentarios con términos, "
+            f"{index.matrix.shape[1]} términos, {index.matrix.nnz} no nulos ({elapsed:.0f} ms)"
+        )
+        return index
+
+    def extend(self, df: pd.DataFrame, dataset_version: Optional[str] = None) -> "SimilarityIndex":
+        """
+        Índice de df (snapshot del índice + filas anexadas) con el mismo vocabulario
+
+        Solo se embeben y se insertan en las tablas LSH las filas nuevas.
+        """
+        started = time.perf_counter()
+        start = self.matrix.shape[0]
+        text_col = resolve_column(df, 'texto_comentario')
+        if text_col is None:
+            raise ValueError("El dataset no tiene columna de texto")
+
+        tail = embed_texts(self.vectorizer, df[text_col].iloc[start:])
+        matrix = sparse.vstack([self.matrix, tail], format='csr')
+        rows = start + np.flatnonzero(np.diff(tail.indptr) > 0)
+        index = SimilarityIndex(df, self.vectorizer, matrix, dataset_version,
+                                self.lsh.extend(matrix, rows), self.fitted_rows)
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"🧭 Índice de similitud: {tail.shape[0]} comentarios anexados ({elapsed:.0f} ms)")
+        return index
+
+    def embed(self, text: str) -> sparse.csr_matrix:
+        return embed_texts(self.vectorizer, pd.Series([text], dtype=object))
+
+    def _top_k(self, rows: np.ndarray, scores: np.ndarray, k: int, exclude: Optional[int]) -> Dict[str, np.ndarray]:
+        keep = scores > 0
+        if exclude is not None:
+            keep &= rows != exclude
+        rows, scores = rows[keep], scores[keep]
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((rows, -scores))
+        return {'positions': rows[order], 'scores': scores[order]}
+
+    def exact(self, query: sparse.csr_matrix, k: int = 10, exclude: Optional[int] = None) -> Dict[str, Any]:
+        """Top-k por coseno recorriendo solo las filas que comparten términos con la consulta"""
+        terms = query.indices
+        if len(terms) == 0:
+            return {'positions': np.array([], dtype=np.int64), 'scores': np.array([], dtype=np.float32), 'candidates': 0}
+        scores = sparse.csr_matrix(query.data.reshape(1, -1)) @ self.by_term[terms]
+        rows = scores.indices.astype(np.int64)
+        result = self._top_k(rows, scores.data, k, exclude)
+        result['candidates'] = int(len(rows))
+        return result
+
+    def approximate(self, query: sparse.csr_matrix, k: int = 10, exclude: Optional[int] = None,
+                    radius: int = 1) -> Dict[str, Any]:
+        """Top-k re-puntuando solo los candidatos de las cubetas LSH"""
+        if query.nnz == 0:
+            return {'positions': np.array([], dtype=np.int64), 'scores': np.array([], dtype=np.float32), 'candidates': 0}
+        rows = self.lsh.candidates(query, radius=radius)
+        dense = query.toarray().ravel()
+        scores = self.matrix[rows] @ dense if len(rows) else np.array([], dtype=np.float32)
+        result = self._top_k(rows, scores, k, exclude)
+        result['candidates'] = int(len(rows))
+        return result
+
+    def similar(
+        self,
+        text: Optional[str] = None,
+        position: Optional[int] = None,
+        k: int = 10,
+        method: str = 'exact'
+    ) -> Dict[str, Any]:
+        """
+        Vecinos más cercanos de un texto libre o de un comentario del snapshot
+
+        Args:
+            text: Texto a comparar
+            position: Posición de un comentario del snapshot (se excluye de los vecinos)
+            k: Número de vecinos
+            method: 'exact' o 'lsh'
+
+        Returns:
+            Posiciones y similitudes coseno de los vecinos, candidatos evaluados y latencia
+
+        Raises:
+            EmptyQueryError: El texto no tiene ningún término del vocabulario
+        """
+        if method not in SIMILARITY_METHODS:
+            raise ValueError(f"Método no soportado: {method}")
+        if (text is None) == (position is None):
+            raise ValueError("Indique un texto o una posición, no ambos")
+        if position is not None and not 0 <= position < self.matrix.shape[0]:
+            raise ValueError(f"Posición fuera de rango: {position}")
+
+        started = time.perf_counter()
+        query = self.matrix[position] if position is not None else self.embed(text)
+        if position is None and query.nnz == 0:
+            raise EmptyQueryError("La consulta no contiene términos presentes en los comentarios del dataset")
+        search = self.exact if method == 'exact' else self.approximate
+        result = search(query, k=k, exclude=position)
+        result['query_terms'] = int(query.nnz)
+        result['query_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'rows': int(self.matrix.shape[0]),
+            'indexed_rows': int(len(self.indexed)),
+            'features': int(self.matrix.shape[1]),
+            'nonzeros': int(self.matrix.nnz),
+            'matrix_bytes': int(self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes),
+            'lsh': {'tables': self.lsh.tables, 'bits': self.lsh.bits, 'bytes': int(self.lsh.nbytes)},
+            'dataset_version': self.dataset_version
+        }
+
+
+class SimilarityService:
+    """Índice vigente y reconstrucción en segundo plano (un trabajo a la vez)"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="similarity")
+        self._lock = threading.Lock()
+        self._index: Optional[SimilarityIndex] = None
+        self._pending: Optional[str] = None
+
+    @property
+    def index(self) -> Optional[SimilarityIndex]:
+        with self._lock:
+            return self._index
+
+    def get(self) -> SimilarityIndex:
+        """Índice más reciente (puede corresponder a una versión anterior mientras se reconstruye)"""
+        index = self.index
+        if index is None:
+            raise SimilarityNotReady("El índice de similitud aún no está construido")
+        return index
+
+    def is_current(self, dataset_version: Optional[str]) -> bool:
+        index = self.index
+        return index is not None and index.dataset_version == dataset_version
+
+    def schedule(self, manager, analyzer=None) -> Optional[Future]:
+        """
+        Encola la construcción para el snapshot vigente
+
+        No hace nada si el índice ya corresponde a esa versión o si la misma
+        construcción ya está en cola; si la versión solo anexó filas a la del
+        índice, lo extiende. `analyzer` se acepta por la firma de
+        los suscriptores del DatasetManager (el índice no usa el modelo).
+        """
+        current = self.index
+        with manager.lock:
+            df, key = manager.df, manager.version
+            start = manager.appended_since(current.dataset_version) if current is not None else None
+        if df is None or self.is_current(key):
+            return None
+        # Solo anexos sobre el índice vigente y sin crecer demasiado: se extiende
+        extend = (
+            start is not None and start == current.matrix.shape[0]
+            and len(df) <= REFIT_GROWTH * current.fitted_rows
+        )
+        with self._lock:
+            if self._pending == key:
+                return None
+            self._pending = key
+
+        def job() -> Optional[SimilarityIndex]:
+            try:
+                with self._lock:
+                    if self._pending != key:
+                        return None
+                index = current.extend(df, key) if extend else SimilarityIndex.from_frame(df, key)
+                with self._lock:
+                    if self._pending == key:
+                        self._index = index
+                        self._pending = None
+                return index
+            except Exception as e:
+                logger.error(f"❌ Error construyendo el índice de similitud: {e}", exc_info=True)
+                with self._lock:
+                    if self._pending == key:
+                        self._pending = None
+                return None
+
+        return self._executor.submit(job)
+
+
+# Instancia global
+similarity_service = SimilarityService()
+
+# Se reconstruye cada vez que el snapshot queda ingerido y etiquetado
+dataset_manager.subscribe('similarity', similarity_service.schedule)
@@ -0,0 +1,140 @@
+"""
+Caché columnar en disco del dataset ya normalizado
+
+Tras la primera ingesta el DataFrame normalizado (columnas renombradas,
+metadatos de publicación propagados, tipos compactos) se guarda como Arrow
+IPC / Feather sin comprimir en DATASET_CACHE_DIR. En los arranques
+siguientes, si el CSV no cambió, el archivo se abre con memory-map y se
+convierte a pandas sin volver a parsear.
+
+La clave es el SHA-256 del contenido del CSV (el mtime no sobrevive a copias
+entre contenedores) más CACHE_FORMAT_VERSION, que se incrementa cuando cambia
+la normalización.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import pandas as pd
+
+from app.utils.config import settings
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+# Incrementar cuando cambie la normalización del dataset
+CACHE_FORMAT_VERSION = 4
+CACHE_EXTENSION = ".arrow"
+HASH_BLOCK_BYTES = 1 << 20
+MEMORY_REPORT_KEY = b"memory_report"
+DATASET_VERSION_KEY = b"dataset_version"
+
+
+def source_fingerprint(filepath: Union[str, Path]) -> str:
+    """SHA-256 del archivo fuente leído por bloques"""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(filepath: Union[str, Path], fingerprint: str) -> Path:
+    """Archivo de caché para una versión concreta del CSV"""
+    stem = Path(filepath).stem
+    return Path(settings.DATASET_CACHE_DIR) / f"{stem}.v{CACHE_FORMAT_VERSION}.{fingerprint[:16]}{CACHE_EXTENSION}"
+
+
+def load_cached_frame(
+    filepath: Union[str, Path],
+    fingerprint: Optional[str] = None
+) -> Optional[Tuple[pd.DataFrame, Dict[str, Dict[str, Any]], Optional[str]]]:
+    """
+    DataFrame normalizado desde la caché, o None si no hay una vigente
+
+    Returns:
+        Tupla (DataFrame, reporte de memoria, versión del contenido) o None
+    """
+    if not (HAS_PYARROW and settings.ENABLE_DATASET_CACHE):
+        return None
+
+    path = cache_path(filepath, fingerprint or source_fingerprint(filepath))
+    if not path.exists():
+        return None
+
+    try:
+        with pa.memory_map(str(path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        metadata = table.schema.metadata or {}
+        memory_report = json.loads(metadata.get(MEMORY_REPORT_KEY, b"{}"))
+        version = metadata.get(DATASET_VERSION_KEY)
+        df = table.to_pandas()
+        logger.info(f"⚡ Dataset desde caché columnar: {path.name} ({len(df)} registros)")
+        return df, memory_report, version.decode("utf-8") if version else None
+    except Exception as e:
+        logger.warning(f"⚠️ Caché de dataset ilegible ({path.name}), se vuelve a parsear: {e}")
+        return None
+
+
+def save_cached_frame(
+    filepath: Union[str, Path],
+    df: pd.DataFrame,
+    memory_report: Dict[str, Dict[str, Any]],
+    fingerprint: Optional[str] = None,
+    version: Optional[str] = None
+) -> Optional[Path]:
+    """
+    Guarda el DataFrame normalizado (escritura atómica) y elimina cachés
+    anteriores del mismo archivo fuente
+
+    La versión del contenido (app.core.versions) se guarda en los metadatos
+    para no recalcular los hashes de fila al cargar desde la caché.
+    """
+    if not (HAS_PYARROW and settings.ENABLE_DATASET_CACHE):
+        return None
+
+    path = cache_path(filepath, fingerprint or source_fingerprint(filepath))
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[MEMORY_REPORT_KEY] = json.dumps(memory_report).encode("utf-8")
+        if version:
+            metadata[DATASET_VERSION_KEY] = version.encode("utf-8")
+        table = table.replace_schema_metadata(metadata)
+
+        # Sin compresión: así el archivo se puede mapear en memoria directamente
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                with pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo guardar la caché del dataset: {e}")
+        return None
+
+    for old in path.parent.glob(f"{Path(filepath).stem}.v*{CACHE_EXTENSION}"):
+        if old != path:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    logger.info(f"💾 Caché columnar del dataset: {path.name} ({path.stat().st_size / 1024:.0f} KB)")
+    return path
@@ -0,0 +1,89 @@
+"""
+Tokenización compartida por los índices de texto (palabras frecuentes, sketches)
+
+Usa el mismo criterio que SentimentAnalyzer.get_statistics: palabras
+alfabéticas en minúsculas, de más de 3 letras y fuera de las stopwords.
+clean_text es la limpieza que recibe el modelo (entrenamiento, predicción y
+etiquetado masivo).
+"""
+
+import logging
+import re
+import pandas as pd
+from functools import lru_cache
+from typing import FrozenSet, List
+
+from app.utils.config import STOP_WORDS_SPANISH
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = r'\b[a-záéíóúñ]+\b'
+MIN_TOKEN_LENGTH = 4
+
+# Tildes fuera (la ñ se conserva): "matrícula" y "matricula" son el mismo término
+_ACCENTS = str.maketrans('áéíóú', 'aeiou')
+
+
+@lru_cache(maxsize=1)
+def spanish_stopwords() -> FrozenSet[str]:
+    """Stopwords de NLTK si están disponibles, o la lista básica de config"""
+    try:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('spanish'))
+    except Exception:
+        logger.warning("Usando stopwords básicas")
+        return frozenset(STOP_WORDS_SPANISH)
+
+
+def clean_text(text: str) -> str:
+    """Limpia un comentario para el vectorizador del modelo"""
+    if not isinstance(text, str):
+        return ""
+
+    text = text.lower()
+    text = re.sub(r'https?://\S+|www\.\S+', '', text)
+    text = re.sub(r'@\w+', '', text)
+    text = re.sub(r'#\w+', '', text)
+    text = re.sub(r'[^\w\sáéíóúñ]', ' ', text)
+    text = re.sub(r'\d+', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    return text
+
+
+def fold_accents(token: str) -> str:
+    """Quita las tildes de un token en minúsculas"""
+    return token.translate(_ACCENTS)
+
+
+def tokenize(text: str, min_length: int = MIN_TOKEN_LENGTH) -> List[str]:
+    """Tokens válidos de un texto"""
+    stop = spanish_stopwords()
+    return [
+        w for w in re.findall(TOKEN_PATTERN, str(text).lower())
+        if len(w) >= min_length and w not in stop
+    ]
+
+
+def tokenize_series(texts: pd.Series, min_length: int = MIN_TOKEN_LENGTH) -> pd.Series:
+    """
+    Tokeniza una columna de texto de forma vectorizada
+
+    Args:
+        texts: Serie de textos
+        min_length: Longitud mínima de un token
+
+    Returns:
+        Serie de tokens cuyo índice es la posición (0..n-1) de la fila de origen
+    """
+    tokens = (
+        texts.reset_index(drop=True)
+        .astype(str)
+        .str.lower()
+        .str.findall(TOKEN_PATTERN)
+        .explode()
+        .dropna()
+    )
+    stop = spanish_stopwords()
+    mask = (tokens.str.len() >= min_length) & ~tokens.isin(stop)
+    return tokens[mask].astype(object)
@@ -0,0 +1,243 @@
+"""
+Índice de hilos de respuesta (ID_Comentario / Es_Respuesta_A)
+
+Cada fila apunta a su comentario padre dentro de la misma publicación
+(C1.2 -> C1). A partir de ese arreglo de punteros se calcula, con
+operaciones vectorizadas, la profundidad y la raíz del hilo (saltos de
+puntero: O(n log n) sin importar la profundidad), los ciclos de respuesta
+(se cortan y se informan en el log) y un orden en
+preorden donde cada subárbol ocupa un rango contiguo. Así las consultas de
+subárbol y sus conteos por sentimiento no recorren la tabla completa.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes
+
+logger = logging.getLogger(__name__)
+
+def _group_exclusive_cumsum(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Suma acumulada exclusiva de values dentro de cada grupo (ya ordenado)"""
+    if len(values) == 0:
+        return values
+    excl = np.cumsum(values) - values
+    is_start = np.ones(len(groups), dtype=bool)
+    is_start[1:] = groups[1:] != groups[:-1]
+    starts = np.maximum.accumulate(np.where(is_start, np.arange(len(groups)), 0))
+    return excl - excl[starts]
+
+
+class ThreadIndex:
+    """
+    Árbol de respuestas construido con arreglos de punteros al padre
+    """
+
+    def __init__(
+        self,
+        lookup: pd.Index,
+        positions: np.ndarray,
+        parent: np.ndarray,
+        sentiment: np.ndarray
+    ):
+        self.lookup = lookup
+        self.positions = positions
+        self.parent = parent
+        self.sentiment = sentiment
+        self._build()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ThreadIndex":
+        """
+        Construye el índice en O(n) usando búsquedas hash sobre las claves
+
+        Args:
+            df: DataFrame con publicacion, id_comentario y es_respuesta_a
+
+        Returns:
+            ThreadIndex alineado posicionalmente con df
+        """
+        pub_col = resolve_column(df, 'publicacion')
+        id_col = resolve_column(df, 'id_comentario')
+        reply_col = resolve_column(df, 'es_respuesta_a')
+
+        if pub_col is None or id_col is None:
+            raise ValueError("El dataset no tiene columnas publicacion / id_comentario")
+
+        pub = df[pub_col].astype(str).str.strip()
+        ids = df[id_col].astype('string').str.strip()
+
+        # Padre explícito; si falta se deduce del propio ID (C1.2 -> C1)
+        derived = ids.str.extract(r'^(.+)\.[^.]+$')[0]
+        if reply_col is not None:
+            explicit = df[reply_col].astype('string').str.strip()
+            explicit = explicit.mask(explicit.isin(['-', '', 'nan']))
+            parent_ids = explicit.fillna(derived)
+        else:
+            parent_ids = derived
+
+        keys = pub + '|' + ids.fillna('')
+        parent_keys = pub + '|' + parent_ids.fillna('')
+
+        # Primera aparición de cada clave -> posición (los duplicados no son padres)
+        first = ~keys.duplicated(keep='first') & ids.notna().to_numpy()
+        positions = np.flatnonzero(first.to_numpy())
+        lookup = pd.Index(keys[first].to_numpy())
+
+        found = lookup.get_indexer(parent_keys.to_numpy())
+        parent = np.where(found >= 0, positions[found], -1)
+        parent[parent_ids.isna().to_numpy()] = -1
+        parent[parent == np.arange(len(parent))] = -1
+
+        index = cls(lookup, positions, parent.astype(np.int64), sentiment_codes(df))
+        logger.info(
+            f"🧵 Índice de hilos: {int((index.depth == 0).sum())} raíces, "
+            f"{int((index.depth > 0).sum())} respuestas, profundidad máx {int(index.depth.max(initial=0))}"
+        )
+        return index
+
+    def _build(self) -> None:
+        """Profundidad, raíz, tamaño de subárbol y preorden"""
+        n = len(self.parent)
+        parent = self.parent
+        nodes_all = np.arange(n, dtype=np.int64)
+
+        # Saltos de puntero (pointer doubling): las raíces apuntan a sí mismas
+        # y en cada iteración anc = anc[anc], así la distancia cubierta se
+        # duplica; basta con ceil(log2(n)) + 1 iteraciones para cualquier hilo
+        is_root = parent < 0
+        anc = np.where(is_root, nodes_all, parent)
+        dist = (~is_root).astype(np.int64)
+        rounds = int(np.ceil(np.log2(max(n, 2)))) + 1
+        for _ in range(rounds):
+            if is_root[anc].all():
+                break
+            dist += dist[anc]
+            anc = anc[anc]
+
+        pending = ~is_root[anc]
+        if pending.any():
+            # Tras más de n pasos, anc de cada fila pendiente está dentro de su
+            # ciclo. Cada ciclo se corta en su fila de menor posición (mínimo
+            # por saltos de puntero), que pasa a ser la raíz del hilo.
+            members = np.unique(anc[pending])
+            low = nodes_all.copy()
+            hop = np.where(is_root, nodes_all, parent)
+            for _ in range(rounds):
+                low = np.minimum(low, low[hop])
+                hop = hop[hop]
+            leaders = np.unique(low[members])
+            logger.warning(
+                f"⚠️ {len(leaders)} ciclos de respuesta ({int(pending.sum())} comentarios afectados): "
+                f"se cortan en su primer comentario, que queda como raíz"
+            )
+            parent[leaders] = -1
+            return self._build()
+
+        depth = dist.astype(np.int32)
+        root = anc
+
+        # Tamaño de subárbol, de las hojas hacia arriba
+        size = np.ones(n, dtype=np.int64)
+        max_depth = int(depth.max(initial=0))
+        by_depth = np.argsort(depth, kind='stable')
+        by_level = np.split(by_depth, np.cumsum(np.bincount(depth, minlength=max_depth + 1))[:-1])
+        for level in range(max_depth, 0, -1):
+            nodes = by_level[level]
+            np.add.at(size, parent[nodes], size[nodes])
+
+        # Posición en preorden: cada subárbol queda en [tin, tin + size)
+        tin = np.zeros(n, dtype=np.int64)
+        roots = by_level[0] if by_level else np.array([], dtype=np.int64)
+        tin[roots] = np.cumsum(size[roots]) - size[roots]
+        for level in range(1, max_depth + 1):
+            nodes = by_level[level]
+            nodes = nodes[np.argsort(parent[nodes], kind='stable')]
+            offset = _group_exclusive_cumsum(parent[nodes], size[nodes])
+            tin[nodes] = tin[parent[nodes]] + 1 + offset
+
+        order = np.empty(n, dtype=np.int64)
+        order[tin] = np.arange(n)
+
+        # Conteos acumulados por sentimiento en preorden (subárbol en O(1))
+        one_hot = np.zeros((n + 1, len(SENTIMENT_LABELS)), dtype=np.int64)
+        one_hot[np.arange(1, n + 1), self.sentiment[order]] = 1
+        self.prefix = np.cumsum(one_hot, axis=0)
+
+        self.depth = depth
+        self.root = root
+        self.size = size
+        self.tin = tin
+        self.order = order
+
+    def locate(self, publicacion: Any, comment_id: str) -> Optional[int]:
+        """Posición de un comentario por (publicación, ID) o None"""
+        found = self.lookup.get_indexer([f"{publicacion}|{comment_id}"])[0]
+        return int(self.positions[found]) if found >= 0 else None
+
+    def subtree(self, position: int) -> np.ndarray:
+        """Posiciones del subárbol (incluida la raíz) en preorden"""
+        start = self.tin[position]
+        return self.order[start:start + self.size[position]]
+
+    def subtree_sentiment(self, position: int) -> Dict[str, int]:
+        """Conteo por sentimiento del subárbol sin recorrerlo"""
+        start = self.tin[position]
+        counts = self.prefix[start + self.size[position]] - self.prefix[start]
+        return {label: int(c) for label, c in zip(SENTIMENT_LABELS, counts)}
+
+    def summary(self) -> Dict[str, Any]:
+        """Agregados a nivel de conversación"""
+        is_reply = self.parent >= 0
+        roots = ~is_reply
+
+        def distribution(mask: np.ndarray) -> Dict[str, int]:
+            counts = np.bincount(self.sentiment[mask], minlength=len(SENTIMENT_LABELS))
+            return {label: int(c) for label, c in zip(SENTIMENT_LABELS, counts)}
+
+        # Cambios de sentimiento respecto al comentario padre
+        child = np.flatnonzero(is_reply)
+        parent_sent = self.sentiment[self.parent[child]]
+        child_sent = self.sentiment[child]
+        k = len(SENTIMENT_LABELS)
+        transitions = np.bincount(parent_sent * k + child_sent, minlength=k * k).reshape(k, k)
+        flips = int(len(child) - np.trace(transitions))
+
+        thread_sizes = self.size[roots]
+        with_replies = thread_sizes > 1
+        size_hist = np.bincount(np.minimum(thread_sizes, 10))
+
+        return {
+            'total_comments': int(len(self.parent)),
+            'threads': int(roots.sum()),
+            'threads_with_replies': int(with_replies.sum()),
+            'total_replies': int(is_reply.sum()),
+            'avg_replies_per_thread': round(float((thread_sizes - 1).mean()), 3) if len(thread_sizes) else 0.0,
+            'max_depth': int(self.depth.max(initial=0)),
+            'depth_histogram': {str(d): int(c) for d, c in enumerate(np.bincount(self.depth)) if c},
+            'thread_size_histogram': {
+                (f"{s}+" if s == 10 else str(s)): int(c) for s, c in enumerate(size_hist) if c
+            },
+            'root_sentiment': distribution(roots),
+            'reply_sentiment': distribution(is_reply),
+            'sentiment_flips': flips,
+            'flip_rate': round(flips / len(child), 4) if len(child) else 0.0,
+            'transitions': {
+                SENTIMENT_LABELS[i]: {SENTIMENT_LABELS[j]: int(transitions[i, j]) for j in range(k)}
+                for i in range(k)
+            }
+        }
+
+    def rows_for(self, positions: np.ndarray) -> List[Dict[str, Any]]:
+        """Metadatos de árbol de las posiciones indicadas"""
+        return [
+            {
+                'position': int(p),
+                'depth': int(self.depth[p]),
+                'parent_position': int(self.parent[p]),
+                'sentiment': SENTIMENT_LABELS[self.sentiment[p]]
+            }
+            for p in positions
+        ]
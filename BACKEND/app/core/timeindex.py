@@ -0,0 +1,397 @@
+"""
+Índice temporal del dataset y agregados diarios precalculados
+
+Las fechas salen de una columna 'fecha' cuando existe, o de las antigüedades
+relativas de Instagram ("7 sem", "3 d", "5 h") respecto a la fecha de
+extracción del archivo (df.attrs['reference_date']). Los comentarios sin
+antigüedad propia toman la de su publicación, interpolada entre
+publicaciones vecinas.
+
+Con las filas ordenadas por fecha, un período es un corte por búsqueda
+binaria. Los agregados por día (sentimiento, likes, longitud, palabras) se
+guardan como sumas acumuladas, así el reporte de cualquier período se arma
+con restas de prefijos sin recorrer filas.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from scipy import sparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes, like_counts
+from app.core.text import tokenize_series
+from app.core.weighted import WeightedMetrics
+
+logger = logging.getLogger(__name__)
+
+DATE_COLUMNS = ['fecha', 'date', 'timestamp']
+RELATIVE_AGE_COLUMNS = ['antiguedad', 'tiempo']
+
+# Unidades de antigüedad de Instagram en español
+AGE_UNITS = {
+    's': 'seconds',
+    'min': 'minutes',
+    'h': 'hours',
+    'd': 'days',
+    'sem': 'weeks',
+}
+AGE_PATTERN = r'^\s*(\d+)\s*(sem|min|s|h|d)\s*$'
+
+DAY_NS = np.int64(86_400 * 10**9)
+
+
+def split_misplaced_ages(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mueve a 'antiguedad' las antigüedades que el scraper dejó en 'usuario'
+
+    En parte de las filas extraídas de Instagram la celda de usuario trae
+    la antigüedad del comentario ("7 sem") en lugar del autor. Se pasan a
+    su propia columna y el usuario de esas filas queda vacío, así ni las
+    métricas de autores cuentan "7 sem" como usuario ni la línea de tiempo
+    lee antigüedades de una columna de nombres.
+    """
+    user_col = resolve_column(df, 'usuario')
+    if user_col is None or resolve_column(df, 'antiguedad') is not None:
+        return df
+
+    is_age = df[user_col].astype(str).str.match(AGE_PATTERN).fillna(False).to_numpy(dtype=bool)
+    if not is_age.any():
+        return df
+
+    df['antiguedad'] = df[user_col].where(is_age)
+    df[user_col] = df[user_col].mask(is_age)
+    logger.info(f"🕒 {int(is_age.sum())} antigüedades movidas de '{user_col}' a 'antiguedad'")
+    return df
+
+
+def resolve_timestamps(df: pd.DataFrame, reference: Optional[datetime] = None) -> Tuple[pd.Series, int]:
+    """
+    Fecha de cada comentario
+
+    Args:
+        df: DataFrame del dataset
+        reference: Momento de extracción para resolver antigüedades relativas
+
+    Returns:
+        Tupla (serie datetime64 con NaT si no se pudo resolver, filas imputadas)
+    """
+    date_col = resolve_column(df, *DATE_COLUMNS)
+    if date_col is not None:
+        return pd.to_datetime(df[date_col], errors='coerce').reset_index(drop=True), 0
+
+    reference = pd.Timestamp(reference or datetime.now())
+    timestamps = pd.Series(pd.NaT, index=range(len(df)), dtype='datetime64[ns]')
+
+    for name in RELATIVE_AGE_COLUMNS:
+        col = resolve_column(df, name)
+        if col is None:
+            continue
+        # Se evalúa sobre las categorías y se expande con los códigos
+        values = df[col].astype('category')
+        parts = values.cat.categories.to_series().astype(str).str.extract(AGE_PATTERN)
+        if parts.dropna().empty:
+            continue
+        seconds = np.array([
+            pd.Timedelta(**{AGE_UNITS[unit]: int(amount)}).total_seconds() if isinstance(unit, str) else np.nan
+            for amount, unit in parts.itertuples(index=False)
+        ] + [np.nan])
+        # El código -1 (nulo) apunta al NaN agregado al final
+        age = seconds[values.cat.codes.to_numpy()]
+        resolved = pd.Series(reference - pd.to_timedelta(age, unit='s'), index=timestamps.index)
+        timestamps = timestamps.fillna(resolved.astype(timestamps.dtype))
+
+    # Sin antigüedad propia: la de su publicación, interpolada entre posts vecinos
+    pub_col = resolve_column(df, 'publicacion')
+    missing = timestamps.isna()
+    imputed = 0
+    if pub_col is not None and missing.any() and timestamps.notna().any():
+        posts = pd.to_numeric(df[pub_col], errors='coerce').reset_index(drop=True)
+        per_post = timestamps.astype('int64').where(timestamps.notna()).groupby(posts).median()
+        per_post = per_post.interpolate(limit_direction='both')
+        filled = pd.to_datetime(posts.map(per_post))
+        timestamps = timestamps.fillna(filled)
+        imputed = int((missing & timestamps.notna()).sum())
+
+    return timestamps, imputed
+
+
+def period_bounds(
+    period: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Límites [inicio, fin) de un período de reporte
+
+    Args:
+        period: current, last, quarter, year, custom o all
+        start_date: Inicio ISO (solo custom)
+        end_date: Fin ISO inclusivo (solo custom)
+        now: Fecha de referencia (por defecto hoy)
+
+    Returns:
+        Tupla (inicio, fin). (None, None) significa todo el histórico
+    """
+    now = now or datetime.now()
+    month_start = datetime(now.year, now.month, 1)
+
+    def add_months(date: datetime, months: int) -> datetime:
+        index = date.year * 12 + date.month - 1 + months
+        return datetime(index // 12, index % 12 + 1, 1)
+
+    if period == "current":
+        return month_start, add_months(month_start, 1)
+    elif period == "last":
+        return add_months(month_start, -1), month_start
+    elif period == "quarter":
+        quarter_start = datetime(now.year, (now.month - 1) // 3 * 3 + 1, 1)
+        return quarter_start, add_months(quarter_start, 3)
+    elif period == "year":
+        return datetime(now.year, 1, 1), datetime(now.year + 1, 1, 1)
+    elif period == "custom":
+        if not start_date and not end_date:
+            raise ValueError("El período custom requiere start_date y/o end_date")
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) + timedelta(days=1) if end_date else None
+        return start, end
+    elif period == "all":
+        return None, None
+    else:
+        raise ValueError(f"Período no soportado: {period}")
+
+
+class TimeIndex:
+    """
+    Timestamps ordenados + agregados diarios con sumas acumuladas
+    """
+
+    def __init__(self):
+        self.timestamps = np.array([], dtype=np.int64)
+        self.order = np.array([], dtype=np.int64)
+        self.days = np.array([], dtype=np.int64)
+        self.undated = 0
+        self.imputed = 0
+        self.vocab = np.array([], dtype=object)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TimeIndex":
+        """
+        Resuelve fechas, ordena y agrega por día
+
+        Args:
+            df: DataFrame del dataset (df.attrs['reference_date'] opcional)
+
+        Returns:
+            TimeIndex alineado posicionalmente con df
+        """
+        reference = df.attrs.get('reference_date')
+        timestamps, imputed = resolve_timestamps(df, pd.Timestamp(reference) if reference else None)
+
+        dated = np.flatnonzero(timestamps.notna().to_numpy())
+        if len(dated) == 0:
+            raise ValueError("El dataset no tiene fechas resolubles")
+
+        index = cls()
+        index.undated = int(len(df) - len(dated))
+        index.imputed = imputed
+
+        ns = timestamps.iloc[dated].astype('int64').to_numpy()
+        order = np.argsort(ns, kind='stable')
+        index.timestamps = ns[order]
+        index.order = dated[order]
+
+        # Cubetas diarias
+        day_of_row = index.timestamps // DAY_NS
+        index.days, bucket = np.unique(day_of_row, return_inverse=True)
+        n_days = len(index.days)
+        k = len(SENTIMENT_LABELS)
+
+        rows = df.iloc[index.order]
+        sentiment = sentiment_codes(rows)
+        likes = like_counts(rows)
+        weight = likes + 1.0
+
+        text_col = resolve_column(rows, 'texto_comentario')
+        lengths = (
+            rows[text_col].fillna('').astype(str).str.len().to_numpy(dtype=float)
+            if text_col is not None else np.zeros(len(rows))
+        )
+
+        conf_col = resolve_column(rows, 'confianza')
+        confidence = (
+            pd.to_numeric(rows[conf_col], errors='coerce').to_numpy(dtype=float)
+            if conf_col is not None else np.full(len(rows), np.nan)
+        )
+        has_conf = ~np.isnan(confidence)
+
+        cell = bucket * k + sentiment
+
+        def prefix(values: np.ndarray) -> np.ndarray:
+            zero = np.zeros((1,) + values.shape[1:], dtype=values.dtype)
+            return np.concatenate([zero, np.cumsum(values, axis=0)])
+
+        index.counts = prefix(np.bincount(cell, minlength=n_days * k).reshape(n_days, k))
+        index.weights = prefix(np.bincount(cell, weights=weight, minlength=n_days * k).reshape(n_days, k))
+        index.likes = prefix(np.bincount(bucket, weights=likes, minlength=n_days))
+        index.liked = prefix(np.bincount(bucket, weights=(likes > 0), minlength=n_days))
+        index.lengths = prefix(np.bincount(bucket, weights=lengths, minlength=n_days))
+        index.conf_sum = prefix(np.bincount(bucket[has_conf], weights=confidence[has_conf] * weight[has_conf], minlength=n_days))
+        index.conf_weight = prefix(np.bincount(bucket[has_conf], weights=weight[has_conf], minlength=n_days))
+
+        # Palabras por día como matrices dispersas (días × vocabulario)
+        if text_col is not None:
+            tokens = tokenize_series(rows[text_col])
+            if not tokens.empty:
+                codes, vocab = pd.factorize(tokens, sort=False)
+                token_rows = tokens.index.to_numpy()
+                shape = (n_days, len(vocab))
+                index.word_counts = sparse.csr_matrix(
+                    (np.ones(len(codes)), (bucket[token_rows], codes)), shape=shape
+                )
+                index.word_weights = sparse.csr_matrix(
+                    (weight[token_rows], (bucket[token_rows], codes)), shape=shape
+                )
+                index.vocab = np.asarray(vocab, dtype=object)
+
+        logger.info(
+            f"🕒 Índice temporal: {len(dated)} comentarios fechados ({imputed} imputados por publicación), "
+            f"{index.undated} sin fecha, {n_days} días"
+        )
+        return index
+
+    def row_timestamps(self, rows: int) -> pd.Series:
+        """Fecha resuelta de cada fila del snapshot en su posición original (NaT si no tiene)"""
+        values = np.full(rows, np.iinfo(np.int64).min, dtype=np.int64)
+        values[self.order] = self.timestamps
+        return pd.Series(values.view('datetime64[ns]'))
+
+    def _day_range(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[int, int]:
+        """Rango [i, j) de cubetas diarias para [start, end)"""
+        i = 0 if start is None else int(np.searchsorted(self.days, pd.Timestamp(start).value // DAY_NS, 'left'))
+        j = len(self.days) if end is None else int(np.searchsorted(self.days, pd.Timestamp(end).value // DAY_NS, 'left'))
+        return i, max(i, j)
+
+    def positions(self, start: Optional[datetime], end: Optional[datetime]) -> np.ndarray:
+        """Posiciones de las filas en [start, end) por búsqueda binaria"""
+        i = 0 if start is None else int(np.searchsorted(self.timestamps, pd.Timestamp(start).value, 'left'))
+        j = len(self.timestamps) if end is None else int(np.searchsorted(self.timestamps, pd.Timestamp(end).value, 'left'))
+        return self.order[i:max(i, j)]
+
+    def weighted_metrics(self, i: int, j: int) -> WeightedMetrics:
+        """Métricas ponderadas del rango de días a partir de los prefijos"""
+        word_weights = pd.Series(dtype=float)
+        if hasattr(self, 'word_weights') and j > i:
+            sums = np.asarray(self.word_weights[i:j].sum(axis=0)).ravel()
+            nonzero = np.flatnonzero(sums)
+            word_weights = pd.Series(sums[nonzero], index=self.vocab[nonzero])
+
+        return WeightedMetrics(
+            counts=(self.counts[j] - self.counts[i]).astype(np.int64),
+            weights=self.weights[j] - self.weights[i],
+            total_likes=int(self.likes[j] - self.likes[i]),
+            liked_comments=int(self.liked[j] - self.liked[i]),
+            confidence_sum=float(self.conf_sum[j] - self.conf_sum[i]),
+            confidence_weight=float(self.conf_weight[j] - self.conf_weight[i]),
+            word_weights=word_weights
+        )
+
+    def aggregate(
+        self,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        top_n: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Estadísticas del período [start, end) sin recorrer filas
+
+        Returns:
+            Diccionario con la misma forma que SentimentAnalyzer.get_statistics
+            más el bloque 'weighted' y el rango de fechas cubierto
+        """
+        i, j = self._day_range(start, end)
+        counts = self.counts[j] - self.counts[i]
+        total = int(counts.sum())
+
+        most_common_words = []
+        total_words, unique_words = 0, 0
+        if hasattr(self, 'word_counts') and j > i:
+            sums = np.asarray(self.word_counts[i:j].sum(axis=0)).ravel()
+            top = np.argsort(-sums, kind='stable')[:top_n]
+            most_common_words = [(str(self.vocab[t]), int(sums[t])) for t in top if sums[t] > 0]
+            total_words = int(sums.sum())
+            unique_words = int(np.count_nonzero(sums))
+
+        distribution = {label: int(c) for label, c in zip(SENTIMENT_LABELS, counts)}
+
+        return {
+            'total_comments': total,
+            'distribution': distribution,
+            'percentages': {
+                label: round(c / total * 100, 2) if total else 0.0
+                for label, c in distribution.items()
+            },
+            'avg_comment_length': round(float(self.lengths[j] - self.lengths[i]) / total, 2) if total else 0.0,
+            'most_common_words': most_common_words,
+            'total_words': total_words,
+            'unique_words': unique_words,
+            'weighted': self.weighted_metrics(i, j).to_dict(top_n),
+            'date_range': {
+                'start': self._day_iso(i) if j > i else None,
+                'end': self._day_iso(j - 1) if j > i else None
+            }
+        }
+
+    def _day_iso(self, bucket: int) -> str:
+        return pd.Timestamp(int(self.days[bucket]) * int(DAY_NS)).date().isoformat()
+
+    def series(self, freq: str = 'D') -> List[Dict[str, Any]]:
+        """
+        Serie temporal por día ('D') o semana ('W', lunes como inicio)
+        """
+        if freq not in ('D', 'W'):
+            raise ValueError(f"Frecuencia no soportada: {freq}")
+        if len(self.days) == 0:
+            return []
+
+        # Límites de grupo sobre las cubetas diarias (ya ordenadas)
+        if freq == 'W':
+            # 1970-01-01 fue jueves: desplazar para que las semanas empiecen en lunes
+            keys = (self.days + 3) // 7
+        else:
+            keys = self.days
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(self.days)]
+
+        points = []
+        for i, j in zip(starts, ends):
+            counts = self.counts[j] - self.counts[i]
+            total = int(counts.sum())
+            weights = self.weights[j] - self.weights[i]
+            pos, neg = SENTIMENT_LABELS.index('Positivo'), SENTIMENT_LABELS.index('Negativo')
+            points.append({
+                'period_start': self._day_iso(i) if freq == 'D' else
+                    pd.Timestamp(int(keys[i] * 7 - 3) * int(DAY_NS)).date().isoformat(),
+                'total_comments': total,
+                'distribution': {label: int(c) for label, c in zip(SENTIMENT_LABELS, counts)},
+                'likes': int(self.likes[j] - self.likes[i]),
+                'weighted_score': round(float(weights[pos] - weights[neg]) / float(weights.sum()), 4) if total else 0.0
+            })
+        return points
+
+    def latest(self) -> datetime:
+        """Fecha del comentario más reciente"""
+        return pd.Timestamp(int(self.timestamps[-1])).to_pydatetime()
+
+    def describe(self) -> Dict[str, Any]:
+        """Cobertura del índice"""
+        return {
+            'dated_comments': int(len(self.timestamps)),
+            'imputed_comments': self.imputed,
+            'undated_comments': self.undated,
+            'days': int(len(self.days)),
+            'first_date': self._day_iso(0) if len(self.days) else None,
+            'last_date': self._day_iso(len(self.days) - 1) if len(self.days) else None
+        }
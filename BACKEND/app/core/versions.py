@@ -0,0 +1,141 @@
+"""
+Versiones del dataset direccionadas por contenido
+
+La versión de un snapshot es el SHA-256 de los hashes de sus filas
+normalizadas (pd.util.hash_pandas_object por bloques, en orden) más los
+nombres de columna. Depende solo de los valores: el mismo CSV, o el mismo
+base más los mismos anexos, produce la misma versión en cualquier proceso,
+y cualquier cambio en una fila produce otra. Las columnas del etiquetado
+masivo no cuentan: las cachés derivadas que las leen (almacén de
+comentarios, reportes, keyphrases) usan el par (versión del dataset,
+versión del modelo) en su clave, así que nunca sirven resultados de otro
+dataset o modelo y no recalculan si nada cambió.
+
+VersionStore guarda en DATA_DIR/versions.json un manifiesto pequeño con las
+versiones vistas: origen, filas, columnas y versión de la que deriva.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+VERSION_LENGTH = 16
+HASH_CHUNK_ROWS = 50000
+MANIFEST_NAME = "versions.json"
+MAX_VERSIONS = 100
+
+
+def row_hashes(df: pd.DataFrame, chunk_rows: int = HASH_CHUNK_ROWS) -> np.ndarray:
+    """Hash uint64 del contenido de cada fila (independiente de los tipos compactos)"""
+    if df.empty:
+        return np.array([], dtype=np.uint64)
+    parts = [
+        pd.util.hash_pandas_object(df.iloc[start:start + chunk_rows], index=False).to_numpy()
+        for start in range(0, len(df), chunk_rows)
+    ]
+    return np.concatenate(parts)
+
+
+def dataset_version(hashes: np.ndarray, columns: Sequence[Any]) -> str:
+    """Identificador de versión a partir de los hashes de fila"""
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(str(c) for c in columns).encode("utf-8"))
+    digest.update(np.ascontiguousarray(hashes, dtype=np.uint64).tobytes())
+    return digest.hexdigest()[:VERSION_LENGTH]
+
+
+class VersionStore:
+    """Manifiesto JSON de las versiones de dataset cargadas"""
+
+    def __init__(self, path: Optional[Path] = None, max_versions: int = MAX_VERSIONS):
+        self.path = Path(path or Path(settings.DATA_DIR) / MANIFEST_NAME)
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        self._manifest: Optional[Dict[str, Any]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        if self._manifest is None:
+            self._manifest = {'current': None, 'versions': {}}
+            if self.path.exists():
+                try:
+                    self._manifest = json.loads(self.path.read_text(encoding="utf-8"))
+                except Exception as e:
+                    logger.warning(f"⚠️ Manifiesto de versiones ilegible, se reinicia: {e}")
+        return self._manifest
+
+    def _save(self, manifest: Dict[str, Any]) -> None:
+        """Escritura atómica (temporal en el mismo directorio + os.replace)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def record(self, version: str, **info: Any) -> Dict[str, Any]:
+        """
+        Registra (o refresca) una versión y la marca como vigente
+
+        Args:
+            version: Identificador de la versión
+            info: Metadatos (source, rows, columns, parent, ...)
+        """
+        now = datetime.now().isoformat()
+        with self._lock:
+            manifest = self._load()
+            versions = manifest.setdefault('versions', {})
+            entry = versions.pop(version, None) or {'version': version, 'created_at': now}
+            entry.update(info)
+            entry['last_loaded_at'] = now
+            # Orden de inserción = uso más reciente al final
+            versions[version] = entry
+            while len(versions) > self.max_versions:
+                versions.pop(next(iter(versions)))
+            manifest['current'] = version
+            try:
+                self._save(manifest)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo guardar el manifiesto de versiones: {e}")
+            return dict(entry)
+
+    def get(self, version: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load().get('versions', {}).get(version)
+            return dict(entry) if entry is not None else None
+
+    def reference_date(self, source_sha256: str) -> Optional[str]:
+        """Fecha de extracción registrada para un contenido de CSV (la más antigua)"""
+        with self._lock:
+            dates = [
+                entry['reference_date']
+                for entry in self._load().get('versions', {}).values()
+                if entry.get('source_sha256') == source_sha256 and entry.get('reference_date')
+            ]
+            return min(dates) if dates else None
+
+    @property
+    def current(self) -> Optional[str]:
+        with self._lock:
+            return self._load().get('current')
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Versiones de la más reciente a la más antigua"""
+        with self._lock:
+            return [dict(entry) for entry in reversed(list(self._load().get('versions', {}).values()))]
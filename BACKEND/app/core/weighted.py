@@ -0,0 +1,150 @@
+"""
+Métricas de sentimiento ponderadas por likes (Cantidad_Likes)
+
+Cada comentario pesa 1 + sus likes, de modo que un comentario con 500 likes
+influye más que uno sin reacciones pero ninguno deja de contar. Todas las
+sumas se obtienen con np.bincount sobre el snapshot y son aditivas: al
+anexar filas nuevas basta con sumar la contribución del delta.
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+
+from app.core.columns import SENTIMENT_LABELS, resolve_column, sentiment_codes, like_counts
+from app.core.text import tokenize_series
+
+logger = logging.getLogger(__name__)
+
+
+class WeightedMetrics:
+    """
+    Acumuladores aditivos de distribución, confianza y palabras ponderadas
+    """
+
+    def __init__(
+        self,
+        counts: np.ndarray,
+        weights: np.ndarray,
+        total_likes: int,
+        liked_comments: int,
+        confidence_sum: float,
+        confidence_weight: float,
+        word_weights: pd.Series
+    ):
+        self.counts = counts
+        self.weights = weights
+        self.total_likes = total_likes
+        self.liked_comments = liked_comments
+        self.confidence_sum = confidence_sum
+        self.confidence_weight = confidence_weight
+        self.word_weights = word_weights
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "WeightedMetrics":
+        """
+        Calcula los acumuladores de un bloque de filas
+
+        Args:
+            df: DataFrame (snapshot completo o delta anexado)
+
+        Returns:
+            WeightedMetrics del bloque
+        """
+        k = len(SENTIMENT_LABELS)
+        sentiment = sentiment_codes(df)
+        likes = like_counts(df)
+        weight = likes + 1.0
+
+        counts = np.bincount(sentiment, minlength=k).astype(np.int64)
+        weights = np.bincount(sentiment, weights=weight, minlength=k)
+
+        # Confianza del modelo por fila, si el snapshot ya fue etiquetado
+        confidence_sum, confidence_weight = 0.0, 0.0
+        conf_col = resolve_column(df, 'confianza')
+        if conf_col is not None:
+            confidence = pd.to_numeric(df[conf_col], errors='coerce').to_numpy(dtype=float)
+            valid = ~np.isnan(confidence)
+            confidence_sum = float(np.dot(confidence[valid], weight[valid]))
+            confidence_weight = float(weight[valid].sum())
+
+        # Palabras: cada token suma el peso de su comentario
+        word_weights = pd.Series(dtype=float)
+        text_col = resolve_column(df, 'texto_comentario')
+        if text_col is not None:
+            tokens = tokenize_series(df[text_col])
+            if not tokens.empty:
+                codes, vocab = pd.factorize(tokens, sort=False)
+                sums = np.bincount(codes, weights=weight[tokens.index.to_numpy()], minlength=len(vocab))
+                word_weights = pd.Series(sums, index=vocab)
+
+        return cls(
+            counts=counts,
+            weights=weights,
+            total_likes=int(likes.sum()),
+            liked_comments=int((likes > 0).sum()),
+            confidence_sum=confidence_sum,
+            confidence_weight=confidence_weight,
+            word_weights=word_weights
+        )
+
+    def merge(self, other: "WeightedMetrics") -> "WeightedMetrics":
+        """Suma la contribución de otro bloque (p. ej. filas anexadas)"""
+        self.counts = self.counts + other.counts
+        self.weights = self.weights + other.weights
+        self.total_likes += other.total_likes
+        self.liked_comments += other.liked_comments
+        self.confidence_sum += other.confidence_sum
+        self.confidence_weight += other.confidence_weight
+        self.word_weights = self.word_weights.add(other.word_weights, fill_value=0)
+        return self
+
+    def append(self, df: pd.DataFrame) -> "WeightedMetrics":
+        """Actualiza incrementalmente con filas nuevas"""
+        return self.merge(WeightedMetrics.from_frame(df))
+
+    @property
+    def total_comments(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def engagement_rate(self) -> float:
+        """Porcentaje de comentarios que recibieron al menos un like"""
+        total = self.total_comments
+        return round(self.liked_comments / total * 100, 1) if total else 0.0
+
+    @property
+    def weighted_confidence(self) -> Optional[float]:
+        """Confianza media del modelo ponderada por likes (None sin etiquetado)"""
+        if not self.confidence_weight:
+            return None
+        return round(self.confidence_sum / self.confidence_weight, 4)
+
+    def top_words(self, limit: int = 20) -> list:
+        """Palabras con mayor peso acumulado"""
+        if self.word_weights.empty:
+            return []
+        top = self.word_weights.nlargest(limit)
+        return [(str(word), round(float(weight), 1)) for word, weight in top.items()]
+
+    def to_dict(self, top_n: int = 20) -> Dict[str, Any]:
+        """Resumen serializable de las métricas ponderadas"""
+        total_weight = float(self.weights.sum())
+        pos, neg = SENTIMENT_LABELS.index('Positivo'), SENTIMENT_LABELS.index('Negativo')
+
+        return {
+            'weighted_distribution': {
+                label: round(float(w), 1) for label, w in zip(SENTIMENT_LABELS, self.weights)
+            },
+            'weighted_percentages': {
+                label: round(float(w) / total_weight * 100, 2) if total_weight else 0.0
+                for label, w in zip(SENTIMENT_LABELS, self.weights)
+            },
+            'weighted_score': round(float(self.weights[pos] - self.weights[neg]) / total_weight, 4) if total_weight else 0.0,
+            'weighted_confidence': self.weighted_confidence,
+            'weighted_top_words': self.top_words(top_n),
+            'total_likes': self.total_likes,
+            'avg_likes_per_comment': round(self.total_likes / self.total_comments, 2) if self.total_comments else 0.0,
+            'engagement_rate': self.engagement_rate
+        }
@@ -3,12 +3,14 @@ Inicialización de rutas
 """
 
 from . import analysis_routes
+from . import comments_routes
 from . import dataset_routes
 from . import report_routes
 from . import statistics_routes
 
 __all__ = [
     'analysis_routes',
+    'comments_routes',
     'dataset_routes',
     'report_routes',
     'statistics_routes'
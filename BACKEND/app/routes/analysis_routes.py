@@ -2,12 +2,20 @@
 RUTAS DE ANÁLISIS - API UNMSM - CORREGIDO Y FUNCIONAL
 """
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from typing import List, Optional, Dict, Any
 import logging
 from datetime import datetime
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from app.core.columns import SENTIMENT_LABELS
+from app.core.comment_store import store_frame
 from app.core.dependencies import get_sentiment_analyzer
+from app.core.dataset import dataset_manager
+from app.core.keyphrases import cached_keyphrases
+from app.core.labeling import bulk_labeler, schedule_refresh
+from app.core.similarity import EmptyQueryError, SimilarityNotReady, similarity_service
+from app.utils.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -201,4 +209,132 @@ async def predict_sentiment(
     """
     Predicción rápida de sentimiento (alias de /single).
     """
-    return await analyze_single_comment(request, include_details, analyzer)
\ No newline at end of file
+    return await analyze_single_comment(request, include_details, analyzer)
+
+@router.get("/keyphrases")
+async def get_keyphrases(
+    group_by: str = Query("sentimiento", pattern="^(sentimiento|tema)$"),
+    method: str = Query("log_odds", pattern="^(log_odds|chi2)$"),
+    top_n: int = Query(10, ge=1, le=50),
+    analyzer = Depends(get_sentiment_analyzer)
+) -> Dict[str, Any]:
+    """
+    N-gramas más característicos de cada sentimiento o tema.
+    
+    Usa el vocabulario del TfidfVectorizer entrenado; el resultado se cachea
+    por versión de dataset y de modelo.
+    """
+    if analyzer.df is None or analyzer.df.empty:
+        raise HTTPException(status_code=404, detail="No hay dataset cargado")
+    
+    try:
+        keyphrases = cached_keyphrases(
+            analyzer.df, analyzer, dataset_manager.version,
+            group_by=group_by, method=method, top_n=top_n
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "group_by": group_by,
+        "method": method,
+        "keyphrases": keyphrases,
+        "dataset_version": dataset_manager.version,
+        "model_version": analyzer.model_version,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/labeling")
+async def get_labeling_status() -> Dict[str, Any]:
+    """
+    Estado del etiquetado masivo del dataset con el modelo activo
+    
+    Incluye textos puntuados y reutilizados de la última corrida, distribución
+    de etiquetas del modelo, confianza media y acuerdo con la etiqueta humana.
+    """
+    return bulk_labeler.status
+
+
+@router.post("/labeling")
+async def run_labeling(analyzer = Depends(get_sentiment_analyzer)) -> Dict[str, Any]:
+    """
+    Encola el etiquetado masivo del snapshot vigente
+    
+    Solo se puntúan los textos que no tienen predicción para la versión
+    actual del modelo; al terminar se refresca lo derivado del snapshot.
+    """
+    if analyzer.df is None or analyzer.df.empty:
+        raise HTTPException(status_code=404, detail="No hay dataset cargado")
+    if not analyzer.is_trained:
+        raise HTTPException(status_code=409, detail="No hay modelo entrenado")
+    
+    schedule_refresh(analyzer)
+    return {
+        "message": "Etiquetado masivo encolado",
+        "dataset_version": dataset_manager.version,
+        "model_version": analyzer.model_version,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/similar")
+async def get_similar_comments(
+    text: Optional[str] = Query(None, min_length=1, max_length=settings.MAX_COMMENT_LENGTH,
+                                description="Texto libre a comparar"),
+    pos: Optional[int] = Query(None, ge=0, description="Posición de un comentario del dataset"),
+    k: int = Query(10, ge=1, le=100, description="Número de vecinos"),
+    method: str = Query("exact", pattern="^(exact|lsh)$"),
+    analyzer = Depends(get_sentiment_analyzer)
+) -> Dict[str, Any]:
+    """
+    Comentarios más parecidos (coseno sobre TF-IDF) y cómo fueron etiquetados
+    
+    Usa un vocabulario TF-IDF ajustado sobre los propios comentarios.
+    method=lsh evalúa solo los candidatos de las tablas de proyecciones
+    aleatorias (aproximado, más rápido en datasets grandes); exact recorre
+    las filas que comparten términos con la consulta. Un texto sin ningún
+    término del dataset responde 422.
+    """
+    try:
+        if (text is None) == (pos is None):
+            raise HTTPException(status_code=400, detail="Indique 'text' o 'pos' (solo uno)")
+        
+        stale = not similarity_service.is_current(dataset_manager.version)
+        if stale:
+            similarity_service.schedule(dataset_manager, analyzer)
+        index = similarity_service.get()
+        
+        result = await run_in_threadpool(index.similar, text, pos, k, method)
+        
+        positions = result['positions']
+        rows = store_frame(index.df.iloc[positions]).drop(columns=['categoria', 'fecha']).set_axis(positions)
+        rows.insert(0, 'similarity', result['scores'].astype(float).round(4))
+        neighbors = rows.reset_index(names='pos').to_dict(orient='records')
+        
+        return {
+            "query": store_frame(index.df.iloc[[pos]]).iloc[0]['texto'] if pos is not None else text,
+            "method": method,
+            "neighbors": neighbors,
+            "labels": {
+                label: int((rows['sentimiento'] == label).sum()) for label in SENTIMENT_LABELS
+            },
+            "query_terms": result['query_terms'],
+            "candidates": result['candidates'],
+            "query_ms": result['query_ms'],
+            "dataset_version": index.dataset_version,
+            "model_version": analyzer.model_version,
+            "stale": stale
+        }
+    
+    except SimilarityNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except EmptyQueryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error buscando comentarios similares: {e}")
+        raise HTTPException(status_code=500, detail=f"Error buscando comentarios similares: {str(e)}")
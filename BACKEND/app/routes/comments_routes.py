@@ -0,0 +1,165 @@
+"""
+RUTAS DE CONSULTA DE COMENTARIOS - API UNMSM
+
+Filtros, orden y paginación sobre el almacén SQLite de comentarios
+(app.core.comment_store), sin recorrer el DataFrame en Python.
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, List, Optional
+import logging
+from datetime import date
+from starlette.concurrency import run_in_threadpool
+
+from app.core.comment_store import StoreNotReady, comment_store, store_frame
+from app.core.dataset import dataset_manager
+from app.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="Consultar comentarios",
+    description="Filtra, ordena y pagina los comentarios en el almacén embebido"
+)
+async def query_comments(
+    sentimiento: Optional[List[str]] = Query(None, description="Positivo, Neutral o Negativo (repetible)"),
+    sentimiento_modelo: Optional[List[str]] = Query(None, description="Etiqueta predicha por el modelo"),
+    tema: Optional[List[str]] = Query(None, description="Tema_Principal (repetible)"),
+    subtema: Optional[List[str]] = Query(None, description="Subtema_o_Keyword (repetible)"),
+    categoria: Optional[List[str]] = Query(None, description="Categoría del reporte (Enseñanza, Servicios...)"),
+    usuario: Optional[List[str]] = Query(None, description="Autor del comentario"),
+    publicacion: Optional[List[int]] = Query(None, description="Número de publicación"),
+    min_likes: Optional[int] = Query(None, ge=0),
+    max_likes: Optional[int] = Query(None, ge=0),
+    min_confianza: Optional[float] = Query(None, ge=0, le=1),
+    desde: Optional[date] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[date] = Query(None, description="Fecha final (exclusiva)"),
+    es_respuesta: Optional[bool] = Query(None, description="Solo respuestas (true) o solo comentarios raíz (false)"),
+    sort: str = Query("-likes", pattern=r"^-?(pos|likes|fecha|confianza|publicacion)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=settings.COMMENTS_MAX_PAGE_SIZE)
+) -> Dict[str, Any]:
+    """Consulta paginada de comentarios (el filtrado y el orden los resuelve SQLite)"""
+    try:
+        filters = {
+            'sentimiento': sentimiento,
+            'sentimiento_modelo': sentimiento_modelo,
+            'tema': tema,
+            'subtema': subtema,
+            'categoria': categoria,
+            'usuario': usuario,
+            'publicacion': publicacion,
+            'min_likes': min_likes,
+            'max_likes': max_likes,
+            'min_confianza': min_confianza,
+            'desde': desde.isoformat() if desde else None,
+            'hasta': hasta.isoformat() if hasta else None,
+            'es_respuesta': es_respuesta,
+        }
+        return await run_in_threadpool(comment_store.query, filters, sort, page, page_size)
+
+    except StoreNotReady as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error consultando comentarios: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error consultando comentarios: {str(e)}"
+        )
+
+
+def search_snapshot():
+    """
+    Índice de búsqueda, snapshot, categorías y versión leídos juntos
+
+    Un anexo los reemplaza bajo el lock del DatasetManager; se espera en un
+    hilo del pool para no bloquear el event loop mientras dura el anexo.
+    """
+    with dataset_manager.lock:
+        return dataset_manager.search, dataset_manager.df, dataset_manager.categories, dataset_manager.version
+
+
+@router.get(
+    "/search",
+    summary="Buscar comentarios",
+    description="Búsqueda de texto completo con ranking BM25 y filtros de sentimiento y tema"
+)
+async def search_comments(
+    q: str = Query(..., min_length=1, max_length=200, description="Texto a buscar"),
+    sentimiento: Optional[List[str]] = Query(None, description="Positivo, Neutral o Negativo (repetible)"),
+    tema: Optional[List[str]] = Query(None, description="Tema_Principal (repetible)"),
+    match_all: bool = Query(False, description="Exigir todos los términos de la consulta"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=settings.COMMENTS_MAX_PAGE_SIZE)
+) -> Dict[str, Any]:
+    """Comentarios que mencionan los términos buscados, del más relevante al menos relevante"""
+    try:
+        index, df, categories, version = await run_in_threadpool(search_snapshot)
+        if index is None or df is None:
+            raise HTTPException(status_code=503, detail="El índice de búsqueda aún no está construido")
+
+        result = await run_in_threadpool(
+            index.search, q, {'sentimiento': sentimiento, 'tema': tema},
+            (page - 1) * page_size, page_size, match_all
+        )
+
+        positions = result['positions']
+        rows = store_frame(
+            df.iloc[positions],
+            categories.codes[positions] if categories is not None else None
+        )
+        rows = rows.drop(columns='fecha').set_axis(positions)
+        rows.insert(0, 'score', result['scores'].astype(float).round(4))
+
+        return {
+            "query": q,
+            "terms": result['terms'],
+            "unknown_terms": result['unknown_terms'],
+            "items": rows.reset_index(names='pos').to_dict(orient='records'),
+            "total": result['total'],
+            "page": page,
+            "page_size": page_size,
+            "pages": (result['total'] + page_size - 1) // page_size,
+            "dataset_version": version
+        }
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error buscando comentarios: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error buscando comentarios: {str(e)}"
+        )
+
+
+@router.get(
+    "/store",
+    summary="Estado del almacén",
+    description="Versión del dataset, filas y fecha de construcción del almacén de comentarios"
+)
+async def get_store_info() -> Dict[str, Any]:
+    """Metadatos del almacén de comentarios"""
+    meta = comment_store.meta()
+    if not meta:
+        raise HTTPException(
+            status_code=503,
+            detail="El almacén de comentarios aún no está construido"
+        )
+    return {
+        "path": str(comment_store.path),
+        "dataset_version": meta.get('dataset_version'),
+        "model_version": meta.get('model_version'),
+        "rows": int(meta.get('rows', 0)),
+        "built_at": meta.get('built_at')
+    }
@@ -2,14 +2,26 @@
 RUTAS DE GESTIÓN DE DATASET - API UNMSM
 """
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 import logging
+import os
+import uuid
 import pandas as pd
+from datetime import datetime
 from pathlib import Path
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
 
 from app.schemas import DatasetInfo, ModelTrainingResponse, ErrorResponse
 from app.core.dependencies import get_sentiment_analyzer
+from app.core.dataset import dataset_manager
+from app.core.delta import clear_deltas, delta_path
+from app.core.labeling import schedule_refresh
+from app.core.pipeline import SchemaValidationError
 from app.utils.config import settings
+from app.utils.export import DataExporter
+from app.utils.tasks import upload_progress
+from app.utils.uploads import CSV_UPLOAD_OPENAPI, StreamingCSVUpload
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +46,7 @@ async def get_dataset_info(analyzer=Depends(get_sentiment_analyzer)):
         info = DatasetInfo(
             total_records=len(analyzer.df),
             columns=analyzer.df.columns.tolist(),
-            sentiment_distribution=analyzer.df['Rating'].value_counts().to_dict(),
+            sentiment_distribution=analyzer.df['sentimiento'].value_counts().to_dict(),
             date_loaded=analyzer.df.attrs.get('load_date', None)
         )
         
@@ -52,50 +64,332 @@ async def get_dataset_info(analyzer=Depends(get_sentiment_analyzer)):
         )
 
 
+@router.get(
+    "/ingestion",
+    summary="Reporte de ingesta",
+    description="Duración de cada etapa del pipeline de ingesta y esquema detectado"
+)
+async def get_ingestion_report():
+    """Reporte de la última ingesta del dataset"""
+    if dataset_manager.ingestion is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No hay dataset cargado"
+        )
+    return dataset_manager.ingestion
+
+
+@router.get(
+    "/versions",
+    summary="Versiones del dataset",
+    description="Versiones direccionadas por contenido cargadas hasta ahora (la vigente primero)"
+)
+async def get_dataset_versions():
+    """Manifiesto de versiones del dataset"""
+    return {
+        "current": dataset_manager.version,
+        "versions": dataset_manager.versions.list()
+    }
+
+
+@router.get(
+    "/memory",
+    summary="Uso de memoria del dataset",
+    description="Memoria por columna antes y después de aplicar el esquema de tipos"
+)
+async def get_dataset_memory(analyzer=Depends(get_sentiment_analyzer)):
+    """Reporta la memoria por columna del dataset en memoria"""
+    try:
+        if analyzer.df is None:
+            raise HTTPException(
+                status_code=404,
+                detail="No hay dataset cargado"
+            )
+        
+        report = getattr(analyzer, 'memory_report', None) or {}
+        total_before = sum(c['bytes_before'] for c in report.values())
+        total_after = sum(c['bytes_after'] for c in report.values())
+        
+        return {
+            "columns": report,
+            "total_bytes_before": total_before,
+            "total_bytes_after": total_after,
+            "current_bytes": int(analyzer.df.memory_usage(deep=True, index=False).sum()),
+            "reduction_percentage": round((1 - total_after / total_before) * 100, 2) if total_before else 0.0
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error obteniendo memoria del dataset: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error: {str(e)}"
+        )
+
+
+@router.get(
+    "/export",
+    summary="Exportar dataset",
+    description="Exporta el dataset completo con sus sentimientos"
+)
+async def export_dataset(
+    format: str = Query("pdf", pattern="^(pdf|excel|csv|json|parquet|arrow)$", description="Formato de exportación"),
+    max_rows: Optional[int] = Query(None, ge=1, description="Límite de filas (por defecto todas)"),
+    partition_by: Optional[str] = Query(
+        None, pattern="^(sentimiento|categoria|mes)$",
+        description="Partición Hive para parquet/arrow (se descarga como .zip); tema va como columna"
+    ),
+    analyzer=Depends(get_sentiment_analyzer)
+):
+    """Exporta todas las filas del dataset cargado"""
+    try:
+        if analyzer.df is None or analyzer.df.empty:
+            raise HTTPException(
+                status_code=404,
+                detail="No hay dataset cargado"
+            )
+        
+        filename = f"dataset_unmsm_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        
+        # CSV/JSON se serializan por bloques mientras se envía la respuesta
+        if format in ("csv", "json"):
+            data = analyzer.df if max_rows is None else analyzer.df.iloc[:max_rows]
+            if format == "csv":
+                return DataExporter.export_to_csv(data, filename)
+            return DataExporter.export_to_json(data, filename, pretty=False)
+        
+        # Formatos columnares directamente desde el snapshot en memoria
+        if format in ("parquet", "arrow"):
+            data = analyzer.df if max_rows is None else analyzer.df.iloc[:max_rows]
+            return await run_in_threadpool(
+                DataExporter.export_to_columnar,
+                data,
+                filename,
+                format=format,
+                partition_by=partition_by
+            )
+        
+        # Renderizado CPU-intensivo fuera del event loop
+        if format == "excel":
+            return await run_in_threadpool(
+                DataExporter.export_to_excel,
+                analyzer.df,
+                filename,
+                sheet_name="Comentarios",
+                max_rows=max_rows
+            )
+        
+        return await run_in_threadpool(
+            DataExporter.export_to_pdf,
+            analyzer.df,
+            filename,
+            title="Dataset de Comentarios - UNMSM",
+            max_rows=max_rows
+        )
+        
+    except HTTPException:
+        raise
+    except ImportError as e:
+        raise HTTPException(
+            status_code=501,
+            detail=f"Formato {format} no disponible: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"❌ Error exportando dataset: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error exportando: {str(e)}"
+        )
+
+
 @router.post(
     "/upload",
     summary="Cargar dataset",
-    description="Carga un nuevo dataset CSV"
+    description="Carga un nuevo dataset CSV (el avance se consulta en /upload/{upload_id})",
+    openapi_extra=CSV_UPLOAD_OPENAPI
 )
 async def upload_dataset(
-    file: UploadFile = File(...),
+    request: Request,
+    upload_id: Optional[str] = Query(
+        None, pattern=r"^[\w-]{1,64}$",
+        description="Id elegido por el cliente para consultar el avance durante la carga"
+    ),
+    reference_date: Optional[datetime] = Query(
+        None, description="Fecha de extracción del CSV: las antigüedades como '7 sem' se cuentan desde ella"
+    ),
     analyzer=Depends(get_sentiment_analyzer)
 ):
-    """Carga un archivo CSV como dataset"""
+    """Carga un archivo CSV como dataset copiándolo a disco mientras se recibe"""
+    upload_id = upload_id or uuid.uuid4().hex[:12]
+    upload = StreamingCSVUpload(upload_id)
+    part_path = None
     try:
-        if not file.filename.endswith('.csv'):
+        upload_progress.start(upload_id, filename=None, total_bytes=None, bytes_received=0)
+        
+        received = await upload.receive(
+            request, lambda name: settings.DATA_DIR / f".{name}.{upload_id}.part"
+        )
+        filename = upload.filename
+        file_path = settings.DATA_DIR / filename
+        part_path = upload.part_path
+        
+        # Se ingiere la copia temporal; el archivo vigente y sus anexos no se
+        # tocan hasta que la carga termina bien
+        loaded = await run_in_threadpool(
+            analyzer.load_dataset,
+            str(part_path),
+            progress=upload_progress.callback(upload_id),
+            strict=True,
+            source=str(file_path),
+            replay_deltas=False,
+            reference_date=reference_date.isoformat() if reference_date else None
+        )
+        if not loaded:
             raise HTTPException(
                 status_code=400,
-                detail="El archivo debe ser formato CSV"
+                detail="No se pudo procesar el archivo CSV"
             )
+        os.replace(part_path, file_path)
+        part_path = None
+        # Una carga completa reemplaza también los anexos del dataset anterior
+        clear_deltas(file_path)
+        schedule_refresh(analyzer)
         
-        # Guardar archivo
-        file_path = settings.DATA_DIR / file.filename
-        
-        with open(file_path, 'wb') as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Cargar dataset
-        analyzer.load_dataset(str(file_path))
-        
-        logger.info(f"✅ Dataset cargado desde: {file.filename}")
+        ingestion = dataset_manager.ingestion or {}
+        upload_progress.finish(upload_id, stage='done', rows=len(analyzer.df))
+        logger.info(f"✅ Dataset cargado desde: {filename}")
         
         return {
             "message": "Dataset cargado exitosamente",
-            "filename": file.filename,
+            "filename": filename,
+            "upload_id": upload_id,
+            "bytes": received,
             "records": len(analyzer.df),
+            "validation": ingestion.get('validation'),
+            "stages_ms": ingestion.get('stages_ms'),
             "status": "success"
         }
         
-    except HTTPException:
+    except SchemaValidationError as e:
+        upload_progress.finish(upload_id, status='failed', error=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException as e:
+        upload_progress.finish(upload_id, status='failed', error=str(e.detail))
         raise
     except Exception as e:
+        upload_progress.finish(upload_id, status='failed', error=str(e))
         logger.error(f"❌ Error cargando dataset: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Error cargando archivo: {str(e)}"
         )
+    finally:
+        for path in (part_path, upload.part_path):
+            if path is not None and path.exists():
+                path.unlink()
+
+
+@router.post(
+    "/append",
+    summary="Anexar comentarios",
+    description="Agrega al dataset vigente las filas de un CSV cuyo (Publicacion, ID_Comentario) aún no existe",
+    openapi_extra=CSV_UPLOAD_OPENAPI
+)
+async def append_dataset(
+    request: Request,
+    upload_id: Optional[str] = Query(
+        None, pattern=r"^[\w-]{1,64}$",
+        description="Id elegido por el cliente para consultar el avance en /upload/{upload_id}"
+    ),
+    analyzer=Depends(get_sentiment_analyzer)
+):
+    """Anexa un CSV delta: solo las filas nuevas se procesan e indexan"""
+    upload_id = upload_id or uuid.uuid4().hex[:12]
+    upload = StreamingCSVUpload(upload_id)
+    part_path = None
+    try:
+        if analyzer.df is None or not dataset_manager.ingestion:
+            raise HTTPException(
+                status_code=404,
+                detail="No hay dataset base cargado"
+            )
+        
+        upload_progress.start(upload_id, filename=None, total_bytes=None, bytes_received=0)
+        
+        # El delta se guarda junto al dataset base para volver a aplicarlo al recargarlo
+        targets = {}
+        
+        def part_path_for(name: str) -> Path:
+            targets['delta'] = delta_path(dataset_manager.ingestion['source'], name)
+            return targets['delta'].parent / f".{targets['delta'].name}.{upload_id}.part"
+        
+        received = await upload.receive(request, part_path_for)
+        filename = upload.filename
+        target = targets['delta']
+        os.replace(upload.part_path, target)
+        part_path = target
+        
+        summary = await run_in_threadpool(
+            analyzer.append_dataset,
+            str(target),
+            progress=upload_progress.callback(upload_id)
+        )
+        if summary['appended']:
+            # Se conserva para volver a aplicarlo; sin filas nuevas se descarta
+            part_path = None
+            schedule_refresh(analyzer)
+        
+        upload_progress.finish(upload_id, stage='done', rows=summary['total_rows'])
+        logger.info(f"✅ Delta anexado desde: {filename}")
+        
+        return {
+            "message": "Comentarios anexados" if summary['appended'] else "Sin comentarios nuevos",
+            "filename": filename,
+            "upload_id": upload_id,
+            "bytes": received,
+            "received": summary['rows'],
+            "appended": summary['appended'],
+            "duplicates": summary['duplicates'],
+            "records": summary['total_rows'],
+            "validation": summary['validation'],
+            "stages_ms": summary['stages_ms'],
+            "status": "success"
+        }
+        
+    except SchemaValidationError as e:
+        upload_progress.finish(upload_id, status='failed', error=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException as e:
+        upload_progress.finish(upload_id, status='failed', error=str(e.detail))
+        raise
+    except Exception as e:
+        upload_progress.finish(upload_id, status='failed', error=str(e))
+        logger.error(f"❌ Error anexando dataset: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error anexando archivo: {str(e)}"
+        )
+    finally:
+        for path in (part_path, upload.part_path):
+            if path is not None and path.exists():
+                path.unlink()
+
+
+@router.get(
+    "/upload/{upload_id}",
+    summary="Avance de una carga",
+    description="Bytes recibidos, etapa del pipeline y filas procesadas de una carga"
+)
+async def get_upload_progress(upload_id: str):
+    """Estado de una carga de dataset"""
+    job = upload_progress.get(upload_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Carga no encontrada"
+        )
+    return job
 
 
 @router.post(
@@ -120,6 +414,7 @@ async def train_model(analyzer=Depends(get_sentiment_analyzer)):
         
         # Guardar modelo
         analyzer.save_model()
+        schedule_refresh(analyzer)
         
         response = ModelTrainingResponse(
             status="completed",
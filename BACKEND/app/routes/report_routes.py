@@ -2,11 +2,14 @@
 RUTAS DE REPORTES - API UNMSM ✅ VERSIÓN CORREGIDA
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query
+from fastapi.responses import JSONResponse, FileResponse
+import asyncio
+import hashlib
 import logging
+import numpy as np
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 from app.schemas import (
     ReportRequest, 
@@ -19,14 +22,26 @@ from app.schemas import (
     WordTag
 )
 from app.core.dependencies import get_sentiment_analyzer
+from app.core.dataset import dataset_manager
+from app.core.timeindex import period_bounds
+from app.core.keyphrases import cached_keyphrases
+from app.utils.cache import get_cache_instance
+from app.utils.config import settings
+from app.utils.report_generator import REPORT_MEDIA_TYPES, render_report
+from app.utils.tasks import PRERENDER_PERIODS, report_prerenderer
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def get_period_text(period: str) -> str:
+def get_period_text(
+    period: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> str:
     """Genera texto del período"""
-    now = datetime.now()
+    now = now or datetime.now()
     months = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
               'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
     
@@ -39,17 +54,140 @@ def get_period_text(period: str) -> str:
     elif period == "quarter":
         quarter_start = (now.month - 1) // 3 * 3
         return f"{months[quarter_start]} - {months[now.month - 1]} {now.year}"
+    elif period == "year":
+        return f"Año {now.year}"
+    elif period == "custom":
+        return f"{start_date or 'Inicio'} - {end_date or 'Hoy'}"
+    elif period == "all":
+        return "Histórico completo"
     else:
         return f"{months[now.month - 1]} {now.year}"
 
 
+def get_period_anchor() -> datetime:
+    """
+    Fecha de referencia de los períodos relativos
+    
+    El dataset es una extracción estática: "mes actual" se interpreta como el
+    mes de su comentario más reciente si este es anterior a hoy.
+    """
+    timeline = dataset_manager.timeline
+    if timeline is None or len(timeline.timestamps) == 0:
+        return datetime.now()
+    return min(datetime.now(), timeline.latest())
+
+
+def get_period_statistics(
+    request: ReportRequest,
+    analyzer
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[np.ndarray]]:
+    """
+    Estadísticas y métricas ponderadas del período solicitado
+    
+    Con índice temporal, el período se arma restando prefijos de los
+    agregados diarios. Sin él (dataset sin fechas) se usa el dataset completo.
+    
+    Returns:
+        Tupla (stats con la forma de get_statistics, métricas ponderadas,
+        filas del período o None si cubre todo el snapshot)
+    """
+    timeline = dataset_manager.timeline
+    
+    if timeline is not None:
+        try:
+            start, end = period_bounds(
+                request.period, request.start_date, request.end_date, now=get_period_anchor()
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        stats = timeline.aggregate(start, end)
+        logger.info(f"🕒 Período {start} → {end}: {stats['total_comments']} comentarios")
+        positions = None if request.period == "all" else timeline.positions(start, end)
+        return stats, stats['weighted'], positions
+    
+    if request.period != "all":
+        logger.warning("⚠️ Dataset sin fechas, el reporte cubre todo el histórico")
+    
+    stats = analyzer.get_statistics()
+    weighted = dataset_manager.weighted.to_dict() if dataset_manager.weighted else {}
+    return stats, weighted, None
+
+
+def report_cache_key(request: ReportRequest, analyzer) -> str:
+    """
+    Clave del reporte: período, formato y versiones de dataset y modelo
+    
+    Incluye el día de anclaje de los períodos relativos para que "mes actual"
+    no se sirva de caché al cambiar de mes.
+    """
+    parts = [
+        request.period,
+        request.start_date or "",
+        request.end_date or "",
+        request.format,
+        get_period_anchor().date().isoformat(),
+        dataset_manager.version or "none",
+        analyzer.model_version or "none",
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evalúa If-None-Match (lista de ETags o '*')"""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def cached_report_response(
+    request: ReportRequest,
+    http_request: Request,
+    analyzer
+) -> Response:
+    """
+    Sirve el reporte desde caché con ETag fuerte y 304 Not Modified
+    
+    El cuerpo JSON se genera una sola vez por combinación de período,
+    formato y versiones; el ETag es el hash de esos bytes.
+    """
+    key = report_cache_key(request, analyzer)
+    cache = get_cache_instance().prefixed("reports")
+    
+    entry = cache.get(key)
+    if entry is None:
+        report = await build_report(request, analyzer)
+        body = report.model_dump_json().encode("utf-8")
+        entry = {"body": body, "etag": f'"{hashlib.sha256(body).hexdigest()}"'}
+        cache.set(key, entry, ttl=settings.CACHE_TTL)
+        logger.info(f"💾 Reporte cacheado ({request.period}, {request.format})")
+    
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if etag_matches(http_request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
 @router.post("/generate", response_model=ReportResponse)
 async def generate_report(
-    request: ReportRequest, 
+    request: ReportRequest,
+    http_request: Request,
     analyzer=Depends(get_sentiment_analyzer)
+) -> Response:
+    """
+    ✅ Genera reporte ejecutivo completo (cacheado por versión, con ETag)
+    """
+    return await cached_report_response(request, http_request, analyzer)
+
+
+async def build_report(
+    request: ReportRequest, 
+    analyzer
 ) -> ReportResponse:
     """
-    ✅ Genera reporte ejecutivo completo
+    ✅ Construye el reporte ejecutivo completo
     CORREGIDO: Retorna objetos Pydantic validados
     """
     try:
@@ -60,7 +198,7 @@ async def generate_report(
         # ============================================================
         # 1. OBTENER ESTADÍSTICAS DEL ANALYZER
         # ============================================================
-        stats = analyzer.get_statistics()
+        stats, weighted, positions = get_period_statistics(request, analyzer)
         total = stats.get('total_comments', 0)
         
         logger.info(f"📊 Estadísticas obtenidas - Total: {total}")
@@ -75,7 +213,7 @@ async def generate_report(
                 success=True,
                 title="Reporte de Análisis de Sentimientos - UNMSM",
                 period=request.period,
-                period_text=get_period_text(request.period),
+                period_text=get_period_text(request.period, request.start_date, request.end_date, get_period_anchor()),
                 generated_at=datetime.now().isoformat(),
                 summary=ReportSummary(
                     total_comments=0,
@@ -104,7 +242,8 @@ async def generate_report(
                 best_day="Sin datos",
                 best_day_engagement=0.0,
                 best_time="Sin datos",
-                best_time_range="Sin datos"
+                best_time_range="Sin datos",
+                date_range=stats.get('date_range')
             )
         
         # ============================================================
@@ -170,7 +309,19 @@ async def generate_report(
         # ============================================================
         avg_length = float(stats.get('avg_comment_length', 150.0))
         most_common_words = stats.get('most_common_words', [])
-        engagement_rate = round(positive_pct * 0.15, 1)
+        
+        # Métricas ponderadas por likes precalculadas en la ingesta
+        engagement_rate = float(weighted.get('engagement_rate', 0.0))
+        
+        # Distintos del snapshot completo (HyperLogLog, tamaño fijo)
+        cardinality = dataset_manager.cardinality.to_dict() if dataset_manager.cardinality else {}
+        
+        # Frases características por sentimiento (cacheadas por versión)
+        try:
+            keyphrases = cached_keyphrases(analyzer.df, analyzer, dataset_manager.version, top_n=8)
+        except Exception as e:
+            logger.warning(f"⚠️ Frases clave no disponibles: {e}")
+            keyphrases = {}
         
         # ============================================================
         # 6. CREAR SUMMARY (Pydantic)
@@ -197,9 +348,17 @@ async def generate_report(
         statistics = ReportStatistics(
             sentiment_distribution=distribution,
             avg_comment_length=round(avg_length, 1),
-            total_words=total * 20,
-            unique_words=len(most_common_words) if most_common_words else 0,
-            most_common_words=most_common_words[:15] if most_common_words else []
+            total_words=int(stats.get('total_words', cardinality.get('total_words', 0))),
+            unique_words=int(stats.get('unique_words', cardinality.get('unique_words', 0))),
+            unique_users=cardinality.get('unique_users') if request.period == "all" else None,
+            unique_posts=cardinality.get('unique_posts') if request.period == "all" else None,
+            most_common_words=most_common_words[:15] if most_common_words else [],
+            weighted_distribution=weighted.get('weighted_distribution', {}),
+            weighted_percentages=weighted.get('weighted_percentages', {}),
+            weighted_confidence=weighted.get('weighted_confidence'),
+            weighted_top_words=weighted.get('weighted_top_words', [])[:15],
+            total_likes=weighted.get('total_likes', 0),
+            keyphrases=keyphrases
         )
         
         logger.info("✅ Statistics creado")
@@ -207,30 +366,13 @@ async def generate_report(
         # ============================================================
         # 8. CREAR CATEGORÍAS (Pydantic)
         # ============================================================
+        # Conteos reales por categoría, precalculados con el snapshot
         categories: List[CategoryScore] = []
-        base_score = int(positive_pct)
-        
-        categories_def = [
-            ("Enseñanza", "Calidad docente y metodologías", base_score + 10),
-            ("Infraestructura", "Instalaciones y espacios", base_score - 5),
-            ("Servicios", "Biblioteca y servicios estudiantiles", base_score),
-            ("Tecnología", "Plataformas digitales", base_score - 10),
-            ("Comunicación", "Canales de información", base_score + 5),
-            ("Gestión", "Procesos administrativos", base_score - 8)
-        ]
-        
-        for name, desc, score in categories_def:
-            score = max(40, min(95, score))
-            
-            categories.append(CategoryScore(
-                name=name,
-                score=score,
-                description=desc,
-                positive_count=int(total * score / 100 * 0.7),
-                neutral_count=int(total * (100 - score) / 100 * 0.5),
-                negative_count=int(total * (100 - score) / 100 * 0.3),
-                total_count=int(total * 0.15)
-            ))
+        if dataset_manager.categories is not None:
+            categories = [
+                CategoryScore(**category)
+                for category in dataset_manager.categories.scores(positions)
+            ]
         
         logger.info(f"✅ Categorías creadas: {len(categories)}")
         
@@ -280,7 +422,7 @@ async def generate_report(
         insights.append(ReportInsight(
             type="positive" if engagement_rate > 8 else "info",
             title="Engagement Rate",
-            description=f"Tasa de engagement: {engagement_rate}%",
+            description=f"{engagement_rate}% de los comentarios recibió al menos un like",
             metric=engagement_rate,
             icon="📈"
         ))
@@ -383,7 +525,7 @@ async def generate_report(
             success=True,
             title="Reporte de Análisis de Sentimientos - UNMSM",
             period=request.period,
-            period_text=get_period_text(request.period),
+            period_text=get_period_text(request.period, request.start_date, request.end_date, get_period_anchor()),
             generated_at=datetime.now().isoformat(),
             summary=summary,
             statistics=statistics,
@@ -394,7 +536,8 @@ async def generate_report(
             best_day="Miércoles",
             best_day_engagement=127.5,
             best_time="10:00 AM - 12:00 PM",
-            best_time_range="10:00 AM y 12:00 PM"
+            best_time_range="10:00 AM y 12:00 PM",
+            date_range=stats.get('date_range')
         )
         
         logger.info("="*80)
@@ -412,6 +555,8 @@ async def generate_report(
         # ✅ RETORNAR OBJETO PYDANTIC (no JSONResponse)
         return report
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("="*80)
         logger.error(f"❌ ERROR CRÍTICO EN GENERACIÓN DE REPORTE")
@@ -428,10 +573,94 @@ async def generate_report(
 
 
 @router.get("/latest", response_model=ReportResponse)
-async def get_latest_report(analyzer=Depends(get_sentiment_analyzer)) -> ReportResponse:
+async def get_latest_report(
+    http_request: Request,
+    analyzer=Depends(get_sentiment_analyzer)
+) -> Response:
     """Obtiene el último reporte generado"""
     request = ReportRequest(period="current", format="json")
-    return await generate_report(request, analyzer)
+    return await cached_report_response(request, http_request, analyzer)
+
+
+def prerender_version(analyzer) -> str:
+    """Versión de los artefactos: dataset, modelo y día de anclaje de los períodos"""
+    return "-".join([
+        dataset_manager.version or "none",
+        analyzer.model_version or "none",
+        get_period_anchor().date().isoformat(),
+    ])
+
+
+def prerender_reports(manager, analyzer) -> None:
+    """
+    Encola el pre-renderizado de los reportes estándar en REPORTS_DIR
+    
+    Suscriptor del DatasetManager: corre cuando el snapshot terminó de
+    ingerirse y etiquetarse (app.core.labeling.schedule_refresh).
+    """
+    def build(period: str) -> ReportResponse:
+        return asyncio.run(build_report(ReportRequest(period=period, format="json"), analyzer))
+    
+    report_prerenderer.schedule(prerender_version(analyzer), build)
+    logger.info("📦 Pre-renderizado de reportes encolado")
+
+
+dataset_manager.subscribe('reports', prerender_reports)
+
+
+@router.get("/download/{period}")
+async def download_report(
+    period: str,
+    http_request: Request,
+    format: str = Query("pdf", description="Formato: pdf, xlsx o json"),
+    analyzer=Depends(get_sentiment_analyzer)
+):
+    """
+    ✅ Descarga el reporte estándar de un período
+    
+    Sirve el archivo pre-renderizado con FileResponse; si aún no existe para
+    la versión vigente, lo renderiza, lo guarda en REPORTS_DIR y lo registra
+    en el manifiesto para las descargas siguientes.
+    """
+    if period not in PRERENDER_PERIODS:
+        raise HTTPException(status_code=400, detail=f"Período no soportado: {period}")
+    if format not in settings.REPORT_EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {format}")
+    
+    version = prerender_version(analyzer)
+    artifact = report_prerenderer.lookup(version, period, format)
+    if artifact is None:
+        logger.info(f"📄 Reporte {period}.{format} no pre-renderizado, generando...")
+        report = await build_report(ReportRequest(period=period, format="json"), analyzer)
+        try:
+            data = render_report(report, format)
+        except ImportError as e:
+            raise HTTPException(status_code=501, detail=f"Formato {format} no disponible: {e}")
+        artifact = report_prerenderer.register(version, period, format, data)
+    
+    etag = f'"{artifact["sha256"]}"'
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    return FileResponse(
+        report_prerenderer.reports_dir / artifact["file"],
+        media_type=REPORT_MEDIA_TYPES[format],
+        filename=f"reporte_unmsm_{period}.{format}",
+        headers={"ETag": etag}
+    )
+
+
+@router.get("/artifacts")
+async def get_report_artifacts(analyzer=Depends(get_sentiment_analyzer)):
+    """Estado de los reportes pre-renderizados"""
+    manifest = report_prerenderer.manifest()
+    return {
+        "current_version": prerender_version(analyzer),
+        "manifest_version": manifest.get("version"),
+        "up_to_date": manifest.get("version") == prerender_version(analyzer),
+        "generated_at": manifest.get("generated_at"),
+        "artifacts": manifest.get("artifacts", {})
+    }
 
 
 @router.get("/periods")
@@ -442,7 +671,8 @@ async def get_available_periods():
             {"value": "current", "label": "Mes Actual"},
             {"value": "last", "label": "Mes Anterior"},
             {"value": "quarter", "label": "Último Trimestre"},
-            {"value": "year", "label": "Año Actual"}
+            {"value": "year", "label": "Año Actual"},
+            {"value": "all", "label": "Histórico Completo"}
         ]
     }
 
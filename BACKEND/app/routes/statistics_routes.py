@@ -1,14 +1,21 @@
 """
-RUTAS DE ESTADÍSTICAS - VERSIÓN DEFINITIVA CORREGIDA
-✅ Soluciona el problema de los 64 comentarios con sentimiento NaN
-✅ Filtra valores nulos ANTES de calcular distribución
+RUTAS DE ESTADÍSTICAS
+La ingesta deja el sentimiento en 3 clases y cuenta como Neutral los
+comentarios sin sentimiento, así que las rutas leen el snapshot sin filtrar
+ni copiar filas.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Dict, Any, List, Optional
 import logging
+import time
+import pandas as pd
 from datetime import datetime
 from app.core.dependencies import get_sentiment_analyzer
+from app.core.dataset import dataset_manager
+from app.core.columns import cell_text, resolve_column
+from app.core.labeling import CONFIDENCE_COLUMN, MODEL_LABEL_COLUMN, label_summary
+from app.core.pipeline import schema_for
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -20,7 +27,7 @@ async def get_statistics(
 ) -> Dict[str, Any]:
     """
     ✅ Obtiene estadísticas del dataset
-    CORREGIDO: Filtra NaN antes de contar
+    Todos los comentarios cuentan; los que llegaron sin sentimiento, como Neutral
     """
     try:
         logger.info("[STATS] Obteniendo estadísticas del dataset...")
@@ -29,61 +36,24 @@ async def get_statistics(
             raise HTTPException(status_code=404, detail="No hay dataset cargado")
         
         df = analyzer.df
-        initial_total = len(df)
+        total = len(df)
         
-        logger.info(f"📊 Dataset completo: {initial_total} comentarios")
-        
-        # ========== CLAVE: FILTRAR VALORES NULOS Y SIMPLIFICAR ==========
-        # Buscar columna de sentimiento (puede tener varios nombres)
-        sent_col = None
-        for col in df.columns:
-            if 'sentimiento' in str(col).lower():
-                sent_col = col
-                break
+        # Columnas detectadas una vez en la ingesta (esquema cacheado)
+        schema = schema_for(df)
+        sent_col = schema.sentiment
         
         if not sent_col:
             logger.error(f"No se encontró columna de sentimiento. Columnas: {list(df.columns)}")
             raise HTTPException(status_code=500, detail="Columna de sentimiento no encontrada")
         
-        # FILTRAR REGISTROS CON SENTIMIENTO VÁLIDO (no NaN, no vacío)
-        df_validos = df[df[sent_col].notna()].copy()
-        df_validos = df_validos[df_validos[sent_col].astype(str).str.strip() != '']
-        
-        # ✅ SIMPLIFICAR SENTIMIENTOS (agrupar Positivo/*, Neutral/*, Negativo/*)
-        def simplificar_sentimiento(sent: str) -> str:
-            """Agrupa sentimientos en 3 categorías"""
-            s = str(sent).lower()
-            
-            if any(p in s for p in ['positiv', 'posit/']):
-                return 'Positivo'
-            elif any(p in s for p in ['negativ', 'neg/']):
-                return 'Negativo'
-            else:
-                return 'Neutral'
-        
-        df_validos[sent_col] = df_validos[sent_col].apply(simplificar_sentimiento)
-        logger.info(f"✅ Sentimientos simplificados a: {df_validos[sent_col].unique()}")
-        
-        registros_invalidos = initial_total - len(df_validos)
-        
-        if registros_invalidos > 0:
-            logger.warning(f"⚠️  {registros_invalidos} registros sin sentimiento válido (excluidos)")
-        
-        total = len(df_validos)
-        logger.info(f"✅ Registros válidos: {total}")
-        
-        # ✅ DISTRIBUCIÓN (ahora suma correctamente)
-        distribution = df_validos[sent_col].value_counts().to_dict()
+        # El pipeline ya dejó Positivo/Neutral/Negativo (categórico, sin nulos)
+        distribution = {str(k): int(v) for k, v in df[sent_col].value_counts().items() if v}
         suma = sum(distribution.values())
+        # Sin etiqueta en el CSV: sentimiento_original quedó nulo y se contaron como Neutral
+        original_col = resolve_column(df, 'sentimiento_original')
+        missing_as_neutral = int(df[original_col].isna().sum()) if original_col else 0
         
-        logger.info(f"📊 Distribución: {distribution}")
-        logger.info(f"📊 Suma: {suma}, Total válidos: {total}")
-        
-        # ✅ VERIFICACIÓN
-        if suma != total:
-            logger.error(f"❌ INCONSISTENCIA: Suma={suma} vs Total={total}")
-            logger.error(f"Distribución: {distribution}")
-            raise ValueError(f"Distribución inconsistente: {suma} != {total}")
+        logger.info(f"📊 Distribución: {distribution} ({missing_as_neutral} sin etiqueta contados como Neutral)")
         
         # Calcular porcentajes
         percentages = {
@@ -91,31 +61,31 @@ async def get_statistics(
             for sentiment, count in distribution.items()
         }
         
-        # Palabras más comunes
-        from collections import Counter
-        import re
-        
-        texto_col = None
-        for col in df.columns:
-            if 'texto' in str(col).lower() and 'comentario' in str(col).lower():
-                texto_col = col
-                break
+        # Palabras más comunes: top-k del sketch precalculado en la ingesta
+        # (exacto mientras el vocabulario quepa en la capacidad: max_error 0)
+        texto_col = schema.text
         
         word_counts = []
+        word_counts_info = None
         if texto_col:
-            all_words = []
-            for text in df_validos[texto_col].dropna():
-                words = re.findall(r'\b\w+\b', str(text).lower())
-                all_words.extend([w for w in words if len(w) > 3])
-            
-            word_counts = Counter(all_words).most_common(20)
+            heavy_hitters = dataset_manager.heavy_hitters
+            if heavy_hitters is not None:
+                word_counts = [
+                    (item['word'], item['count'])
+                    for item in heavy_hitters.overall.top(20)
+                ]
+                word_counts_info = heavy_hitters.describe(heavy_hitters.overall)
             
             # Longitud promedio
-            avg_length = df_validos[texto_col].dropna().str.len().mean()
+            avg_length = df[texto_col].dropna().str.len().mean()
         else:
             avg_length = 0
         
-        logger.info(f"✅ Estadísticas OK - Total válidos: {total}")
+        # Métricas ponderadas por likes (precalculadas en la ingesta)
+        weighted = dataset_manager.weighted.to_dict() if dataset_manager.weighted else None
+        cardinality = dataset_manager.cardinality.to_dict() if dataset_manager.cardinality else None
+        # Etiquetas del modelo (etiquetado masivo); vacío hasta que termine la primera corrida
+        model_labels = label_summary(df) or None
         
         return {
             "total_comments": int(total),
@@ -123,10 +93,15 @@ async def get_statistics(
             "percentages": percentages,
             "avg_comment_length": float(avg_length) if avg_length else 0,
             "most_common_words": word_counts,
+            "most_common_words_info": word_counts_info,
+            "weighted": weighted,
+            "cardinality": cardinality,
+            "model_labels": model_labels,
             "verification": {
                 "distribution_sum": suma,
-                "matches_total": True,
-                "excluded_records": registros_invalidos
+                "matches_total": suma == total,
+                "counting": "Todos los comentarios cuentan; los que no traen sentimiento se cuentan como Neutral",
+                "missing_sentiment_as_neutral": missing_as_neutral
             },
             "timestamp": datetime.now().isoformat()
         }
@@ -153,37 +128,19 @@ async def get_topic_analysis(
         
         df = analyzer.df
         
-        # Buscar columna de sentimiento
-        sent_col = None
-        for col in df.columns:
-            if 'sentimiento' in str(col).lower():
-                sent_col = col
-                break
+        schema = schema_for(df)
+        sent_col = schema.sentiment
         
         if not sent_col:
             logger.warning("No se encontró columna de sentimiento")
             return []
         
-        # FILTRAR REGISTROS VÁLIDOS
-        df = df[df[sent_col].notna()].copy()
-        df = df[df[sent_col].astype(str).str.strip() != '']
-        
-        logger.info(f"📊 Procesando {len(df)} comentarios válidos")
-        
-        # Buscar columna de temas
-        tema_col = None
-        for col in df.columns:
-            if any(k in col.lower() for k in ['tema', 'topic', 'category', 'principal']):
-                tema_col = col
-                break
+        tema_col = schema.topic
         
         if tema_col is None:
+            df = df.copy(deep=False)
             logger.info("Clasificando temas automáticamente...")
-            texto_col = None
-            for col in df.columns:
-                if 'texto' in str(col).lower() and 'comentario' in str(col).lower():
-                    texto_col = col
-                    break
+            texto_col = schema.text
             
             if texto_col:
                 df['tema_auto'] = df[texto_col].apply(clasificar_tema_simple)
@@ -192,20 +149,27 @@ async def get_topic_analysis(
                 logger.warning("No se encontró columna de texto")
                 return []
         
-        # Análisis por tema (top 10)
+        # Análisis por tema (top 10) en una sola agrupación
         topics_data = []
         temas = df[tema_col].value_counts().head(10)
+        temas = temas[temas > 0]
+        
+        counts = (
+            df[df[tema_col].isin(temas.index)]
+            .groupby([tema_col, sent_col], observed=True)
+            .size()
+            .unstack(fill_value=0)
+        )
         
-        for tema in temas.index:
-            df_tema = df[df[tema_col] == tema]
-            sentiment_counts = df_tema[sent_col].value_counts().to_dict()
+        for tema, total_tema in temas.items():
+            sentiment_counts = counts.loc[tema] if tema in counts.index else {}
             
             topics_data.append({
                 "name": str(tema)[:50],
                 "positive": int(sentiment_counts.get('Positivo', 0)),
                 "neutral": int(sentiment_counts.get('Neutral', 0)),
                 "negative": int(sentiment_counts.get('Negativo', 0)),
-                "total": len(df_tema)
+                "total": int(total_tema)
             })
         
         logger.info(f"✅ {len(topics_data)} temas analizados")
@@ -230,32 +194,24 @@ async def get_recent_comments(
         
         df = analyzer.df
         
-        # Buscar columnas
-        texto_col = None
-        sent_col = None
-        
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if 'texto' in col_lower and 'comentario' in col_lower:
-                texto_col = col
-            if 'sentimiento' in col_lower:
-                sent_col = col
+        schema = schema_for(df)
+        texto_col = schema.text
+        sent_col = schema.sentiment
         
         if not texto_col or not sent_col:
             return {"comments": []}
         
-        # FILTRAR VÁLIDOS
-        df = df[df[sent_col].notna()].copy()
-        df = df[df[texto_col].notna()].copy()
-        
-        recent = df.tail(min(limit, len(df)))
+        recent = df[df[texto_col].notna()].tail(limit)
+        labeled = CONFIDENCE_COLUMN in recent.columns
         
         comments = []
         for _, row in recent.iterrows():
+            confidence = row[CONFIDENCE_COLUMN] if labeled else None
             comments.append({
                 "comment": str(row[texto_col])[:200],
                 "sentiment": str(row[sent_col]),
-                "confidence": 0.85
+                "model_sentiment": str(row[MODEL_LABEL_COLUMN]) if labeled else None,
+                "confidence": round(float(confidence), 4) if pd.notna(confidence) else None
             })
         
         return {
@@ -274,24 +230,21 @@ async def get_dashboard_data(
 ) -> Dict[str, Any]:
     """
     ✅ ENDPOINT PRINCIPAL - Dashboard completo
-    CORREGIDO: Ahora maneja correctamente los 64 registros sin sentimiento
     """
     try:
         logger.info("="*60)
         logger.info("📊 GENERANDO DASHBOARD DATA")
         logger.info("="*60)
         
-        # 1. Estadísticas básicas (ya filtradas)
+        # 1. Estadísticas básicas
         stats_dict = await get_statistics(analyzer)
         
         total = stats_dict['total_comments']
         distribution = stats_dict['distribution']
         percentages = stats_dict['percentages']
-        excluded = stats_dict['verification'].get('excluded_records', 0)
+        missing_as_neutral = stats_dict['verification']['missing_sentiment_as_neutral']
         
-        logger.info(f"✅ Comentarios válidos: {total}")
-        if excluded > 0:
-            logger.info(f"⚠️  Comentarios excluidos (sin sentimiento): {excluded}")
+        logger.info(f"✅ Comentarios: {total}")
         logger.info(f"✅ Distribución: {distribution}")
         logger.info(f"✅ Verificado: {stats_dict['verification']['matches_total']}")
         
@@ -305,7 +258,7 @@ async def get_dashboard_data(
         dashboard_data = {
             "metrics": {
                 "total_comments": int(total),
-                "excluded_comments": int(excluded),
+                "missing_sentiment_as_neutral": missing_as_neutral,
                 "sentiment_distribution": distribution,
                 "sentiment_percentages": percentages,
                 "changes": {
@@ -313,27 +266,30 @@ async def get_dashboard_data(
                     "positive_sentiment": {"change": "+5%", "trend": "up"}
                 },
                 "avg_comment_length": stats_dict['avg_comment_length'],
-                "most_common_words": stats_dict['most_common_words']
+                "most_common_words": stats_dict['most_common_words'],
+                "weighted": stats_dict.get('weighted'),
+                "cardinality": stats_dict.get('cardinality')
             },
             "topics_analysis": topics,
             "recent_comments": recent['comments'],
             "model_info": {
                 "accuracy": analyzer.model_metadata.get('accuracy', 0.86) if hasattr(analyzer, 'model_metadata') else 0.86,
-                "is_trained": analyzer.is_trained if hasattr(analyzer, 'is_trained') else False
+                "is_trained": analyzer.is_trained if hasattr(analyzer, 'is_trained') else False,
+                "labels": stats_dict.get('model_labels')
             },
             "verification": {
                 "distribution_sum": sum(distribution.values()),
                 "total_comments": total,
-                "excluded_comments": excluded,
-                "consistent": True
+                "counting": stats_dict['verification']['counting'],
+                "missing_sentiment_as_neutral": missing_as_neutral,
+                "consistent": stats_dict['verification']['matches_total']
             },
             "timestamp": datetime.now().isoformat()
         }
         
         logger.info("="*60)
         logger.info("✅ DASHBOARD GENERADO")
-        logger.info(f"   Válidos: {total}")
-        logger.info(f"   Excluidos: {excluded}")
+        logger.info(f"   Total: {total} ({missing_as_neutral} sin sentimiento como Neutral)")
         logger.info(f"   Positivos: {distribution.get('Positivo', 0)}")
         logger.info(f"   Neutrales: {distribution.get('Neutral', 0)}")
         logger.info(f"   Negativos: {distribution.get('Negativo', 0)}")
@@ -346,6 +302,224 @@ async def get_dashboard_data(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/cube")
+async def query_cube(
+    group_by: List[str] = Query(default=[], description="Dimensiones a conservar: tema, subtema, publicacion, sentimiento"),
+    tema: List[str] = Query(default=[]),
+    subtema: List[str] = Query(default=[]),
+    publicacion: List[int] = Query(default=[]),
+    sentimiento: List[str] = Query(default=[]),
+    sort_by: str = Query("count", description="count o likes"),
+    limit: int = Query(100, ge=1, le=10000)
+) -> Dict[str, Any]:
+    """
+    ✅ Slice & dice sobre el cubo precalculado (sin recorrer comentarios)
+    """
+    cube = dataset_manager.cube
+    if cube is None:
+        raise HTTPException(status_code=404, detail="Cubo de agregados no disponible")
+    
+    start = time.perf_counter()
+    
+    # Permitir tanto ?group_by=tema&group_by=sentimiento como ?group_by=tema,sentimiento
+    dims = [d.strip() for item in group_by for d in item.split(',') if d.strip()]
+    filters = {
+        'tema': tema,
+        'subtema': subtema,
+        'publicacion': publicacion,
+        'sentimiento': sentimiento
+    }
+    
+    try:
+        result = cube.query(filters=filters, group_by=dims, sort_by=sort_by, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        **result,
+        "group_by": dims,
+        "filters": {k: v for k, v in filters.items() if v},
+        "cube": cube.describe(),
+        "query_ms": round((time.perf_counter() - start) * 1000, 3),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/threads")
+async def get_thread_summary() -> Dict[str, Any]:
+    """
+    ✅ Sentimiento a nivel de conversación (raíces vs respuestas, cambios, profundidad)
+    """
+    threads = dataset_manager.threads
+    if threads is None:
+        raise HTTPException(status_code=404, detail="Índice de hilos no disponible")
+    
+    return {
+        **threads.summary(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/threads/{publicacion}/{comment_id}")
+async def get_thread(publicacion: int, comment_id: str) -> Dict[str, Any]:
+    """
+    ✅ Subárbol de respuestas de un comentario (rango contiguo del índice)
+    """
+    threads = dataset_manager.threads
+    df = dataset_manager.df
+    if threads is None or df is None:
+        raise HTTPException(status_code=404, detail="Índice de hilos no disponible")
+    
+    position = threads.locate(publicacion, comment_id)
+    if position is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Comentario {comment_id} no encontrado en la publicación {publicacion}"
+        )
+    
+    positions = threads.subtree(position)
+    rows = df.iloc[positions]
+    
+    text_col = resolve_column(df, 'texto_comentario')
+    id_col = resolve_column(df, 'id_comentario')
+    user_col = resolve_column(df, 'usuario')
+    likes_col = resolve_column(df, 'cantidad_likes')
+    
+    comments = []
+    for meta, (_, row) in zip(threads.rows_for(positions), rows.iterrows()):
+        likes = row[likes_col] if likes_col else None
+        comments.append({
+            **meta,
+            "comment_id": cell_text(row[id_col]),
+            "user": cell_text(row[user_col]) if user_col else None,
+            "comment": (cell_text(row[text_col]) or "")[:200] if text_col else "",
+            "likes": int(likes) if likes is not None and not pd.isna(likes) else 0
+        })
+    
+    root = int(threads.root[position])
+    return {
+        "publicacion": publicacion,
+        "comment_id": comment_id,
+        "thread_root": cell_text(df.iloc[root][id_col]),
+        "depth": int(threads.depth[position]),
+        "subtree_size": int(threads.size[position]),
+        "subtree_sentiment": threads.subtree_sentiment(position),
+        "comments": comments,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/posts")
+async def get_post_rollups(
+    sort_by: str = Query("comments", description="comments, likes, negative o publicacion"),
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    top_comments: int = Query(3, ge=0, le=20)
+) -> Dict[str, Any]:
+    """
+    ✅ Sentimiento por publicación desde el índice precalculado
+    """
+    posts = dataset_manager.posts
+    df = dataset_manager.df
+    if posts is None or df is None:
+        raise HTTPException(status_code=404, detail="Índice de publicaciones no disponible")
+    
+    try:
+        ranking = posts.ranking(sort_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    items = []
+    for group in ranking[offset:offset + limit]:
+        item = posts.summary(group)
+        item["top_comments"] = posts.top_comments(df, group, top_comments)
+        items.append(item)
+    
+    return {
+        "posts": items,
+        "total_posts": len(posts.post_ids),
+        "offset": offset,
+        "limit": limit,
+        "sort_by": sort_by,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/posts/{publicacion}")
+async def get_post_rollup(
+    publicacion: int,
+    top_comments: int = Query(10, ge=0, le=100)
+) -> Dict[str, Any]:
+    """
+    ✅ Rollup de una publicación
+    """
+    posts = dataset_manager.posts
+    df = dataset_manager.df
+    if posts is None or df is None:
+        raise HTTPException(status_code=404, detail="Índice de publicaciones no disponible")
+    
+    group = posts.locate(publicacion)
+    if group is None:
+        raise HTTPException(status_code=404, detail=f"Publicación {publicacion} no encontrada")
+    
+    return {
+        **posts.summary(group),
+        "top_comments": posts.top_comments(df, group, top_comments),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/top-words")
+async def get_top_words(
+    sentimiento: Optional[str] = Query(None, description="Positivo, Neutral o Negativo"),
+    tema: Optional[str] = Query(None, description="Tema principal"),
+    limit: int = Query(20, ge=1, le=200)
+) -> Dict[str, Any]:
+    """
+    ✅ Palabras más frecuentes desde los sketches Space-Saving, con cotas de error
+    """
+    heavy_hitters = dataset_manager.heavy_hitters
+    if heavy_hitters is None:
+        raise HTTPException(status_code=404, detail="Sketches de palabras no disponibles")
+    if sentimiento is not None and tema is not None:
+        raise HTTPException(status_code=400, detail="Filtra por sentimiento o por tema, no ambos")
+    
+    sketch = heavy_hitters.sketch_for(sentimiento=sentimiento, tema=tema)
+    if sketch is None:
+        raise HTTPException(status_code=404, detail=f"Sin datos para {sentimiento or tema}")
+    
+    return {
+        "sentimiento": sentimiento,
+        "tema": tema,
+        "words": sketch.top(limit),
+        "sketch": heavy_hitters.describe(sketch),
+        "available": {
+            "sentimientos": sorted(heavy_hitters.by_sentiment),
+            "temas": heavy_hitters.topics
+        },
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/timeline")
+async def get_timeline(
+    freq: str = Query("W", pattern="^(D|W)$", description="D = diario, W = semanal")
+) -> Dict[str, Any]:
+    """
+    ✅ Serie temporal de sentimiento desde los agregados diarios precalculados
+    """
+    timeline = dataset_manager.timeline
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Índice temporal no disponible")
+
+    return {
+        "freq": freq,
+        "coverage": timeline.describe(),
+        "series": timeline.series(freq),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
 # ========== UTILIDADES ==========
 
 def clasificar_tema_simple(texto: str) -> str:
@@ -10,7 +10,7 @@ from datetime import datetime
 
 class ReportRequest(BaseModel):
     """Request para generar reporte"""
-    period: Literal["current", "last", "quarter", "year", "custom"] = "current"
+    period: Literal["current", "last", "quarter", "year", "custom", "all"] = "current"
     format: Literal["json", "pdf", "excel"] = "json"
     include_details: bool = True
     start_date: Optional[str] = None
@@ -49,6 +49,14 @@ class ReportStatistics(BaseModel):
     total_words: int = Field(..., ge=0)
     unique_words: int = Field(..., ge=0)
     most_common_words: List[tuple] = Field(default_factory=list)
+    weighted_distribution: Dict[str, float] = Field(default_factory=dict)
+    weighted_percentages: Dict[str, float] = Field(default_factory=dict)
+    weighted_confidence: Optional[float] = Field(None, ge=0, le=1)
+    weighted_top_words: List[tuple] = Field(default_factory=list)
+    total_likes: int = Field(0, ge=0)
+    keyphrases: Dict[str, List[Dict[str, Any]]] = Field(default_factory=dict)
+    unique_users: Optional[int] = Field(None, ge=0)
+    unique_posts: Optional[int] = Field(None, ge=0)
 
 
 class CategoryScore(BaseModel):
@@ -103,6 +111,7 @@ class ReportResponse(BaseModel):
     best_day_engagement: float
     best_time: str
     best_time_range: str
+    date_range: Optional[Dict[str, Optional[str]]] = None
     error: Optional[str] = None
     
     model_config = ConfigDict(from_attributes=True)
@@ -5,6 +5,8 @@ import pandas as pd
 import numpy as np
 import re
 import joblib
+import hashlib
+import json
 import logging
 import os
 from datetime import datetime
@@ -15,6 +17,10 @@ from sklearn.metrics import accuracy_score, classification_report
 from typing import Dict, Any, List, Tuple, Optional
 from collections import Counter
 
+from app.core.dataset import dataset_manager
+from app.core.pipeline import SchemaValidationError
+from app.core.text import clean_text
+
 try:
     from imblearn.over_sampling import SMOTE
     HAS_SMOTE = True
@@ -35,8 +41,12 @@ class SentimentAnalyzer:
         self.model = None
         self.vectorizer = None
         self.is_trained = False
+        self.model_version = None
+        # True si el modelo en memoria difiere de los archivos guardados
+        self.model_dirty = False
         self.model_path = model_path or "ml_models/sentiment_model.pkl"
         self.vectorizer_path = "ml_models/tfidf_vectorizer.pkl"
+        self.metadata_path = "ml_models/model_metadata.json"
         
         self.sentiment_map = {
             'Negativo': 0,
@@ -53,6 +63,7 @@ class SentimentAnalyzer:
         self.training_report = {}
         self.dataset = None
         self.dataset_size = 0
+        self.memory_report = {}
         
         try:
             import nltk
@@ -66,65 +77,24 @@ class SentimentAnalyzer:
             ])
             logger.warning("Usando stopwords básicas")
     
-    def load_dataset(self, filepath: str) -> bool:
+    def load_dataset(self, filepath: str, progress=None, strict: bool = False,
+                     source: Optional[str] = None, replay_deltas: bool = True,
+                     reference_date: Optional[str] = None) -> bool:
         """
-        ✅ Carga dataset - Lógica exacta del test exitoso
+        Carga el dataset con el pipeline único de ingesta (DatasetManager)
+        
+        El snapshot ya llega con texto_comentario y sentimiento canónicos,
+        sentimientos reducidos a 3 clases, tipos compactos e índices. Los
+        errores de esquema (modo estricto) se propagan para informarlos.
         """
         try:
-            logger.info(f"Cargando dataset desde: {filepath}")
-            
-            # 1. CARGAR CSV
-            self.df = pd.read_csv(filepath, encoding="utf-8")
-            initial_count = len(self.df)
-            
-            logger.info(f"📊 CSV cargado: {initial_count} filas")
-            logger.info(f"📋 Columnas: {list(self.df.columns)}")
-            
-            # 2. IDENTIFICAR COLUMNAS
-            texto_col = None
-            for col in self.df.columns:
-                col_clean = str(col).strip()
-                if 'texto' in col_clean.lower() and 'comentario' in col_clean.lower():
-                    texto_col = col_clean
-                    logger.info(f"✅ Columna texto: '{col_clean}'")
-                    break
-            
-            if not texto_col:
-                raise ValueError(f"No se encontró columna de texto. Columnas: {list(self.df.columns)}")
-            
-            sent_col = None
-            for col in self.df.columns:
-                col_clean = str(col).strip()
-                if 'sentimiento' in col_clean.lower():
-                    sent_col = col_clean
-                    logger.info(f"✅ Columna sentimiento: '{col_clean}'")
-                    break
-            
-            if not sent_col:
-                raise ValueError(f"No se encontró columna de sentimiento")
-            
-            # 3. RENOMBRAR
-            self.df = self.df.rename(columns={
-                texto_col: 'texto_comentario',
-                sent_col: 'sentimiento'
-            })
-            
-            # 4. PROCESAR NULOS
-            self.df['texto_comentario'] = self.df['texto_comentario'].fillna('[Sin texto]')
-            self.df['sentimiento'] = self.df['sentimiento'].fillna('Neutral')
-            
-            # 5. CONVERTIR A STRING
-            self.df['texto_comentario'] = self.df['texto_comentario'].astype(str).str.strip()
-            self.df['sentimiento'] = self.df['sentimiento'].astype(str).str.strip()
+            with dataset_manager.lock:
+                self.df = dataset_manager.load_dataset(
+                    filepath, progress=progress, strict=strict, source=source,
+                    replay_deltas=replay_deltas, reference_date=reference_date
+                )
+                self.memory_report = dataset_manager.memory_report
             
-            # 6. REEMPLAZAR VACÍOS
-            self.df.loc[self.df['texto_comentario'] == '', 'texto_comentario'] = '[Sin texto]'
-            self.df.loc[self.df['sentimiento'].isin(['', 'nan', 'None', 'NaN']), 'sentimiento'] = 'Neutral'
-            
-            # 7. SIMPLIFICAR SENTIMIENTOS
-            self._simplificar_sentimientos()
-            
-            # 8. VERIFICACIÓN FINAL
             distribucion = self.df['sentimiento'].value_counts()
             total = len(self.df)
             
@@ -142,55 +112,29 @@ class SentimentAnalyzer:
             logger.info(f"✅ Dataset cargado: {total} comentarios")
             return True
             
+        except SchemaValidationError:
+            raise
         except Exception as e:
             logger.error(f"❌ Error cargando dataset: {e}", exc_info=True)
             return False
     
-    def _simplificar_sentimientos(self):
+    def append_dataset(self, filepath: str, progress=None) -> Dict[str, Any]:
         """
-        ✅ Mapeo simple y efectivo
-        """
-        logger.info("🔄 Simplificando sentimientos...")
+        Anexa las filas nuevas de un CSV delta (deduplicadas por ID_Comentario)
         
-        def mapear_sentimiento(sent: str) -> str:
-            s = str(sent).lower()
-            
-            # Negativos
-            if any(p in s for p in ['negativ', 'neg/', 'mal', 'trist', 'frustrac', 
-                                     'enojo', 'molest', 'decepc', 'critic', 'queja']):
-                return 'Negativo'
-            
-            # Positivos
-            elif any(p in s for p in ['positiv', 'posit/', 'buen', 'excel', 'alegr', 
-                                       'feliz', 'orgullo', 'admirac', 'entusias']):
-                return 'Positivo'
-            
-            # Neutral
-            else:
-                return 'Neutral'
-        
-        self.df['sentimiento_original'] = self.df['sentimiento'].copy()
-        self.df['sentimiento'] = self.df['sentimiento'].apply(mapear_sentimiento)
-        
-        if self.df['sentimiento'].isna().any():
-            self.df['sentimiento'] = self.df['sentimiento'].fillna('Neutral')
-        
-        logger.info(f"✅ Sentimientos simplificados")
+        Returns:
+            Reporte del anexo de DatasetManager.append_dataset
+        """
+        with dataset_manager.lock:
+            summary = dataset_manager.append_dataset(filepath, progress=progress)
+            self.df = dataset_manager.df
+        self.dataset = self.df
+        self.dataset_size = len(self.df)
+        return summary
     
     def clean_text(self, text: str) -> str:
-        """Limpia texto"""
-        if not isinstance(text, str):
-            return ""
-        
-        text = text.lower()
-        text = re.sub(r'https?://\S+|www\.\S+', '', text)
-        text = re.sub(r'@\w+', '', text)
-        text = re.sub(r'#\w+', '', text)
-        text = re.sub(r'[^\w\sáéíóúñ]', ' ', text)
-        text = re.sub(r'\d+', '', text)
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        """Limpia texto (misma limpieza que el etiquetado masivo)"""
+        return clean_text(text)
     
     def preprocess_text(self, text: str) -> str:
         """Alias de clean_text"""
@@ -205,11 +149,13 @@ class SentimentAnalyzer:
                 logger.error("No hay dataset")
                 return False
             
-            # Preparar datos
-            self.df['texto_limpio'] = self.df['texto_comentario'].apply(self.clean_text)
-            self.df['sentimiento_numerico'] = self.df['sentimiento'].map(self.sentiment_map)
+            # Preparar datos (fuera del snapshot compartido: no altera su versión)
+            data = pd.DataFrame({
+                'texto_limpio': self.df['texto_comentario'].apply(self.clean_text),
+                'sentimiento_numerico': self.df['sentimiento'].map(self.sentiment_map).astype(float)
+            })
             
-            df_clean = self.df.dropna(subset=['sentimiento_numerico']).copy()
+            df_clean = data.dropna(subset=['sentimiento_numerico']).copy()
             logger.info(f"Datos limpios: {len(df_clean)}")
             
             # TF-IDF
@@ -249,6 +195,7 @@ class SentimentAnalyzer:
                 class_weight='balanced'
             )
             self.model.fit(X_train, y_train)
+            self.model_dirty = True
             
             # Evaluar
             y_pred = self.model.predict(X_test)
@@ -260,14 +207,19 @@ class SentimentAnalyzer:
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
             joblib.dump(self.model, self.model_path)
             joblib.dump(self.vectorizer, self.vectorizer_path)
+            self.model_dirty = False
             
             self.model_metadata = {
                 'accuracy': float(accuracy),
                 'model_type': 'RandomForest',
                 'training_samples': len(X_train),
                 'test_samples': len(X_test),
-                'training_date': datetime.now().isoformat()
+                'training_date': datetime.now().isoformat(),
+                'dataset_version': dataset_manager.version,
+                'model_version': self._model_fingerprint()
             }
+            self.model_version = self.model_metadata['model_version']
+            self._save_metadata()
             
             self.is_trained = True
             return True
@@ -283,6 +235,8 @@ class SentimentAnalyzer:
                 logger.info("Cargando modelo...")
                 self.model = joblib.load(self.model_path)
                 self.vectorizer = joblib.load(self.vectorizer_path)
+                self.model_version = self._load_model_version()
+                self.model_dirty = False
                 self.is_trained = True
                 logger.info("✅ Modelo cargado")
                 return True
@@ -292,6 +246,59 @@ class SentimentAnalyzer:
             logger.error(f"❌ Error: {e}")
             return False
     
+    def _model_fingerprint(self) -> str:
+        """SHA-256 (16 hex) del contenido del modelo y del vectorizador guardados"""
+        digest = hashlib.sha256()
+        for path in (self.model_path, self.vectorizer_path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        return digest.hexdigest()[:16]
+    
+    def _save_metadata(self) -> None:
+        try:
+            with open(self.metadata_path, 'w', encoding='utf-8') as f:
+                json.dump(self.model_metadata, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar la metadata del modelo: {e}")
+    
+    def _load_model_version(self) -> str:
+        """
+        Versión del modelo guardado: hash del contenido de los .pkl
+        
+        Se calcula siempre desde los archivos, así un modelo reemplazado
+        (copia, checkout, otro entrenamiento) no hereda la versión de la
+        metadata anterior ni las predicciones del LabelStore. Como save_model
+        no reescribe un modelo sin cambios, la versión es estable entre
+        reinicios.
+        """
+        fingerprint = self._model_fingerprint()
+        metadata: Dict[str, Any] = {}
+        if os.path.exists(self.metadata_path):
+            try:
+                with open(self.metadata_path, encoding='utf-8') as f:
+                    metadata = json.load(f)
+            except Exception as e:
+                logger.warning(f"⚠️ Metadata del modelo ilegible, se recalcula: {e}")
+        
+        if metadata.get('model_version') == fingerprint:
+            self.model_metadata = metadata
+            return fingerprint
+        
+        if metadata.get('model_version'):
+            logger.warning("⚠️ Los archivos del modelo no coinciden con su metadata: se toma como modelo nuevo")
+            # La metadata describía otro modelo: no se conservan sus métricas
+            metadata = {}
+        self.model_metadata = {
+            **self.model_metadata,
+            **metadata,
+            # Solo informativa: la versión es el hash del contenido
+            'training_date': datetime.fromtimestamp(os.path.getmtime(self.model_path)).isoformat(),
+            'model_version': fingerprint
+        }
+        self._save_metadata()
+        return fingerprint
+    
     def predict(self, text: str) -> Dict[str, Any]:
         """Predice sentimiento"""
         try:
@@ -385,7 +392,7 @@ class SentimentAnalyzer:
             if 'texto_comentario' in self.df.columns:
                 try:
                     # Concatenar todos los textos
-                    all_text = ' '.join(self.df['texto_comentario'].astype(str).tolist())
+                    all_text = ' '.join(self.df['texto_comentario'].fillna('').astype(str).tolist())
                     
                     # Tokenizar
                     words = re.findall(r'\b[a-záéíóúñ]+\b', all_text.lower())
@@ -433,12 +440,19 @@ class SentimentAnalyzer:
         return self.get_statistics()
     
     def save_model(self):
-        """Guarda modelo"""
+        """Guarda modelo (solo si cambió respecto de los archivos: la versión es su hash)"""
         if self.model and self.vectorizer:
+            if not self.model_dirty and os.path.exists(self.model_path) and os.path.exists(self.vectorizer_path):
+                logger.info("⏭️ Modelo sin cambios, no se reescribe")
+                return
             try:
                 os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
                 joblib.dump(self.model, self.model_path)
                 joblib.dump(self.vectorizer, self.vectorizer_path)
+                self.model_dirty = False
+                self.model_version = self._model_fingerprint()
+                self.model_metadata['model_version'] = self.model_version
+                self._save_metadata()
                 logger.info("✅ Modelo guardado")
             except Exception as e:
                 logger.error(f"❌ Error: {e}")
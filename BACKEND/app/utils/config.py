@@ -3,7 +3,7 @@ CONFIGURACIÓN DEL SISTEMA - UNMSM SENTIMENT ANALYSIS
 Versión simplificada sin pydantic-settings
 """
 
-from typing import List
+from typing import List, Optional
 from pathlib import Path
 
 # Directorio base del proyecto
@@ -41,9 +41,14 @@ class Settings:
     MODELS_DIR: Path = BASE_DIR / "ml_models"
     REPORTS_DIR: Path = BASE_DIR / "reports"
     TEMP_DIR: Path = BASE_DIR / "temp"
+    DATASET_CACHE_DIR: Path = BASE_DIR / "data" / "cache"
+    COMMENT_STORE_PATH: Path = BASE_DIR / "data" / "comments.sqlite3"
     
     # Nombres de archivos
     DATASET_FILE: str = "dataset_instagram_unmsm.csv"
+    # Fecha de extracción (ISO) desde la que se cuentan antigüedades como "7 sem".
+    # Si es None se usa la registrada en el manifiesto de versiones para el mismo contenido
+    DATASET_REFERENCE_DATE: Optional[str] = None
     MODEL_FILE: str = "sentiment_model.pkl"
     PREPROCESSOR_FILE: str = "preprocessor.pkl"
     VECTORIZER_FILE: str = "tfidf_vectorizer.pkl"
@@ -71,10 +76,30 @@ class Settings:
     
     # Límites de procesamiento
     MAX_BATCH_SIZE: int = 1000
+    MAX_UPLOAD_BYTES: int = 1024 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
     MAX_COMMENT_LENGTH: int = 500
+    COMMENTS_MAX_PAGE_SIZE: int = 200
+    
+    # Etiquetado masivo con el modelo: textos por bloque y mínimo para usar el pool de procesos
+    LABELING_CHUNK_ROWS: int = 5000
+    LABELING_PARALLEL_MIN_ROWS: int = 20000
+    
+    # Palabras frecuentes (Space-Saving): contadores del sketch global y de cada
+    # sentimiento, y total compartido por todos los temas
+    HEAVY_HITTERS_CAPACITY: int = 1000
+    HEAVY_HITTERS_TOPIC_CAPACITY: int = 20000
+    
+    # Frases clave: se descartan términos presentes en más de esta fracción de comentarios
+    KEYPHRASE_MAX_DOC_RATIO: float = 0.2
+    
+    # Comentarios similares: vocabulario TF-IDF propio ajustado sobre el snapshot
+    SIMILARITY_MAX_FEATURES: int = 100000
+    SIMILARITY_MAX_DF: float = 0.5
     
     # Caché
     ENABLE_CACHE: bool = True
+    ENABLE_DATASET_CACHE: bool = True
     CACHE_TTL: int = 3600
     
     # Logging
@@ -112,6 +137,7 @@ def create_directories():
         settings.MODELS_DIR,
         settings.REPORTS_DIR,
         settings.TEMP_DIR,
+        settings.DATASET_CACHE_DIR,
         BASE_DIR / "logs"
     ]
     for directory in directories:
@@ -180,8 +206,25 @@ CONTEXTOS_COMPLEJOS = {
 
 NEGACIONES = ['no', 'nunca', 'jamás', 'tampoco', 'ni', 'sin']
 
+# Respaldo cuando NLTK no está instalado (subconjunto de sus stopwords en español)
 STOP_WORDS_SPANISH = [
     'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'del', 'se',
     'las', 'un', 'por', 'con', 'para', 'una', 'su', 'al', 'lo',
-    'es', 'como', 'más', 'pero', 'sus', 'le', 'ya', 'o', 'este'
-]
\ No newline at end of file
+    'es', 'como', 'más', 'pero', 'sus', 'le', 'ya', 'o', 'este',
+    'no', 'ni', 'si', 'sí', 'porque', 'esta', 'entre', 'cuando', 'muy', 'sin',
+    'sobre', 'también', 'me', 'hasta', 'hay', 'donde', 'quien', 'desde', 'todo',
+    'nos', 'durante', 'todos', 'uno', 'les', 'contra', 'otros', 'ese', 'eso',
+    'ante', 'ellos', 'e', 'esto', 'mí', 'antes', 'algunos', 'qué', 'unos', 'yo',
+    'otro', 'otras', 'otra', 'él', 'tanto', 'esa', 'estos', 'mucho', 'quienes',
+    'nada', 'muchos', 'cual', 'poco', 'ella', 'estar', 'estas', 'algunas', 'algo',
+    'nosotros', 'mi', 'mis', 'tú', 'te', 'ti', 'tu', 'tus', 'ellas', 'os', 'mío',
+    'mía', 'tuyo', 'suyo', 'nuestro', 'nuestra', 'nuestros', 'esos', 'esas',
+    'estoy', 'estás', 'está', 'estamos', 'están', 'estaba', 'estaban', 'estado',
+    'he', 'has', 'ha', 'hemos', 'han', 'había', 'habían', 'soy', 'eres', 'somos',
+    'son', 'era', 'eran', 'fue', 'fueron', 'sea', 'ser', 'tengo', 'tiene',
+    'tienen', 'tenemos', 'tener', 'hace', 'hacer', 'va', 'van', 'vez', 'así',
+    'solo', 'sólo', 'aquí', 'ahí', 'bien', 'cada', 'todas', 'toda', 'aún', 'ahora'
+]
+
+# Términos presentes en todo el corpus (la institución) que no caracterizan a ningún grupo
+CORPUS_TERMS_SPANISH = ['universidad', 'unmsm', 'san', 'marcos', 'sanmarcos', 'sanmarquino', 'sanmarquinos']
\ No newline at end of file
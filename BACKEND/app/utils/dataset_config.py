@@ -4,4 +4,29 @@ DATASET_CONFIG = {
     'sentiment_column': 'Sentimiento',     # Columna con los sentimientos
     'encoding': 'utf-8',
     'separator': ','
-}
\ No newline at end of file
+}
+
+# Esquema de tipos de la tabla de comentarios en memoria.
+# Las claves son nombres de columna en minúsculas (se comparan sin importar
+# mayúsculas) y los valores el tipo lógico:
+#   'category' -> pd.Categorical (pocas etiquetas repetidas)
+#   'count'    -> entero sin signo reducido al tipo más pequeño
+#   'string'   -> cadena respaldada por Arrow (si pyarrow está instalado)
+COLUMN_SCHEMA = {
+    'sentimiento': 'category',
+    'sentimiento_original': 'category',
+    'tema_principal': 'category',
+    'subtema_o_keyword': 'category',
+    'usuario': 'category',
+    'antiguedad': 'category',
+    'es_respuesta_a': 'category',
+    'cantidad_likes': 'count',
+    'me_gusta': 'count',
+    'publicacion': 'count',
+    'id_comentario': 'string',
+    'texto_comentario': 'string',
+    # Metadatos de publicación: se propagan a cada comentario del post,
+    # así que repiten unos pocos cientos de valores
+    'descripcion': 'category',
+    'enlace': 'category',
+}
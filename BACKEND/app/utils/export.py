@@ -3,57 +3,168 @@ Utilidades para exportación de datos
 """
 
 import pandas as pd
+import numpy as np
 import json
-import io
+import os
 import csv
 import logging
+import tempfile
+import zipfile
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Iterator, Optional, Union
 from datetime import datetime
 from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 
 from app.utils.config import settings
+from app.core.columns import SENTIMENT_LABELS, map_sentiment_label, resolve_column, sentiment_codes
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
 
 logger = logging.getLogger(__name__)
 
+# Tabla de detalle del PDF: columna lógica -> nombres aceptados
+PDF_COLUMNS = {
+    'comment': ['comment', 'texto_comentario', 'Texto_Comentario'],
+    'sentiment': ['sentiment', 'sentimiento', 'Sentimiento'],
+    'confidence': ['confidence', 'confianza'],
+    'timestamp': ['timestamp', 'fecha'],
+}
+PDF_HEADERS = ["Comentario", "Sentimiento", "Confianza", "Fecha"]
+PDF_COL_WIDTHS = [100, 35, 25, 30]
+PDF_ROW_HEIGHT = 6
+# Caracteres que siempre caben en la columna de comentario (ancho máximo de Helvetica 8)
+PDF_SAFE_CHARS = 35
+# Filas cuyo texto se prepara de una vez (~50 páginas)
+PDF_BLOCK_ROWS = 2000
+
+
+# CSV/JSON: filas serializadas por bloque en las respuestas en streaming
+EXPORT_CHUNK_ROWS = 5000
+
+
+def _export_columns(data: Union[List[Dict[str, Any]], pd.DataFrame]) -> List[str]:
+    """Columnas de salida en orden de aparición"""
+    if isinstance(data, pd.DataFrame):
+        return list(data.columns)
+    columns: Dict[str, None] = {}
+    for record in data:
+        columns.update(dict.fromkeys(record))
+    return list(columns)
+
+
+def _iter_frames(
+    data: Union[List[Dict[str, Any]], pd.DataFrame],
+    columns: List[str],
+    chunk_rows: int
+) -> Iterator[pd.DataFrame]:
+    """Bloques de filas como DataFrame (vistas si la entrada ya es un DataFrame)"""
+    for start in range(0, len(data), chunk_rows):
+        if isinstance(data, pd.DataFrame):
+            yield data.iloc[start:start + chunk_rows]
+        else:
+            yield pd.DataFrame(data[start:start + chunk_rows], columns=columns)
+
+
+# Parquet / Arrow IPC: formatos columnares y partición opcional (estilo Hive)
+COLUMNAR_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+COLUMNAR_COMPRESSION = 'zstd'
+# Solo columnas de pocos valores: Tema_Principal (~1600 temas) daría miles de
+# archivos diminutos, así que queda como columna normal dentro de cada archivo
+COLUMNAR_PARTITIONS = {
+    'sentimiento': 'sentimiento_general',
+    'categoria': 'categoria_reporte',
+    'mes': 'mes',
+}
+
+
+# Excel: filas por bloque y estilos con nombre compartidos por todo el libro
+EXCEL_CHUNK_ROWS = 5000
+EXCEL_MAX_ROWS = 1_048_575
+EXCEL_SENTIMENT_COLUMNS = ['sentiment', 'sentimiento', 'Sentimiento']
+EXCEL_SENTIMENT_STYLES = {
+    'Positivo': 'excel_positive',
+    'Negativo': 'excel_negative',
+    'Neutral': 'excel_neutral',
+}
+
+
+def _excel_named_styles() -> List[NamedStyle]:
+    """Estilos registrados una vez por libro (no un Font/PatternFill por celda)"""
+    def fill(color: str) -> PatternFill:
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+    
+    return [
+        NamedStyle(name="excel_header", font=Font(bold=True, color="FFFFFF"), fill=fill("2E75B6"),
+                   alignment=Alignment(horizontal="center", vertical="center")),
+        NamedStyle(name="excel_summary_header", font=Font(bold=True), fill=fill("F2F2F2")),
+        NamedStyle(name="excel_positive", font=Font(color="006100"), fill=fill("C6EFCE")),
+        NamedStyle(name="excel_negative", font=Font(color="9C0006"), fill=fill("FFC7CE")),
+        NamedStyle(name="excel_neutral", font=Font(color="9C6500"), fill=fill("FFEB9C")),
+    ]
+
+
+def latin1_text(text: str) -> str:
+    """Las fuentes base de PDF son latin-1: se reemplazan emojis y similares"""
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
 
 class DataExporter:
     """Clase para exportar datos de análisis en diferentes formatos"""
     
+    @staticmethod
+    def iter_csv(
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
+        chunk_rows: int = EXPORT_CHUNK_ROWS
+    ) -> Iterator[str]:
+        """
+        Serializa a CSV por bloques de filas (BOM + encabezado, luego cada bloque)
+        
+        Args:
+            data: Registros (lista de diccionarios o DataFrame)
+            chunk_rows: Filas por bloque
+        """
+        columns = _export_columns(data)
+        yield '\ufeff'
+        yield pd.DataFrame(columns=columns).to_csv(index=False)
+        for chunk in _iter_frames(data, columns, chunk_rows):
+            yield chunk.to_csv(index=False, header=False)
+    
     @staticmethod
     def export_to_csv(
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
         filename: Optional[str] = None
     ) -> StreamingResponse:
         """
         Exporta datos a CSV
         
+        La respuesta se genera por bloques: el primer byte sale sin esperar a
+        serializar todo y en memoria solo hay un bloque a la vez.
+        
         Args:
-            data: Lista de diccionarios con los datos
+            data: Lista de diccionarios o DataFrame con los datos
             filename: Nombre del archivo (opcional)
             
         Returns:
             StreamingResponse con el archivo CSV
         """
         try:
-            if not data:
+            if len(data) == 0:
                 raise ValueError("No hay datos para exportar")
             
-            # Convertir a DataFrame
-            df = pd.DataFrame(data)
-            
-            # Crear stream en memoria
-            stream = io.StringIO()
-            
-            # Exportar a CSV
-            df.to_csv(stream, index=False, encoding='utf-8-sig')
-            
-            # Preparar respuesta
-            stream.seek(0)
-            
             # Nombre del archivo
             if not filename:
                 filename = f"sentiment_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
@@ -61,11 +172,11 @@ class DataExporter:
                 filename += '.csv'
             
             response = StreamingResponse(
-                iter([stream.getvalue()]),
+                DataExporter.iter_csv(data),
                 media_type="text/csv",
                 headers={
                     "Content-Disposition": f"attachment; filename={filename}",
-                    "Content-Type": "text/csv; charset=utf-8-sig"
+                    "Content-Type": "text/csv; charset=utf-8"
                 }
             )
             
@@ -76,112 +187,141 @@ class DataExporter:
             logger.error(f"❌ Error exportando a CSV: {e}")
             raise
     
+    @staticmethod
+    def write_excel(
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
+        filepath: Union[str, Path],
+        sheet_name: str = "Análisis",
+        include_summary: bool = True,
+        max_rows: Optional[int] = None
+    ) -> Path:
+        """
+        Escribe el libro en modo write-only (streaming) directamente a disco
+        
+        Las filas se escriben por bloques; solo las celdas de sentimiento y
+        los encabezados se envuelven en WriteOnlyCell con un estilo con
+        nombre compartido, el resto se escribe como valores planos.
+        
+        Args:
+            data: Registros (lista de diccionarios o DataFrame)
+            filepath: Ruta de salida
+            sheet_name: Nombre de la hoja
+            include_summary: Incluir hoja de resumen
+            max_rows: Límite de filas (None = todas, hasta el máximo de Excel)
+            
+        Returns:
+            Path del archivo escrito
+        """
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        if df.empty:
+            raise ValueError("No hay datos para exportar")
+        
+        rows = min(len(df), EXCEL_MAX_ROWS if max_rows is None else max_rows)
+        headers = [str(c) for c in df.columns]
+        sent_col = next((c for c in EXCEL_SENTIMENT_COLUMNS if c in df.columns), None)
+        sent_idx = headers.index(str(sent_col)) if sent_col is not None else None
+        
+        wb = openpyxl.Workbook(write_only=True)
+        for style in _excel_named_styles():
+            wb.add_named_style(style)
+        
+        ws = wb.create_sheet(title=sheet_name)
+        for col_num in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = 20
+        
+        def styled(value: Any, style: str) -> WriteOnlyCell:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            return cell
+        
+        ws.append([styled(h, "excel_header") for h in headers])
+        
+        for start in range(0, rows, EXCEL_CHUNK_ROWS):
+            chunk = df.iloc[start:min(start + EXCEL_CHUNK_ROWS, rows)]
+            # Nulos a None y tipos numpy a nativos de una vez por bloque
+            values = chunk.astype(object).where(chunk.notna(), None).values.tolist()
+            if sent_idx is not None:
+                styles = chunk[sent_col].map(map_sentiment_label).map(EXCEL_SENTIMENT_STYLES).tolist()
+                for row, style in zip(values, styles):
+                    if isinstance(style, str):
+                        row[sent_idx] = styled(row[sent_idx], style)
+                    ws.append(row)
+            else:
+                for row in values:
+                    ws.append(row)
+        
+        if include_summary:
+            ws_summary = wb.create_sheet(title="Resumen")
+            for col_num in range(1, 7):
+                ws_summary.column_dimensions[get_column_letter(col_num)].width = 25
+            
+            # Conteos vectorizados sobre todo el conjunto
+            counts = (
+                df[sent_col].map(map_sentiment_label).value_counts()
+                if sent_col is not None else pd.Series(dtype=int)
+            )
+            conf_col = next((c for c in ('confidence', 'confianza') if c in df.columns), None)
+            confidence = pd.to_numeric(df[conf_col], errors='coerce').mean() if conf_col else float('nan')
+            
+            ws_summary.append([styled(h, "excel_summary_header") for h in (
+                "Total de Comentarios", "Positivos", "Negativos", "Neutrales",
+                "Confianza Promedio", "Fecha de Exportación"
+            )])
+            ws_summary.append([
+                len(df),
+                int(counts.get('Positivo', 0)),
+                int(counts.get('Negativo', 0)),
+                int(counts.get('Neutral', 0)),
+                float(confidence) if pd.notna(confidence) else 0,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            ])
+        
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        wb.save(str(filepath))
+        return filepath
+    
     @staticmethod
     def export_to_excel(
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
         filename: Optional[str] = None,
         sheet_name: str = "Análisis",
-        include_summary: bool = True
-    ) -> StreamingResponse:
+        include_summary: bool = True,
+        max_rows: Optional[int] = None
+    ) -> FileResponse:
         """
         Exporta datos a Excel con formato avanzado
         
         Args:
-            data: Lista de diccionarios con los datos
+            data: Lista de diccionarios o DataFrame con los datos
             filename: Nombre del archivo (opcional)
             sheet_name: Nombre de la hoja
             include_summary: Incluir hoja de resumen
+            max_rows: Límite de filas (None = todas)
             
         Returns:
-            StreamingResponse con el archivo Excel
+            FileResponse con el archivo Excel
         """
         try:
-            if not data:
-                raise ValueError("No hay datos para exportar")
-            
-            # Crear libro de Excel
-            wb = openpyxl.Workbook()
-            
-            # Hoja principal de datos
-            ws_data = wb.active
-            ws_data.title = sheet_name
-            
-            # Convertir datos
-            df = pd.DataFrame(data)
-            
-            # Escribir encabezados con formato
-            headers = list(df.columns)
-            for col_num, header in enumerate(headers, 1):
-                cell = ws_data.cell(row=1, column=col_num, value=header)
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = PatternFill(start_color="2E75B6", end_color="2E75B6", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-                ws_data.column_dimensions[get_column_letter(col_num)].width = 20
-            
-            # Escribir datos
-            for row_num, row in enumerate(df.itertuples(index=False), 2):
-                for col_num, value in enumerate(row, 1):
-                    cell = ws_data.cell(row=row_num, column=col_num, value=value)
-                    
-                    # Formato condicional para sentimientos
-                    if headers[col_num - 1] == 'sentiment':
-                        if value == 'Positivo':
-                            cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-                            cell.font = Font(color="006100")
-                        elif value == 'Negativo':
-                            cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-                            cell.font = Font(color="9C0006")
-                        elif value == 'Neutral':
-                            cell.fill = PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid")
-                            cell.font = Font(color="9C6500")
-            
-            # Agregar hoja de resumen si se solicita
-            if include_summary:
-                ws_summary = wb.create_sheet(title="Resumen")
-                
-                # Estadísticas básicas
-                summary_data = {
-                    "Métrica": ["Total de Comentarios", "Positivos", "Negativos", "Neutrales", 
-                               "Confianza Promedio", "Fecha de Exportación"],
-                    "Valor": [
-                        len(data),
-                        sum(1 for d in data if d.get('sentiment') == 'Positivo'),
-                        sum(1 for d in data if d.get('sentiment') == 'Negativo'),
-                        sum(1 for d in data if d.get('sentiment') == 'Neutral'),
-                        sum(d.get('confidence', 0) for d in data) / len(data) if data else 0,
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    ]
-                }
-                
-                # Escribir resumen
-                for col_num, header in enumerate(summary_data["Métrica"], 1):
-                    cell = ws_summary.cell(row=1, column=col_num, value=header)
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-                    ws_summary.column_dimensions[get_column_letter(col_num)].width = 25
-                
-                for col_num, value in enumerate(summary_data["Valor"], 1):
-                    cell = ws_summary.cell(row=2, column=col_num, value=value)
-                    cell.alignment = Alignment(horizontal="left")
-            
-            # Guardar en memoria
-            stream = io.BytesIO()
-            wb.save(stream)
-            stream.seek(0)
-            
             # Nombre del archivo
             if not filename:
                 filename = f"sentiment_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             elif not filename.endswith('.xlsx'):
                 filename += '.xlsx'
             
-            response = StreamingResponse(
-                stream,
+            fd, tmp_path = tempfile.mkstemp(dir=settings.TEMP_DIR, suffix=".xlsx")
+            os.close(fd)
+            try:
+                DataExporter.write_excel(data, tmp_path, sheet_name, include_summary, max_rows)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            
+            response = FileResponse(
+                tmp_path,
                 media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={
-                    "Content-Disposition": f"attachment; filename={filename}",
-                    "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                }
+                filename=filename,
+                background=BackgroundTask(os.unlink, tmp_path)
             )
             
             logger.info(f"✅ Datos exportados a Excel: {filename} ({len(data)} registros)")
@@ -191,9 +331,71 @@ class DataExporter:
             logger.error(f"❌ Error exportando a Excel: {e}")
             raise
     
+    @staticmethod
+    def iter_json(
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
+        pretty: bool = True,
+        chunk_rows: int = EXPORT_CHUNK_ROWS
+    ) -> Iterator[str]:
+        """
+        Serializa a JSON como un arreglo en streaming
+        
+        Se emite {"metadata": ..., "data": [ y luego los registros por bloques;
+        la distribución de sentimientos y la confianza promedio se acumulan
+        bloque a bloque y se escriben al final en "statistics".
+        
+        Args:
+            data: Registros (lista de diccionarios o DataFrame)
+            pretty: Formatear JSON para legibilidad
+            chunk_rows: Registros por bloque
+        """
+        indent = 2 if pretty else None
+        newline = "\n" if pretty else ""
+        
+        def nested(value: Any, level: int) -> str:
+            text = json.dumps(value, indent=indent, ensure_ascii=False, default=str)
+            return text.replace("\n", "\n" + "  " * level) if pretty else text
+        
+        metadata = {
+            "export_date": datetime.now().isoformat(),
+            "total_records": len(data),
+            "format": "JSON",
+            "version": "1.0"
+        }
+        pad = "  " if pretty else ""
+        yield f'{{{newline}{pad}"metadata": {nested(metadata, 1)},{newline}{pad}"data": ['
+        
+        columns = _export_columns(data)
+        sent_col = next((c for c in PDF_COLUMNS['sentiment'] if c in columns), None)
+        conf_col = next((c for c in PDF_COLUMNS['confidence'] if c in columns), None)
+        distribution = dict.fromkeys(['Positivo', 'Negativo', 'Neutral'], 0)
+        confidence_sum = 0.0
+        first = True
+        
+        for chunk in _iter_frames(data, columns, chunk_rows):
+            # Estadísticas incrementales del bloque
+            if sent_col is not None:
+                counts = chunk[sent_col].dropna().map(map_sentiment_label).value_counts()
+                for label in distribution:
+                    distribution[label] += int(counts.get(label, 0))
+            if conf_col is not None:
+                confidence_sum += float(pd.to_numeric(chunk[conf_col], errors='coerce').fillna(0).sum())
+            
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+            separator = "," + newline + pad * 2
+            body = separator.join(nested(record, 2) for record in records)
+            yield ("" if first else ",") + newline + pad * 2 + body
+            first = False
+        
+        statistics = {
+            "sentiment_distribution": distribution,
+            "average_confidence": confidence_sum / len(data) if len(data) else 0
+        }
+        yield f'{newline}{pad}],{newline}{pad}"statistics": {nested(statistics, 1)}{newline}}}'
+    
     @staticmethod
     def export_to_json(
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
         filename: Optional[str] = None,
         pretty: bool = True
     ) -> StreamingResponse:
@@ -201,7 +403,7 @@ class DataExporter:
         Exporta datos a JSON
         
         Args:
-            data: Lista de diccionarios con los datos
+            data: Lista de diccionarios o DataFrame con los datos
             filename: Nombre del archivo (opcional)
             pretty: Formatear JSON para legibilidad
             
@@ -209,34 +411,9 @@ class DataExporter:
             StreamingResponse con el archivo JSON
         """
         try:
-            if not data:
+            if len(data) == 0:
                 raise ValueError("No hay datos para exportar")
             
-            # Preparar datos
-            export_data = {
-                "metadata": {
-                    "export_date": datetime.now().isoformat(),
-                    "total_records": len(data),
-                    "format": "JSON",
-                    "version": "1.0"
-                },
-                "data": data,
-                "statistics": {
-                    "sentiment_distribution": {
-                        "Positivo": sum(1 for d in data if d.get('sentiment') == 'Positivo'),
-                        "Negativo": sum(1 for d in data if d.get('sentiment') == 'Negativo'),
-                        "Neutral": sum(1 for d in data if d.get('sentiment') == 'Neutral')
-                    },
-                    "average_confidence": sum(d.get('confidence', 0) for d in data) / len(data) if data else 0
-                }
-            }
-            
-            # Convertir a JSON
-            if pretty:
-                json_str = json.dumps(export_data, indent=2, ensure_ascii=False)
-            else:
-                json_str = json.dumps(export_data, ensure_ascii=False)
-            
             # Nombre del archivo
             if not filename:
                 filename = f"sentiment_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -244,7 +421,7 @@ class DataExporter:
                 filename += '.json'
             
             response = StreamingResponse(
-                iter([json_str]),
+                DataExporter.iter_json(data, pretty=pretty),
                 media_type="application/json",
                 headers={
                     "Content-Disposition": f"attachment; filename={filename}",
@@ -259,128 +436,193 @@ class DataExporter:
             logger.error(f"❌ Error exportando a JSON: {e}")
             raise
     
+    @staticmethod
+    def write_pdf(
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
+        filepath: Union[str, Path],
+        title: str = "Reporte de Análisis de Sentimientos",
+        max_rows: Optional[int] = None
+    ) -> Path:
+        """
+        Escribe el PDF completo en disco, página a página (requiere fpdf2)
+        
+        Las filas se recorren en bloques del tamaño de una página y el
+        documento se serializa una sola vez directamente al archivo.
+        
+        Args:
+            data: Registros (lista de diccionarios o DataFrame del dataset)
+            filepath: Ruta de salida
+            title: Título del reporte
+            max_rows: Límite de filas de la tabla (None = todas)
+            
+        Returns:
+            Path del PDF escrito
+        """
+        from fpdf import FPDF
+        
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        if df.empty:
+            raise ValueError("No hay datos para exportar")
+        
+        columns = {
+            name: next((c for c in candidates if c in df.columns), None)
+            for name, candidates in PDF_COLUMNS.items()
+        }
+        total = len(df)
+        rows = total if max_rows is None else min(total, max_rows)
+        
+        pdf = FPDF()
+        pdf.set_auto_page_break(auto=False)
+        pdf.set_title(latin1_text(title))
+        pdf.add_page()
+        
+        # Título y metadatos
+        pdf.set_font("Helvetica", 'B', 16)
+        pdf.cell(0, 10, latin1_text(title), align='C', new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(4)
+        pdf.set_font("Helvetica", size=10)
+        pdf.cell(0, 7, latin1_text(f"Fecha de exportación: {datetime.now():%Y-%m-%d %H:%M:%S}"),
+                 new_x="LMARGIN", new_y="NEXT")
+        pdf.cell(0, 7, f"Total de registros: {total}", new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(6)
+        
+        # Tablas resumen (vectorizadas sobre todo el dataset)
+        pdf.set_font("Helvetica", 'B', 12)
+        pdf.cell(0, 9, latin1_text("Distribución de sentimientos"), new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", size=10)
+        if columns['sentiment']:
+            distribution = df[columns['sentiment']].map(map_sentiment_label).value_counts()
+            for label in SENTIMENT_LABELS:
+                count = int(distribution.get(label, 0))
+                pdf.cell(0, 7, f"{label}: {count} ({count / total * 100:.1f}%)", new_x="LMARGIN", new_y="NEXT")
+        if columns['confidence']:
+            confidence = pd.to_numeric(df[columns['confidence']], errors='coerce').mean()
+            if pd.notna(confidence):
+                pdf.cell(0, 7, f"Confianza promedio: {confidence:.1%}", new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(6)
+        
+        # Tabla de detalle, una página por bloque
+        pdf.set_font("Helvetica", 'B', 12)
+        pdf.cell(0, 9, f"Detalle ({rows} registros)", new_x="LMARGIN", new_y="NEXT")
+        
+        x0 = pdf.l_margin
+        edges = [x0]
+        for width in PDF_COL_WIDTHS:
+            edges.append(edges[-1] + width)
+        bottom = pdf.h - 15
+        
+        def header() -> None:
+            pdf.set_font("Helvetica", 'B', 9)
+            for (label, width) in zip(PDF_HEADERS, PDF_COL_WIDTHS):
+                pdf.cell(width, PDF_ROW_HEIGHT + 1, label, border=1, align='C')
+            pdf.ln()
+            pdf.set_font("Helvetica", size=8)
+        
+        def grid(top: float, n_rows: int) -> None:
+            """Bordes de la página: una línea por fila y por columna, no un rectángulo por celda"""
+            end = top + n_rows * PDF_ROW_HEIGHT
+            for i in range(1, n_rows + 1):
+                pdf.line(edges[0], top + i * PDF_ROW_HEIGHT, edges[-1], top + i * PDF_ROW_HEIGHT)
+            for x in edges:
+                pdf.line(x, top, x, end)
+        
+        def column_text(chunk: pd.DataFrame, name: str, width: int) -> List[str]:
+            col = columns[name]
+            if col is None:
+                return [''] * len(chunk)
+            values = chunk[col]
+            if name == 'confidence':
+                numeric = pd.to_numeric(values, errors='coerce')
+                return [f"{v:.1%}" if pd.notna(v) else '' for v in numeric]
+            text = values.astype(object).where(values.notna(), '').astype(str).str.replace(r'\s+', ' ', regex=True)
+            text = text.where(text.str.len() <= width, text.str.slice(0, width - 3) + '...')
+            return text.str.encode('latin-1', 'replace').str.decode('latin-1').tolist()
+        
+        header()
+        top, on_page = pdf.get_y(), 0
+        for start in range(0, rows, PDF_BLOCK_ROWS):
+            chunk = df.iloc[start:min(start + PDF_BLOCK_ROWS, rows)]
+            # Columnas del bloque preparadas de una vez (truncado, latin-1)
+            cells = zip(
+                column_text(chunk, 'comment', 62),
+                column_text(chunk, 'sentiment', 18),
+                column_text(chunk, 'confidence', 10),
+                column_text(chunk, 'timestamp', 10),
+            )
+            for row in cells:
+                if top + (on_page + 1) * PDF_ROW_HEIGHT > bottom:
+                    grid(top, on_page)
+                    pdf.add_page()
+                    header()
+                    top, on_page = pdf.get_y(), 0
+                baseline = top + on_page * PDF_ROW_HEIGHT + PDF_ROW_HEIGHT * 0.7
+                comment = row[0]
+                # Solo textos largos pueden desbordar (p. ej. en mayúsculas): se miden y recortan
+                if len(comment) > PDF_SAFE_CHARS:
+                    while len(comment) > PDF_SAFE_CHARS and pdf.get_string_width(comment) > PDF_COL_WIDTHS[0] - 3:
+                        comment = comment[:-4] + '...'
+                    row = (comment,) + row[1:]
+                for value, x in zip(row, edges):
+                    if value:
+                        pdf.text(x + 1.5, baseline, value)
+                on_page += 1
+        grid(top, on_page)
+        pdf.set_y(top + on_page * PDF_ROW_HEIGHT)
+        
+        # Pie de página
+        pdf.ln(8)
+        pdf.set_font("Helvetica", 'I', 8)
+        pdf.cell(0, 8, "Generado por UNMSM Sentiment Analysis System v3.0", align='C')
+        
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        pdf.output(str(filepath))
+        return filepath
+    
     @staticmethod
     def export_to_pdf(
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
         filename: Optional[str] = None,
         title: str = "Reporte de Análisis de Sentimientos",
-        include_charts: bool = True
-    ) -> StreamingResponse:
+        include_charts: bool = True,
+        max_rows: Optional[int] = None
+    ) -> FileResponse:
         """
         Exporta datos a PDF (usando fpdf2)
         
+        Renderiza todas las filas en páginas sucesivas a un archivo temporal
+        y lo sirve con FileResponse; el temporal se borra al terminar el envío.
+        
         Args:
-            data: Lista de diccionarios con los datos
+            data: Lista de diccionarios o DataFrame con los datos
             filename: Nombre del archivo (opcional)
             title: Título del reporte
             include_charts: Incluir gráficos (requiere matplotlib)
+            max_rows: Límite de filas de la tabla (None = todas)
             
         Returns:
-            StreamingResponse con el archivo PDF
+            FileResponse con el archivo PDF
         """
         try:
-            from fpdf import FPDF
-            
-            if not data:
-                raise ValueError("No hay datos para exportar")
-            
-            # Crear PDF
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            
-            # Configurar fuente
-            pdf.set_font("Arial", size=12)
-            
-            # Título
-            pdf.set_font("Arial", 'B', 16)
-            pdf.cell(200, 10, txt=title, ln=True, align='C')
-            pdf.ln(10)
-            
-            # Metadatos
-            pdf.set_font("Arial", size=10)
-            pdf.cell(200, 8, txt=f"Fecha de exportación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
-            pdf.cell(200, 8, txt=f"Total de registros: {len(data)}", ln=True)
-            pdf.ln(10)
-            
-            # Estadísticas
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(200, 10, txt="Estadísticas del Reporte:", ln=True)
-            pdf.set_font("Arial", size=10)
-            
-            stats = {
-                "Positivo": sum(1 for d in data if d.get('sentiment') == 'Positivo'),
-                "Negativo": sum(1 for d in data if d.get('sentiment') == 'Negativo'),
-                "Neutral": sum(1 for d in data if d.get('sentiment') == 'Neutral')
-            }
-            
-            for sentiment, count in stats.items():
-                percentage = (count / len(data)) * 100
-                pdf.cell(200, 8, txt=f"{sentiment}: {count} ({percentage:.1f}%)", ln=True)
-            
-            pdf.ln(10)
-            
-            # Tabla de datos (primeros 20 registros)
-            pdf.set_font("Arial", 'B', 12)
-            pdf.cell(200, 10, txt="Muestra de Datos (primeros 20 registros):", ln=True)
-            pdf.ln(5)
-            
-            # Encabezados de tabla
-            pdf.set_font("Arial", 'B', 10)
-            col_widths = [100, 30, 30, 30]
-            headers = ["Comentario", "Sentimiento", "Confianza", "Fecha"]
-            
-            for i, header in enumerate(headers):
-                pdf.cell(col_widths[i], 10, header, border=1, align='C')
-            pdf.ln()
-            
-            # Datos de tabla
-            pdf.set_font("Arial", size=9)
-            for i, record in enumerate(data[:20], 1):
-                # Truncar comentario largo
-                comment = str(record.get('comment', ''))
-                if len(comment) > 60:
-                    comment = comment[:57] + "..."
-                
-                pdf.cell(col_widths[0], 8, comment, border=1)
-                pdf.cell(col_widths[1], 8, str(record.get('sentiment', '')), border=1, align='C')
-                pdf.cell(col_widths[2], 8, f"{record.get('confidence', 0):.1%}", border=1, align='C')
-                
-                # Formatear fecha
-                timestamp = record.get('timestamp', '')
-                if isinstance(timestamp, str):
-                    date_str = timestamp[:10] if len(timestamp) >= 10 else timestamp
-                else:
-                    date_str = str(timestamp)[:10]
-                
-                pdf.cell(col_widths[3], 8, date_str, border=1, align='C')
-                pdf.ln()
-            
-            # Pie de página
-            pdf.ln(20)
-            pdf.set_font("Arial", 'I', 8)
-            pdf.cell(0, 10, "Generado por UNMSM Sentiment Analysis System v3.0", 0, 0, 'C')
-            
-            # Guardar en memoria
-            stream = io.BytesIO()
-            pdf.output(dest='S').encode('latin-1')
-            pdf_bytes = pdf.output(dest='S').encode('latin-1')
-            stream.write(pdf_bytes)
-            stream.seek(0)
-            
             # Nombre del archivo
             if not filename:
                 filename = f"sentiment_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             elif not filename.endswith('.pdf'):
                 filename += '.pdf'
             
-            response = StreamingResponse(
-                stream,
+            fd, tmp_path = tempfile.mkstemp(dir=settings.TEMP_DIR, suffix=".pdf")
+            os.close(fd)
+            try:
+                DataExporter.write_pdf(data, tmp_path, title=title, max_rows=max_rows)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            
+            response = FileResponse(
+                tmp_path,
                 media_type="application/pdf",
-                headers={
-                    "Content-Disposition": f"attachment; filename={filename}",
-                    "Content-Type": "application/pdf"
-                }
+                filename=filename,
+                background=BackgroundTask(os.unlink, tmp_path)
             )
             
             logger.info(f"✅ Datos exportados a PDF: {filename} ({len(data)} registros)")
@@ -393,6 +635,186 @@ class DataExporter:
             logger.error(f"❌ Error exportando a PDF: {e}")
             raise
     
+    @staticmethod
+    def to_arrow_table(df: pd.DataFrame) -> "pa.Table":
+        """
+        Snapshot como tabla Arrow con el sentimiento general ya resuelto
+        
+        Las columnas string[pyarrow] y numéricas se pasan sin copiar y las
+        categóricas quedan como arreglos diccionario. Se agrega
+        sentimiento_general (Positivo/Neutral/Negativo) como diccionario
+        sobre los códigos 0/1/2.
+        """
+        if not HAS_PYARROW:
+            raise ImportError("pyarrow no está instalado")
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        general = pa.DictionaryArray.from_arrays(
+            pa.array(sentiment_codes(df).astype('int8')),
+            pa.array(SENTIMENT_LABELS)
+        )
+        return table.append_column('sentimiento_general', general)
+    
+    @staticmethod
+    def write_columnar(
+        df: pd.DataFrame,
+        path: Union[str, Path],
+        format: str = 'parquet',
+        partition_by: Optional[str] = None
+    ) -> Path:
+        """
+        Escribe el snapshot en Parquet o Arrow IPC comprimido (zstd)
+        
+        Args:
+            df: Datos a exportar
+            path: Archivo de salida, o directorio si se particiona
+            format: 'parquet' o 'arrow'
+            partition_by: 'sentimiento', 'categoria' o 'mes' (un subdirectorio por valor)
+            
+        Returns:
+            Path del archivo o directorio escrito
+        """
+        if format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Formato no soportado: {format}")
+        
+        table = DataExporter.to_arrow_table(df)
+        path = Path(path)
+        
+        if partition_by is not None:
+            if partition_by not in COLUMNAR_PARTITIONS:
+                raise ValueError(f"Partición no soportada: {partition_by}")
+            column = COLUMNAR_PARTITIONS[partition_by]
+            if partition_by == 'categoria':
+                # Tema_Principal es texto libre (cientos de valores); las
+                # categorías del reporte dan pocas particiones con sentido
+                from app.core.categories import CATEGORY_NAMES, CategoryIndex
+                codes = CategoryIndex.from_frame(df).codes
+                table = table.append_column(column, pa.DictionaryArray.from_arrays(
+                    pa.array(np.where(codes >= 0, codes, len(CATEGORY_NAMES)).astype('int8')),
+                    pa.array(CATEGORY_NAMES + ['Sin categoría'])
+                ))
+            elif partition_by == 'mes':
+                # Mes de la fecha resuelta (columna fecha o antigüedad relativa)
+                from app.core.timeindex import TimeIndex
+                timestamps = TimeIndex.from_frame(df).row_timestamps(len(df))
+                months = timestamps.dt.strftime('%Y-%m').fillna('sin-fecha')
+                table = table.append_column(column, pa.array(months.to_numpy(dtype=object)).dictionary_encode())
+            elif column not in table.column_names:
+                column = resolve_column(df, column)
+                if column is None:
+                    raise ValueError(f"El dataset no tiene columna para particionar por '{partition_by}'")
+            
+            # Cada archivo de la partición llevaría el diccionario completo de
+            # las columnas categóricas: se decodifican y cada archivo guarda solo
+            # sus propios valores (Parquet vuelve a codificarlos por diccionario)
+            table = pa.table({
+                name: (
+                    table[name].cast(table[name].type.value_type)
+                    if name != column and pa.types.is_dictionary(table[name].type)
+                    else table[name]
+                )
+                for name in table.column_names
+            })
+            
+            file_format = (
+                pa_dataset.ParquetFileFormat() if format == 'parquet' else pa_dataset.IpcFileFormat()
+            )
+            options = (
+                file_format.make_write_options(compression=COLUMNAR_COMPRESSION)
+                if format == 'parquet'
+                else file_format.make_write_options(
+                    compression=pa.Codec(COLUMNAR_COMPRESSION)
+                )
+            )
+            pa_dataset.write_dataset(
+                table, path,
+                format=file_format,
+                file_options=options,
+                partitioning=[column],
+                partitioning_flavor='hive',
+                max_partitions=len(table[column].unique()) + 1,
+                existing_data_behavior='overwrite_or_ignore'
+            )
+            return path
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if format == 'parquet':
+            pq.write_table(table, path, compression=COLUMNAR_COMPRESSION)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=COLUMNAR_COMPRESSION)
+            with pa.OSFile(str(path), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                    writer.write_table(table)
+        return path
+    
+    @staticmethod
+    def export_to_columnar(
+        df: pd.DataFrame,
+        filename: Optional[str] = None,
+        format: str = 'parquet',
+        partition_by: Optional[str] = None
+    ) -> FileResponse:
+        """
+        Exporta a Parquet o Arrow IPC
+        
+        Sin partición se descarga un solo archivo; con partición se descarga
+        un .zip con el directorio particionado (los archivos ya van comprimidos,
+        el zip solo los empaqueta).
+        
+        Args:
+            df: DataFrame con los datos
+            filename: Nombre del archivo (opcional)
+            format: 'parquet' o 'arrow'
+            partition_by: 'sentimiento', 'categoria' o 'mes' (opcional)
+            
+        Returns:
+            FileResponse con el archivo exportado
+        """
+        try:
+            if df is None or df.empty:
+                raise ValueError("No hay datos para exportar")
+            if format not in COLUMNAR_FORMATS:
+                raise ValueError(f"Formato no soportado: {format}")
+            
+            extension, media_type = COLUMNAR_FORMATS[format]
+            if partition_by is not None:
+                extension, media_type = f"{extension}.zip", "application/zip"
+            
+            if not filename:
+                filename = f"sentiment_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            if not filename.endswith(f".{extension}"):
+                filename += f".{extension}"
+            
+            fd, tmp_path = tempfile.mkstemp(dir=settings.TEMP_DIR, suffix=f".{extension}")
+            os.close(fd)
+            try:
+                if partition_by is None:
+                    DataExporter.write_columnar(df, tmp_path, format)
+                else:
+                    with tempfile.TemporaryDirectory(dir=settings.TEMP_DIR) as tmp_dir:
+                        DataExporter.write_columnar(df, tmp_dir, format, partition_by)
+                        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as archive:
+                            for file in sorted(Path(tmp_dir).rglob('*')):
+                                if file.is_file():
+                                    archive.write(file, file.relative_to(tmp_dir).as_posix())
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            
+            response = FileResponse(
+                tmp_path,
+                media_type=media_type,
+                filename=filename,
+                background=BackgroundTask(os.unlink, tmp_path)
+            )
+            
+            logger.info(f"✅ Datos exportados a {format}: {filename} ({len(df)} registros)")
+            return response
+            
+        except Exception as e:
+            logger.error(f"❌ Error exportando a {format}: {e}")
+            raise
+    
     @staticmethod
     def export_analysis_results(
         results: Dict[str, Any],
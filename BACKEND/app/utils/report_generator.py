@@ -0,0 +1,175 @@
+"""
+Renderizado de reportes ejecutivos a archivos (JSON, Excel, PDF)
+
+Convierte un ReportResponse ya construido en bytes. La escritura a disco es
+atómica: se escribe a un temporal en el mismo directorio y se renombra con
+os.replace, así un lector nunca ve un archivo a medio escribir.
+"""
+
+import io
+import os
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Union
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from app.schemas.reports import ReportResponse
+from app.utils.export import latin1_text
+
+logger = logging.getLogger(__name__)
+
+REPORT_EXTENSIONS = {
+    'json': 'json',
+    'xlsx': 'xlsx',
+    'pdf': 'pdf',
+}
+REPORT_MEDIA_TYPES = {
+    'json': 'application/json',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+HEADER_FILL = PatternFill(start_color="2E75B6", end_color="2E75B6", fill_type="solid")
+
+
+def render_json(report: ReportResponse) -> bytes:
+    return report.model_dump_json(indent=2).encode('utf-8')
+
+
+def _write_sheet(ws, headers, rows) -> None:
+    ws.append(headers)
+    for cell in ws[1]:
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = Alignment(horizontal="center")
+    for row in rows:
+        ws.append(list(row))
+    for column in ws.columns:
+        ws.column_dimensions[column[0].column_letter].width = 22
+
+
+def render_xlsx(report: ReportResponse) -> bytes:
+    """Libro con resumen, categorías, palabras e insights"""
+    wb = Workbook()
+    summary = report.summary
+
+    ws = wb.active
+    ws.title = "Resumen"
+    _write_sheet(ws, ["Métrica", "Valor"], [
+        ("Período", report.period_text),
+        ("Generado", report.generated_at),
+        ("Total de comentarios", summary.total_comments),
+        ("Positivos", summary.positive_count),
+        ("Neutrales", summary.neutral_count),
+        ("Negativos", summary.negative_count),
+        ("% Positivos", summary.positive_percentage),
+        ("% Neutrales", summary.neutral_percentage),
+        ("% Negativos", summary.negative_percentage),
+        ("Percepción general", summary.general_perception),
+        ("Engagement (%)", summary.engagement_rate),
+        ("Confianza del modelo (%)", summary.model_confidence),
+    ])
+
+    _write_sheet(wb.create_sheet("Categorías"),
+                 ["Categoría", "Score", "Positivos", "Neutrales", "Negativos", "Total"],
+                 [(c.name, c.score, c.positive_count, c.neutral_count, c.negative_count, c.total_count)
+                  for c in report.categories])
+
+    _write_sheet(wb.create_sheet("Palabras"), ["Palabra", "Frecuencia"],
+                 [(str(word), count) for word, count in report.statistics.most_common_words])
+
+    _write_sheet(wb.create_sheet("Insights"), ["Tipo", "Título", "Descripción"],
+                 [(i.type, i.title, i.description) for i in report.insights])
+
+    stream = io.BytesIO()
+    wb.save(stream)
+    return stream.getvalue()
+
+
+def render_pdf(report: ReportResponse) -> bytes:
+    """Resumen ejecutivo en PDF (requiere fpdf2)"""
+    from fpdf import FPDF
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    def line(text: str, size: int = 10, style: str = '') -> None:
+        pdf.set_font("Helvetica", style, size)
+        pdf.multi_cell(0, size * 0.6, latin1_text(text), new_x="LMARGIN", new_y="NEXT")
+
+    line(report.title, 16, 'B')
+    line(f"Período: {report.period_text}  |  Generado: {report.generated_at[:19]}", 9)
+    pdf.ln(4)
+
+    s = report.summary
+    line("Resumen", 12, 'B')
+    line(f"Total de comentarios: {s.total_comments}")
+    line(f"Positivos: {s.positive_count} ({s.positive_percentage}%)  "
+         f"Neutrales: {s.neutral_count} ({s.neutral_percentage}%)  "
+         f"Negativos: {s.negative_count} ({s.negative_percentage}%)")
+    line(f"Engagement: {s.engagement_rate}%  |  Confianza del modelo: {s.model_confidence}%")
+    pdf.ln(4)
+
+    if report.categories:
+        line("Categorías", 12, 'B')
+        for c in report.categories:
+            line(f"{c.name}: score {c.score} ({c.total_count} comentarios; "
+                 f"+{c.positive_count} / ={c.neutral_count} / -{c.negative_count})")
+        pdf.ln(4)
+
+    if report.insights:
+        line("Hallazgos", 12, 'B')
+        for insight in report.insights:
+            line(f"- {insight.title}: {insight.description}")
+        pdf.ln(4)
+
+    if report.recommendations:
+        line("Recomendaciones", 12, 'B')
+        for rec in report.recommendations:
+            line(f"[{rec.priority}] {rec.title}", 10, 'B')
+            for item in rec.items:
+                line(f"- {item}")
+
+    return bytes(pdf.output())
+
+
+RENDERERS: Dict[str, Callable[[ReportResponse], bytes]] = {
+    'json': render_json,
+    'xlsx': render_xlsx,
+    'pdf': render_pdf,
+}
+
+
+def render_report(report: ReportResponse, fmt: str) -> bytes:
+    """Renderiza el reporte en el formato pedido"""
+    if fmt not in RENDERERS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    return RENDERERS[fmt](report)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_atomic(path: Union[str, Path], data: bytes) -> Path:
+    """Escribe a un temporal del mismo directorio, fsync y os.replace"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return path
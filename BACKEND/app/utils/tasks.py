@@ -0,0 +1,246 @@
+"""
+Tareas en segundo plano: pre-renderizado de reportes en REPORTS_DIR y
+seguimiento del avance de las cargas de datasets
+
+Tras cada cambio de dataset o modelo se genera el reporte estándar de cada
+período en todos los formatos de settings.REPORT_EXPORT_FORMATS. Los
+archivos se nombran por su hash de contenido y se escriben de forma
+atómica; un manifest.json (también atómico) indica qué archivo corresponde a
+cada (período, formato) para la versión vigente. Las descargas sirven esos
+archivos directamente con FileResponse.
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.schemas.reports import ReportResponse
+from app.utils.config import settings
+from app.utils.report_generator import (
+    REPORT_EXTENSIONS, content_hash, render_report, write_atomic
+)
+
+logger = logging.getLogger(__name__)
+
+PRERENDER_PERIODS = ["current", "last", "quarter", "year", "all"]
+MANIFEST_NAME = "manifest.json"
+
+
+class ReportPrerenderer:
+    """
+    Renderizador de reportes en un hilo de fondo (un trabajo a la vez)
+
+    Si llega una versión nueva mientras se renderiza la anterior, el
+    trabajo obsoleto se abandona antes de escribir su manifiesto.
+    """
+
+    def __init__(self, reports_dir: Optional[Path] = None):
+        self.reports_dir = Path(reports_dir or settings.REPORTS_DIR)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-prerender")
+        self._lock = threading.Lock()
+        self._latest_version: Optional[str] = None
+        self._manifest: Optional[Dict[str, Any]] = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.reports_dir / MANIFEST_NAME
+
+    def manifest(self) -> Dict[str, Any]:
+        """Manifiesto vigente (se lee de disco la primera vez)"""
+        with self._lock:
+            if self._manifest is None and self.manifest_path.exists():
+                try:
+                    self._manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+                except Exception as e:
+                    logger.warning(f"⚠️ Manifiesto de reportes ilegible: {e}")
+            return self._manifest or {}
+
+    def lookup(self, version: str, period: str, fmt: str) -> Optional[Dict[str, Any]]:
+        """Artefacto pre-renderizado si corresponde a la versión vigente"""
+        manifest = self.manifest()
+        if manifest.get('version') != version:
+            return None
+        artifact = manifest.get('artifacts', {}).get(period, {}).get(fmt)
+        if artifact and (self.reports_dir / artifact['file']).exists():
+            return artifact
+        return None
+
+    def store(self, period: str, fmt: str, data: bytes) -> Dict[str, Any]:
+        """Escribe un artefacto con nombre por hash (idempotente)"""
+        digest = content_hash(data)
+        filename = f"reporte_{period}_{digest[:16]}.{REPORT_EXTENSIONS[fmt]}"
+        path = self.reports_dir / filename
+        if not path.exists():
+            write_atomic(path, data)
+        return {'file': filename, 'sha256': digest, 'bytes': len(data)}
+
+    def register(self, version: str, period: str, fmt: str, data: bytes) -> Dict[str, Any]:
+        """
+        Guarda un artefacto renderizado a pedido y lo agrega al manifiesto
+
+        Archivo y manifiesto se actualizan con el mismo lock que _cleanup,
+        así que el archivo no se borra entre store() y la respuesta.
+        """
+        self.manifest()
+        with self._lock:
+            artifact = self.store(period, fmt, data)
+            manifest = self._manifest if self._manifest and self._manifest.get('version') == version else {
+                'version': version,
+                'generated_at': datetime.now().isoformat(),
+                'artifacts': {}
+            }
+            manifest['artifacts'].setdefault(period, {})[fmt] = artifact
+            write_atomic(self.manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+            self._manifest = manifest
+        return artifact
+
+    def schedule(
+        self,
+        version: str,
+        build: Callable[[str], ReportResponse],
+        periods: Optional[List[str]] = None,
+        formats: Optional[List[str]] = None
+    ) -> Future:
+        """
+        Encola el pre-renderizado de una versión
+
+        Args:
+            version: Identificador de dataset + modelo
+            build: Construye el ReportResponse de un período
+            periods: Períodos a generar (por defecto los estándar)
+            formats: Formatos (por defecto settings.REPORT_EXPORT_FORMATS)
+        """
+        periods = periods or PRERENDER_PERIODS
+        formats = formats or settings.REPORT_EXPORT_FORMATS
+        with self._lock:
+            self._latest_version = version
+        
+        # Mismo contenido de dataset y modelo: los artefactos en disco siguen vigentes
+        if self.is_current(version, periods, formats):
+            logger.info(f"⏭️ Reportes de {version} ya pre-renderizados")
+            done: Future = Future()
+            done.set_result(self.manifest())
+            return done
+        return self._executor.submit(self._run, version, build, periods, formats)
+    
+    def is_current(self, version: str, periods: List[str], formats: List[str]) -> bool:
+        """True si el manifiesto ya tiene todos los artefactos de la versión"""
+        return all(
+            self.lookup(version, period, fmt) is not None
+            for period in periods for fmt in formats
+        )
+
+    def _is_stale(self, version: str) -> bool:
+        with self._lock:
+            return self._latest_version != version
+
+    def _run(self, version: str, build, periods: List[str], formats: List[str]) -> Optional[Dict[str, Any]]:
+        started = datetime.now()
+        artifacts: Dict[str, Dict[str, Any]] = {}
+
+        for period in periods:
+            if self._is_stale(version):
+                logger.info(f"⏭️ Pre-renderizado de {version} abandonado (versión nueva)")
+                return None
+            try:
+                report = build(period)
+            except Exception as e:
+                logger.error(f"❌ Error construyendo reporte '{period}': {e}")
+                continue
+
+            for fmt in formats:
+                try:
+                    artifacts.setdefault(period, {})[fmt] = self.store(period, fmt, render_report(report, fmt))
+                except ImportError as e:
+                    logger.warning(f"⚠️ Formato {fmt} no disponible: {e}")
+                except Exception as e:
+                    logger.error(f"❌ Error renderizando {period}.{fmt}: {e}")
+
+        if self._is_stale(version):
+            return None
+
+        with self._lock:
+            # Conserva lo registrado a pedido para esta versión mientras corría el trabajo
+            if self._manifest and self._manifest.get('version') == version:
+                for period, formats in self._manifest.get('artifacts', {}).items():
+                    for fmt, artifact in formats.items():
+                        artifacts.setdefault(period, {}).setdefault(fmt, artifact)
+            manifest = {
+                'version': version,
+                'generated_at': datetime.now().isoformat(),
+                'artifacts': artifacts
+            }
+            write_atomic(self.manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+            self._manifest = manifest
+            self._cleanup(manifest)
+
+        elapsed = (datetime.now() - started).total_seconds()
+        total = sum(len(v) for v in artifacts.values())
+        logger.info(f"📦 {total} reportes pre-renderizados en {elapsed:.1f}s ({self.reports_dir})")
+        return manifest
+
+    def _cleanup(self, manifest: Dict[str, Any]) -> None:
+        """Elimina artefactos de versiones anteriores (llamar con self._lock tomado)"""
+        keep = {a['file'] for formats in manifest['artifacts'].values() for a in formats.values()}
+        for path in self.reports_dir.glob("reporte_*"):
+            if path.name not in keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+
+class ProgressRegistry:
+    """
+    Avance de trabajos largos (cargas de CSV) consultable por id
+
+    Guarda solo los últimos `max_jobs` trabajos.
+    """
+
+    def __init__(self, max_jobs: int = 50):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def start(self, job_id: str, **info: Any) -> Dict[str, Any]:
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'running',
+                'stage': 'receiving',
+                'started_at': datetime.now().isoformat(),
+                **info
+            }
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.pop(next(iter(self._jobs)))
+            return dict(self._jobs[job_id])
+
+    def update(self, job_id: str, **info: Any) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(info)
+                job['updated_at'] = datetime.now().isoformat()
+
+    def finish(self, job_id: str, status: str = 'completed', **info: Any) -> None:
+        self.update(job_id, status=status, finished_at=datetime.now().isoformat(), **info)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def callback(self, job_id: str) -> Callable[..., None]:
+        """Callback (etapa, **info) para IngestionPipeline"""
+        def report(stage: str, **info: Any) -> None:
+            self.update(job_id, stage=stage, **info)
+        return report
+
+
+# Instancias globales
+report_prerenderer = ReportPrerenderer()
+upload_progress = ProgressRegistry()
@@ -0,0 +1,203 @@
+"""
+Recepción de cargas CSV en streaming
+
+UploadFile de Starlette vuelca el cuerpo completo a un archivo temporal
+antes de ejecutar el handler, así que el límite de tamaño y la validación
+del encabezado llegaban tarde. Aquí el cuerpo multipart/form-data se lee
+de request.stream() con el parser incremental de python-multipart: el
+encabezado del CSV se valida con los primeros bytes del archivo y la carga
+se corta en cuanto supera settings.MAX_UPLOAD_BYTES.
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from app.core.pipeline import SchemaValidationError, validate_header
+from app.utils.config import settings
+from app.utils.tasks import upload_progress
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Margen para el sobre multipart (boundary y encabezados de cada parte)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Esquema del cuerpo para la documentación OpenAPI (la ruta no declara UploadFile)
+CSV_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+
+class StreamingCSVUpload:
+    """
+    Copia a disco el campo de archivo de un multipart/form-data mientras llega
+
+    El nombre del archivo se conoce al terminar los encabezados de la parte;
+    recién entonces part_path_for decide dónde escribirlo.
+    """
+
+    def __init__(self, upload_id: str, field: str = "file"):
+        self.upload_id = upload_id
+        self.field = field
+        self.filename: Optional[str] = None
+        self.part_path: Optional[Path] = None
+        self.received = 0
+        self._events: List[Tuple[str, Any]] = []
+        self._headers: dict = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._head = b""
+        self._validated = False
+        self._in_file = False
+        self._file = None
+
+    # Callbacks del parser (síncronos): solo encolan eventos
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        self._events.append(("part", self._headers))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._events.append(("data", data[start:end]))
+
+    def _on_part_end(self) -> None:
+        self._events.append(("end", None))
+
+    async def receive(self, request: Request, part_path_for: Callable[[str], Path]) -> int:
+        """
+        Lee el cuerpo de la petición por bloques y escribe el archivo
+
+        Args:
+            request: Petición multipart/form-data con un campo `file`
+            part_path_for: Ruta temporal donde escribir, según el nombre del archivo
+
+        Returns:
+            Bytes del archivo recibidos
+        """
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        boundary = params.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=400, detail="Se esperaba un formulario multipart/form-data")
+
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            upload_progress.update(self.upload_id, total_bytes=int(content_length))
+            # Rechazo anticipado: ni siquiera se empieza a leer el cuerpo
+            if int(content_length) > settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+                raise self._too_large()
+
+        parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        try:
+            async for chunk in request.stream():
+                if chunk:
+                    parser.write(chunk)
+                    self._process(part_path_for)
+            parser.finalize()
+            self._process(part_path_for)
+        finally:
+            self._close()
+
+        if self.filename is None:
+            raise HTTPException(status_code=400, detail="Falta el archivo CSV en el campo 'file'")
+        if self.received == 0:
+            raise SchemaValidationError("El archivo CSV está vacío")
+        return self.received
+
+    def _process(self, part_path_for: Callable[[str], Path]) -> None:
+        """Aplica los eventos encolados por el parser desde el último bloque"""
+        events, self._events = self._events, []
+        for kind, value in events:
+            if kind == "part":
+                self._start_part(value, part_path_for)
+            elif kind == "data" and self._in_file:
+                self._write(value)
+            elif kind == "end" and self._in_file:
+                if not self._validated:
+                    self._validate()
+                self._in_file = False
+
+    def _start_part(self, headers: dict, part_path_for: Callable[[str], Path]) -> None:
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("utf-8", errors="replace") != self.field:
+            return
+        if self.filename is not None:
+            raise HTTPException(status_code=400, detail="Solo se admite un archivo por carga")
+
+        filename = Path(options.get(b"filename", b"").decode("utf-8", errors="replace")).name
+        if not filename.endswith(".csv"):
+            raise HTTPException(status_code=400, detail="El archivo debe ser formato CSV")
+        self.filename = filename
+        upload_progress.update(self.upload_id, filename=filename)
+
+        self.part_path = part_path_for(filename)
+        self.part_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.part_path, "wb")
+        self._in_file = True
+
+    def _write(self, block: bytes) -> None:
+        self.received += len(block)
+        if self.received > settings.MAX_UPLOAD_BYTES:
+            raise self._too_large()
+        if not self._validated:
+            # El encabezado se valida en cuanto llega su primera línea completa
+            self._head += block
+            if b"\n" in self._head or len(self._head) >= settings.UPLOAD_CHUNK_BYTES:
+                self._validate()
+        self._file.write(block)
+        upload_progress.update(self.upload_id, bytes_received=self.received)
+
+    def _validate(self) -> None:
+        if self._head:
+            validate_header(self._head, strict=True)
+        self._validated = True
+        self._head = b""
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def _too_large() -> HTTPException:
+        return HTTPException(
+            status_code=413,
+            detail=f"El archivo supera el máximo de {settings.MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+        )
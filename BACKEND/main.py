@@ -31,6 +31,7 @@ if not hasattr(sklearn.utils, 'parse_version'):
 # Importar rutas
 from app.routes import (
     analysis_routes,
+    comments_routes,
     dataset_routes,
     report_routes,
     statistics_routes
@@ -40,7 +41,7 @@ from app.routes import (
 from app.services.sentiment_analyzer import SentimentAnalyzer
 from app.utils.config import settings
 from app.core import dependencies
-from app.core.dataset import dataset_manager
+from app.core.labeling import schedule_refresh
 
 # Configurar logging
 logging.basicConfig(
@@ -82,13 +83,11 @@ async def lifespan(app: FastAPI):
             try:
                 logger.info(f"Cargando dataset desde: {dataset_path}")
                 
-                # Cargar dataset usando el manager
-                dataset_df = dataset_manager.load_dataset(str(dataset_path))
+                # Pipeline único de ingesta: el analizador y el manager comparten el snapshot
+                loaded = sentiment_analyzer.load_dataset(str(dataset_path))
                 
-                if dataset_df is not None and not dataset_df.empty:
-                    # Pasar el dataset al sentiment analyzer
-                    sentiment_analyzer.df = dataset_df
-                    logger.info(f"[OK] Dataset cargado por manager: {len(dataset_df)} registros")
+                if loaded and sentiment_analyzer.df is not None and not sentiment_analyzer.df.empty:
+                    logger.info(f"[OK] Dataset cargado: {len(sentiment_analyzer.df)} registros")
                     
                     # Intentar entrenar el modelo
                     try:
@@ -110,6 +109,11 @@ async def lifespan(app: FastAPI):
                     except Exception as model_error:
                         logger.error(f"[ERROR] Con modelo ML: {model_error}")
                         logger.info("    Sistema funcionará con reglas heurísticas")
+                    
+                    # Almacén de comentarios, índice de similares y reportes se
+                    # construyen desde este hook, haya o no modelo (sin modelo
+                    # el etiquetado se omite)
+                    schedule_refresh(sentiment_analyzer)
                 else:
                     logger.error("[ERROR] Dataset vacío o None después de cargar")
                     logger.info("    Sistema funcionará en modo demo")
@@ -216,6 +220,12 @@ app.include_router(
     tags=["Estadísticas"]
 )
 
+app.include_router(
+    comments_routes.router,
+    prefix="/api/comments",
+    tags=["Comentarios"]
+)
+
 # Endpoint raíz
 @app.get("/", tags=["Health Check"])
 async def root():
@@ -329,7 +339,7 @@ async def dataset_info():
         sample_comments = []
         for sentiment in ['Positivo', 'Neutral', 'Negativo']:
             if sentiment in df['sentimiento'].values:
-                sample = df[df['sentimiento'] == sentiment]['comentario'].head(3).tolist() if 'comentario' in df.columns else []
+                sample = df[df['sentimiento'] == sentiment]['texto_comentario'].head(3).tolist() if 'texto_comentario' in df.columns else []
                 sample_comments.append({
                     "sentiment": sentiment,
                     "comments": sample
@@ -0,0 +1,65 @@
+"""
+Benchmark de la exportación PDF del dataset completo
+
+Replica el dataset de Instagram hasta 10k y 100k filas y mide tiempo,
+memoria pico del proceso (RSS) y tamaño del archivo generado. Cada tamaño
+se ejecuta en un subproceso para que el pico de RSS no se arrastre.
+
+Uso:
+    python scripts/benchmark_pdf_export.py [--rows 10000 100000]
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import pandas as pd
+
+from app.utils.export import DataExporter
+
+DATASET = BASE_DIR / "data" / "dataset_instagram_unmsm.csv"
+
+
+def build_frame(rows: int) -> pd.DataFrame:
+    """Dataset real repetido hasta `rows` filas"""
+    base = pd.read_csv(DATASET, encoding="utf-8")[["Texto_Comentario", "Sentimiento"]]
+    repeats = -(-rows // len(base))
+    return pd.concat([base] * repeats, ignore_index=True).iloc[:rows]
+
+
+def run(rows: int) -> None:
+    df = build_frame(rows)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"bench_{rows}.pdf"
+        start = time.perf_counter()
+        DataExporter.write_pdf(df, path, title=f"Benchmark {rows} filas")
+        elapsed = time.perf_counter() - start
+        size = path.stat().st_size
+    # ru_maxrss está en KB en Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(
+        f"{rows:>8} filas | {elapsed:7.2f} s | {rows / elapsed:8.0f} filas/s | "
+        f"RSS pico {peak / 1024:7.1f} MB (+{(peak - base_rss) / 1024:.1f}) | archivo {size / 1024 / 1024:6.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run(args.rows[0])
+    else:
+        for n in args.rows:
+            subprocess.run([sys.executable, __file__, "--single", "--rows", str(n)], check=True)
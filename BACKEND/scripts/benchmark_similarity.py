@@ -0,0 +1,96 @@
+"""
+Benchmark de comentarios similares: búsqueda exacta vs. LSH
+
+Genera textos sintéticos combinando mitades de comentarios reales del
+dataset de Instagram (así no hay copias exactas que hagan trivial la
+búsqueda), los embebe con el vocabulario TF-IDF ajustado sobre ese mismo
+snapshot y, para una muestra de consultas tomadas del propio dataset,
+compara:
+
+- latencia p50 / p95 de exact y lsh
+- candidatos re-puntuados por consulta
+- recall@k de lsh: fracción de vecinos devueltos con similitud mayor o
+  igual que el k-ésimo vecino exacto (cuenta los empates como aciertos)
+
+Uso:
+    python scripts/benchmark_similarity.py [--rows 10000 100000] [--queries 200] [--k 10]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np
+import pandas as pd
+
+from app.core.similarity import SimilarityIndex
+
+DATASET = BASE_DIR / "data" / "dataset_instagram_unmsm.csv"
+
+
+def build_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Comentarios reales + textos que unen la primera mitad de uno con la segunda de otro"""
+    base = pd.read_csv(DATASET, encoding="utf-8")["Texto_Comentario"].dropna().astype(str)
+    words = base.str.split().tolist()
+    rng = np.random.default_rng(seed)
+    left = rng.integers(0, len(words), rows)
+    right = rng.integers(0, len(words), rows)
+    texts = [
+        " ".join(words[a][:len(words[a]) // 2 + 1] + words[b][len(words[b]) // 2:])
+        for a, b in zip(left, right)
+    ]
+    texts[:len(base)] = base.tolist()[:rows]
+    return pd.DataFrame({"Texto_Comentario": texts})
+
+
+def percentiles(values: list) -> str:
+    return f"p50 {np.percentile(values, 50):6.2f} ms  p95 {np.percentile(values, 95):6.2f} ms"
+
+
+def run(rows: int, queries: int, k: int) -> None:
+    df = build_frame(rows)
+    start = time.perf_counter()
+    index = SimilarityIndex.from_frame(df)
+    build = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    sample = rng.choice(index.indexed, size=min(queries, len(index.indexed)), replace=False)
+
+    latency = {"exact": [], "lsh": []}
+    candidates = {"exact": [], "lsh": []}
+    recalls = []
+    for pos in sample:
+        results = {}
+        for method in ("exact", "lsh"):
+            started = time.perf_counter()
+            results[method] = index.similar(position=int(pos), k=k, method=method)
+            latency[method].append((time.perf_counter() - started) * 1000)
+            candidates[method].append(results[method]["candidates"])
+
+        exact_scores = results["exact"]["scores"]
+        if len(exact_scores) == 0:
+            continue
+        threshold = exact_scores[-1] - 1e-6
+        hits = int((results["lsh"]["scores"] >= threshold).sum())
+        recalls.append(min(hits, len(exact_scores)) / len(exact_scores))
+
+    print(f"{rows:>8} filas | índice {build:6.2f} s | {len(index.indexed)} con términos | "
+          f"{index.matrix.shape[1]} términos | k={k}")
+    for method in ("exact", "lsh"):
+        print(f"         {method:5} | {percentiles(latency[method])} | candidatos {np.mean(candidates[method]):9.0f}")
+    print(f"         recall@{k} lsh {np.mean(recalls):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    for n in args.rows:
+        run(n, args.queries, args.k)
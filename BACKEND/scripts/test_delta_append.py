@@ -0,0 +1,77 @@
+"""
+PRUEBA DE INGESTA INCREMENTAL - UNMSM SENTIMENT ANALYSIS
+Un delta que agrega comentarios a una publicación existente debe heredar
+enlace / me_gusta / descripcion del snapshot base.
+
+Ejecutar: python scripts/test_delta_append.py  (o con pytest)
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import pandas as pd
+
+from app.core.delta import concat_snapshots
+from app.core.pipeline import IngestionPipeline
+
+DATASET = BASE_DIR / "data" / "dataset_instagram_unmsm.csv"
+
+DELTA_CSV = (
+    "enlace,me_gusta,Publicacion,descripcion,ID_Comentario,Usuario,Texto_Comentario,"
+    "Cantidad_Likes,Tema_Principal,Sentimiento,Subtema_o_Keyword,Es_Respuesta_A\n"
+    ",,1,,C99,nuevo_usuario,Orgullo sanmarquino,3,Ranking,Positivo,Orgullo,-\n"
+    ",,1,,C99.1,otro_usuario,Así es,0,Ranking,Positivo,Confirmación,C99\n"
+    "https://www.instagram.com/p/NUEVO/,12,9999,Publicación nueva,C1,autor,Hola,1,General,Neutral,Saludo,-\n"
+    ",,9999,,C1.1,autor2,Qué tal,0,General,Neutral,Saludo,C1\n"
+)
+
+
+def load_snapshots():
+    base = IngestionPipeline(strict=True).run(str(DATASET))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "delta.csv"
+        path.write_text(DELTA_CSV, encoding="utf-8")
+        delta = IngestionPipeline(strict=True).run(str(path))
+    return base, delta
+
+
+def test_append_to_existing_post():
+    """Las filas nuevas de la publicación 1 toman los metadatos del base"""
+    base, delta = load_snapshots()
+    merged = concat_snapshots(base, delta)
+
+    first = base[base['publicacion'] == 1].iloc[0]
+    appended = merged.iloc[len(base):len(base) + 2]
+
+    assert len(merged) == len(base) + len(delta)
+    for col in ('enlace', 'me_gusta', 'descripcion'):
+        assert appended[col].notna().all(), f"{col} quedó vacío en el delta"
+        assert (appended[col] == first[col]).all(), f"{col} no coincide con el del base"
+
+
+def test_new_post_keeps_own_metadata():
+    """Una publicación nueva conserva sus propios metadatos y el base no cambia"""
+    base, delta = load_snapshots()
+    before = base[['enlace', 'me_gusta', 'descripcion']].copy()
+    merged = concat_snapshots(base, delta)
+
+    new_post = merged.iloc[len(base) + 2:]
+    assert (new_post['enlace'] == "https://www.instagram.com/p/NUEVO/").all()
+    assert (new_post['me_gusta'] == 12).all()
+    pd.testing.assert_frame_equal(base[['enlace', 'me_gusta', 'descripcion']], before)
+
+
+if __name__ == "__main__":
+    failures = 0
+    for test in (test_append_to_existing_post, test_new_post_keeps_own_metadata):
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)